@@ -1,43 +1,51 @@
 import argparse
-from collections import OrderedDict
 from dotenv import load_dotenv
 
-from providers.chatgpt import ChatGPTProvider
-from providers.deepseek import DeepSeekProvider
-from retriever_faiss import RetrieverFAISS
-from rag.prompts import SYSTEM_PROMPT
-
-
-def get_provider(name: str):
-    if name == "chatgpt":
-        return ChatGPTProvider()
-    if name == "deepseek":
-        return DeepSeekProvider()
-    raise ValueError("Proveedor no válido. Usa chatgpt | deepseek.")
-
-
-def unique_titles(items):
-    seen = OrderedDict()
-    for r in items:
-        t = r["title"]
-        if t not in seen:
-            seen[t] = True
-    return list(seen.keys())
+from providers.registry import get_provider
+from rag.pipeline import build_messages, make_retriever
+
+
+def retrieve(question, args, k=8):
+    # con `python -m rag.daemon` corriendo sobre el mismo índice, la búsqueda va por socket
+    # (sin importar torch ni cargar modelo/índice); si no, se carga todo en este proceso.
+    # --nprobe / --ef_search son de ajuste: fuerzan la carga local con esos parámetros.
+    if not (args.no_daemon or args.nprobe or args.ef_search):
+        from rag.daemon import DaemonClient
+        client = DaemonClient.connect()
+        if client is not None:
+            try:
+                return client.search(question, k=k, mode=args.retrieval, filter=args.filter)
+            except (OSError, ConnectionError):
+                # el daemon murió entre connect() y la respuesta: se sigue en proceso
+                print("[DAEMON] sin respuesta del daemon; búsqueda en este proceso")
+            finally:
+                client.close()
+    retriever = make_retriever(args.retrieval, nprobe=args.nprobe, ef_search=args.ef_search)
+    return retriever.search(question, k=k, filter=args.filter)
 
 
 def main():
     load_dotenv()
     parser = argparse.ArgumentParser(description="Asistente Normativa UFRO (RAG)")
     parser.add_argument("question", type=str, nargs="+", help="Consulta")
-    parser.add_argument("--provider", type=str, default="chatgpt", help="chatgpt|deepseek")
+    parser.add_argument("--provider", type=str, default="chatgpt", help="chatgpt|deepseek|router|replay[:<proveedor>]")
+    parser.add_argument("--stream", action="store_true", help="imprime la respuesta a medida que se genera")
+    parser.add_argument("--nprobe", type=int, default=None, help="listas IVF a visitar (índices ivf*)")
+    parser.add_argument("--ef_search", type=int, default=None, help="efSearch (índices hnsw)")
+    parser.add_argument("--retrieval", choices=["dense", "hybrid", "lexical"], default="dense",
+                        help="dense (FAISS), hybrid (FAISS + BM25 con RRF) o lexical (solo BM25, sin modelo)")
+    parser.add_argument("--context_tokens", type=int, default=None,
+                        help="presupuesto de tokens del contexto (default RAG_CONTEXT_TOKENS o 2500; 0 = sin límite)")
+    parser.add_argument("--filter", type=str, default=None,
+                        help='filtro por metadatos, p.ej. "vigencia>=2023" o "title=Calendario Académico 2025" (ver rag/filters.py)')
+    parser.add_argument("--no_daemon", action="store_true", help="no usar rag.daemon aunque esté corriendo")
     args = parser.parse_args()
 
     provider = get_provider(args.provider)
     question = " ".join(args.question)
 
     # Recuperación con mayor cobertura
-    retriever = RetrieverFAISS(faiss_path="index.faiss", meta_path="meta.jsonl")
-    top = retriever.search(question, k=8)
+    top = retrieve(question, args, k=8)
 
     if not top:
         print("\n=== RESPUESTA ===\n")
@@ -45,37 +53,22 @@ def main():
         print("\n=== REFERENCIAS ===\n- (sin resultados)")
         return
 
-    # Contexto y referencias
-    context = "\n\n".join([r["text"] for r in top])
-    ref_titles = unique_titles(top)
-    refs_block = "\n".join([f"- {t}" for t in ref_titles])
-
-    # Prompt afinado (precisión y citas)
-    user_prompt = (
-        f"Pregunta: {question}\n\n"
-        "Contexto de normativa (fragmentos relevantes):\n"
-        f"{context}\n\n"
-        "Instrucciones de respuesta:\n"
-        "- Responde SOLO en base al contexto anterior.\n"
-        "- Si hay varias fechas/valores, selecciona la que responda EXACTAMENTE a la pregunta.\n"
-        "- Sé explícito con la fecha/valor (formato: 'Lunes 4 de agosto de 2025', por ejemplo).\n"
-        "- Si la información no está en el contexto, responde: 'No encontrado en normativa UFRO'.\n"
-        "- Al final agrega:\n"
-        f"Referencias:\n{refs_block}"
-    )
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_prompt}
-    ]
-
-    answer = provider.chat(messages)
+    # Contexto y referencias (chunks solapados fusionados, dentro del presupuesto de tokens):
+    # mismo prompt que app_flask / app_asgi (rag/pipeline.py)
+    ref_titles, messages, ctx = build_messages(question, top, budget=args.context_tokens, with_ctx=True)
 
     print("\n=== RESPUESTA ===\n")
-    print(answer)
+    if args.stream:
+        for piece in provider.stream(messages):
+            print(piece, end="", flush=True)
+        print()
+    else:
+        print(provider.chat(messages))
     print("\n=== REFERENCIAS ===")
     for t in ref_titles:
         print(f"- {t}")
+    print(f"\n[CTX] {ctx['chunks_in']} chunks → {ctx['blocks']} bloques, {ctx['tokens_packed']} tokens "
+          f"(ahorro {ctx['tokens_saved']} de {ctx['tokens_naive']})")
 
 
 if __name__ == "__main__":
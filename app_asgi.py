@@ -0,0 +1,204 @@
+import asyncio, functools, json, logging, os, time, traceback
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from providers.registry import get_provider, stats as provider_stats
+from rag import metrics, pipeline
+from rag.pipeline import NOT_FOUND, cached_answer, prepare, request_error, store_answer
+
+# Modo ASGI: mismo contrato que app_flask (/, /ask, /ask_stream, /stats, /metrics, /admin/*), pero las llamadas
+# al LLM son async (no ocupan un hilo mientras esperan) y la recuperación (modelo + FAISS,
+# CPU) corre en un pool de hilos para no bloquear el event loop.
+#   uvicorn app_asgi:app --host 127.0.0.1 --port 8000
+#   RAG_RETRIEVAL_THREADS: hilos para la recuperación (default 4)
+
+load_dotenv()
+log = logging.getLogger("app_asgi")
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "index.html")
+_executor = ThreadPoolExecutor(max_workers=pipeline.env_int("RAG_RETRIEVAL_THREADS") or 4,
+                               thread_name_prefix="retrieval")
+
+async def _send_body(send, status, body: bytes, content_type: str):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type.encode()),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+async def _send_json(send, status, payload):
+    await _send_body(send, status, json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                     "application/json")
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        msg = await receive()
+        body += msg.get("body", b"")
+        if not msg.get("more_body"):
+            break
+    try:
+        return json.loads(body or b"{}") or {}
+    except ValueError:
+        return {}
+
+def _parse(data):
+    question = (data.get("question") or "").strip()
+    provider_name = (data.get("provider") or "chatgpt").strip().lower()
+    return question, provider_name, data.get("filter") or None
+
+async def _prepare(question, filter_spec=None):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(prepare, question, filter=filter_spec))
+
+async def _cached_answer(question, provider_name, filter_spec=None):
+    # encode de la pregunta + SQLite: fuera del event loop, como la recuperación
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, cached_answer, question, provider_name, filter_spec)
+
+async def _store_answer(probe, provider_name, question, answer, ref_titles):
+    if probe is not None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_executor, store_answer, probe, provider_name, question, answer, ref_titles)
+
+async def home(scope, receive, send):
+    with open(TEMPLATE, "rb") as f:
+        await _send_body(send, 200, f.read(), "text/html; charset=utf-8")
+
+async def stats(scope, receive, send):
+    await _send_json(send, 200, {**pipeline.stats(), "providers": provider_stats()})
+
+async def prometheus_metrics(scope, receive, send):
+    await _send_body(send, 200, metrics.render().encode("utf-8"), "text/plain; version=0.0.4")
+
+def _admin_error(scope):
+    headers = dict(scope.get("headers") or [])
+    token = headers.get(b"x-admin-token", b"").decode("latin-1") or None
+    return pipeline.admin_error(token, (scope.get("client") or ("", 0))[0])
+
+async def admin_version(scope, receive, send):
+    error = _admin_error(scope)
+    if error:
+        return await _send_json(send, 403, {"error": error})
+    await _send_json(send, 200, pipeline.version_info())
+
+async def admin_reload(scope, receive, send):
+    # la carga de la versión nueva corre en el pool de recuperación, sin bloquear el event loop
+    error = _admin_error(scope)
+    if error:
+        return await _send_json(send, 403, {"error": error})
+    version = (await _read_json(receive)).get("version")
+    try:
+        info = await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(pipeline.reload, version, make_active=True))
+    except ValueError as e:
+        return await _send_json(send, 400, {"error": str(e)})
+    except Exception as e:
+        return await _send_json(send, 500, {"error": str(e), "trace": traceback.format_exc()})
+    await _send_json(send, 200, info)
+
+async def ask(scope, receive, send):
+    try:
+        question, provider_name, filter_spec = _parse(await _read_json(receive))
+        error = request_error(question, filter_spec)
+        if error:
+            return await _send_json(send, 400, {"error": error})
+
+        with metrics.span("ask"):
+            provider = get_provider(provider_name)
+            hit, probe = await _cached_answer(question, provider_name, filter_spec)
+            if hit:
+                return await _send_json(send, 200, {"answer": hit["answer"], "references": hit["references"],
+                                                    "cached": True, "similarity": hit["similarity"]})
+            top, ref_titles, messages = await _prepare(question, filter_spec)
+            if not top:
+                return await _send_json(send, 200, {"answer": NOT_FOUND, "references": []})
+
+            answer = await provider.achat(messages)
+            await _store_answer(probe, provider_name, question, answer, ref_titles)
+            await _send_json(send, 200, {"answer": answer, "references": ref_titles})
+
+    except Exception as e:
+        await _send_json(send, 500, {"error": str(e), "trace": traceback.format_exc()})
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+async def ask_stream(scope, receive, send):
+    # mismos eventos que app_flask.ask_stream: refs → token* → done | error
+    t0 = time.perf_counter()
+    question, provider_name, filter_spec = _parse(await _read_json(receive))
+    error = request_error(question, filter_spec)
+    if error:
+        return await _send_json(send, 400, {"error": error})
+    try:
+        provider = get_provider(provider_name)
+        hit, probe = await _cached_answer(question, provider_name, filter_spec)
+        if hit:
+            top, ref_titles, messages = None, hit["references"], None
+        else:
+            top, ref_titles, messages = await _prepare(question, filter_spec)
+    except Exception as e:
+        return await _send_json(send, 500, {"error": str(e), "trace": traceback.format_exc()})
+
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                            (b"x-accel-buffering", b"no")]})
+
+    async def emit(event, payload):
+        await send({"type": "http.response.body", "body": _sse(event, payload), "more_body": True})
+
+    await emit("refs", {"references": ref_titles})
+    if hit or not top:
+        await emit("token", {"t": hit["answer"] if hit else NOT_FOUND})
+        done = {"ttft_sec": 0.0, "total_sec": round(time.perf_counter() - t0, 3)}
+        await emit("done", {**done, "cached": True, "similarity": hit["similarity"]} if hit else done)
+    else:
+        ttft = None
+        pieces = []
+        try:
+            async for piece in provider.astream(messages):
+                if ttft is None:
+                    ttft = time.perf_counter() - t0
+                pieces.append(piece)
+                await emit("token", {"t": piece})
+            await _store_answer(probe, provider_name, question, "".join(pieces), ref_titles)
+            total = time.perf_counter() - t0
+            metrics.record("ask_stream_ttft", ttft or total, provider=provider_name)
+            metrics.record("ask_stream", total)
+            log.info("ask_stream provider=%s ttft=%.3fs total=%.3fs", provider_name, ttft or total, total)
+            await emit("done", {"ttft_sec": round(ttft or total, 3), "total_sec": round(total, 3)})
+        except Exception as e:
+            log.exception("ask_stream provider=%s falló", provider_name)
+            await emit("error", {"error": str(e)})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+ROUTES = {
+    ("GET", "/"): home,
+    ("GET", "/stats"): stats,
+    ("GET", "/metrics"): prometheus_metrics,
+    ("POST", "/ask"): ask,
+    ("POST", "/ask_stream"): ask_stream,
+    ("GET", "/admin/version"): admin_version,
+    ("POST", "/admin/reload"): admin_reload,
+}
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                _executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        return await _send_json(send, 404, {"error": "No encontrado"})
+    await handler(scope, receive, send)
+
+if __name__ == "__main__":
+    import uvicorn
+    print("➡️  Iniciando ASGI en http://127.0.0.1:8000 ...")
+    uvicorn.run("app_asgi:app", host="127.0.0.1", port=8000)
@@ -1,88 +1,138 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from dotenv import load_dotenv
-from collections import OrderedDict
-import traceback
+import json, logging, time, traceback
 
-from providers.chatgpt import ChatGPTProvider
-from providers.deepseek import DeepSeekProvider
-from rag.prompts import SYSTEM_PROMPT
+from providers.registry import get_provider, stats as provider_stats
+from rag import metrics, pipeline
+from rag.pipeline import NOT_FOUND, cached_answer, prepare, request_error, store_answer
 
 load_dotenv()
 app = Flask(__name__)
-
-# --- carga perezosa del retriever (evita que el server se caiga al importar) ---
-_retriever = None
-def get_retriever():
-    global _retriever
-    if _retriever is None:
-        from retriever_faiss import RetrieverFAISS
-        _retriever = RetrieverFAISS(faiss_path="index.faiss", meta_path="meta.jsonl")
-    return _retriever
-
-def get_provider(name: str):
-    if name == "chatgpt":
-        return ChatGPTProvider()
-    if name == "deepseek":
-        return DeepSeekProvider()
-    raise ValueError("Proveedor no válido: usa chatgpt | deepseek")
-
-def unique_titles(items):
-    seen = OrderedDict()
-    for r in items:
-        t = r["title"]
-        if t not in seen:
-            seen[t] = True
-    return list(seen.keys())
+app.logger.setLevel(logging.INFO)
 
 @app.route("/", methods=["GET"])
 def home():
     return render_template("index.html")
 
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({**pipeline.stats(), "providers": provider_stats()})
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    # histogramas rag_stage_seconds{stage=...} (rag/metrics.py) en formato de texto de Prometheus
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# hot-reload del índice (rag/bundles.py): cada worker revisa indexes/CURRENT cada RAG_RELOAD_INTERVAL s;
+# /admin/reload fuerza la recarga en el proceso que atiende el request
+@app.route("/admin/version", methods=["GET"])
+def admin_version():
+    error = pipeline.admin_error(request.headers.get("X-Admin-Token"), request.remote_addr)
+    if error:
+        return jsonify({"error": error}), 403
+    return jsonify(pipeline.version_info())
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    error = pipeline.admin_error(request.headers.get("X-Admin-Token"), request.remote_addr)
+    if error:
+        return jsonify({"error": error}), 403
+    version = (request.get_json(silent=True) or {}).get("version")
+    try:
+        return jsonify(pipeline.reload(version, make_active=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+def _parse_request():
+    data = request.get_json(force=True) or {}
+    question = (data.get("question") or "").strip()
+    provider_name = (data.get("provider") or "chatgpt").strip().lower()
+    # "filter" opcional: "vigencia>=2023", "title=Calendario Académico 2025" (rag/filters.py)
+    return question, provider_name, data.get("filter") or None
+
 @app.route("/ask", methods=["POST"])
 def ask():
     try:
-        data = request.get_json(force=True) or {}
-        question = (data.get("question") or "").strip()
-        provider_name = (data.get("provider") or "chatgpt").strip().lower()
-        if not question:
-            return jsonify({"error": "Falta 'question'"}), 400
+        question, provider_name, filter_spec = _parse_request()
+        error = request_error(question, filter_spec)
+        if error:
+            return jsonify({"error": error}), 400
 
-        provider = get_provider(provider_name)
-        retriever = get_retriever()  # ← aquí podría fallar; si falla devolvemos JSON con trace
-
-        top = retriever.search(question, k=8)
-        if not top:
-            answer = "No encontrado en normativa UFRO. Para esta consulta, te sugiero contactar con la unidad correspondiente."
-            return jsonify({"answer": answer, "references": []})
-
-        context = "\n\n".join([r["text"] for r in top])
-        ref_titles = unique_titles(top)
-        refs_block = "\n".join([f"- {t}" for t in ref_titles])
-
-        user_prompt = (
-            f"Pregunta: {question}\n\n"
-            "Contexto de normativa (fragmentos relevantes):\n"
-            f"{context}\n\n"
-            "Instrucciones de respuesta:\n"
-            "- Responde SOLO en base al contexto anterior.\n"
-            "- Si hay varias fechas/valores, selecciona la que responda EXACTAMENTE a la pregunta.\n"
-            "- Sé explícito con la fecha/valor (ej.: 'Lunes 4 de agosto de 2025').\n"
-            "- Si la información no está en el contexto, responde: 'No encontrado en normativa UFRO'.\n"
-            "- Al final agrega:\n"
-            f"Referencias:\n{refs_block}"
-        )
-
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt}
-        ]
-
-        answer = provider.chat(messages)
-        return jsonify({"answer": answer, "references": ref_titles})
+        # etapas: retriever_load (solo la primera vez) → retrieve (encode, faiss_search, results) →
+        # prompt → provider; "ask" es el total del request
+        with metrics.span("ask"):
+            provider = get_provider(provider_name)
+            # RAG_ANSWER_CACHE=1: una pregunta casi igual a otra ya respondida no llama al LLM
+            hit, probe = cached_answer(question, provider_name, filter_spec)
+            if hit:
+                return jsonify({"answer": hit["answer"], "references": hit["references"],
+                                "cached": True, "similarity": hit["similarity"]})
+            top, ref_titles, messages = prepare(question, filter=filter_spec)
+            if not top:
+                return jsonify({"answer": NOT_FOUND, "references": []})
+
+            answer = provider.chat(messages)
+            store_answer(probe, provider_name, question, answer, ref_titles)
+            return jsonify({"answer": answer, "references": ref_titles})
 
     except Exception as e:
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
 
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.route("/ask_stream", methods=["POST"])
+def ask_stream():
+    # misma entrada que /ask; responde Server-Sent Events:
+    #   refs (antes de generar) → token* → done {ttft_sec, total_sec} | error
+    t0 = time.perf_counter()
+    question, provider_name, filter_spec = _parse_request()
+    error = request_error(question, filter_spec)
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        provider = get_provider(provider_name)
+        hit, probe = cached_answer(question, provider_name, filter_spec)
+        if hit:
+            top, ref_titles, messages = None, hit["references"], None
+        else:
+            top, ref_titles, messages = prepare(question, filter=filter_spec)
+    except Exception as e:
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+    def generate():
+        yield _sse("refs", {"references": ref_titles})
+        if hit or not top:
+            # respuesta de la caché semántica (un solo token) o sin contexto
+            yield _sse("token", {"t": hit["answer"] if hit else NOT_FOUND})
+            done = {"ttft_sec": 0.0, "total_sec": round(time.perf_counter() - t0, 3)}
+            yield _sse("done", {**done, "cached": True, "similarity": hit["similarity"]} if hit else done)
+            return
+        ttft = None
+        pieces = []
+        try:
+            for piece in provider.stream(messages):
+                if ttft is None:
+                    ttft = time.perf_counter() - t0
+                pieces.append(piece)
+                yield _sse("token", {"t": piece})
+        except Exception as e:
+            app.logger.exception("ask_stream provider=%s falló", provider_name)
+            yield _sse("error", {"error": str(e)})
+            return
+        store_answer(probe, provider_name, question, "".join(pieces), ref_titles)
+        total = time.perf_counter() - t0
+        metrics.record("ask_stream_ttft", ttft or total, provider=provider_name)
+        metrics.record("ask_stream", total)
+        # tiempo al primer token vs latencia total, por separado
+        app.logger.info("ask_stream provider=%s ttft=%.3fs total=%.3fs", provider_name, ttft or total, total)
+        yield _sse("done", {"ttft_sec": round(ttft or total, 3), "total_sec": round(total, 3)})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+
 if __name__ == "__main__":
     print("➡️  Iniciando Flask en http://127.0.0.1:5000 ...")
     print("   - Asegúrate de tener templates/index.html")
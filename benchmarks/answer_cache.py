@@ -0,0 +1,99 @@
+"""Caché semántica de respuestas (rag/answer_cache.py): aciertos por umbral y latencia hit vs miss.
+
+Uso (desde el directorio con index.faiss / meta.jsonl y gold_set.json):
+    python -m benchmarks.answer_cache --thresholds 0.85 0.9 0.92 0.95 --delay_ms 1500
+1) Similitud: para pares (pregunta, paráfrasis) cuenta cuántas paráfrasis reutilizarían la respuesta
+   con cada umbral, y cuántas preguntas distintas del gold set chocarían entre sí (aciertos falsos).
+2) Búsqueda: latencia de lookup con --entries respuestas guardadas.
+3) /ask de app_flask (test client) con un LLM simulado de --delay_ms: primera pregunta (miss, llama
+   al LLM), la misma otra vez y su paráfrasis (hits).
+"""
+import argparse, json, os, tempfile, time
+
+import numpy as np
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from rag.answer_cache import AnswerCache
+
+PARAPHRASES = [
+    ("¿Cuándo inician las clases del segundo semestre 2025 según el calendario académico?",
+     "inicio de clases segundo semestre 2025"),
+    ("¿Cuándo inician las clases del segundo semestre 2025 según el calendario académico?",
+     "¿cuándo empiezan las clases del 2do semestre?"),
+    ("¿Cuál es la fecha límite para solicitar eliminación voluntaria de asignaturas en el 2º semestre de 2025?",
+     "plazo para eliminar voluntariamente una asignatura en el segundo semestre 2025"),
+    ("¿Hasta cuándo se puede solicitar postergación de estudios para el 2º semestre de 2025?",
+     "fecha máxima para pedir postergación de estudios 2do semestre 2025"),
+    ("¿Cuántas veces puedo reprobar una asignatura?",
+     "¿cuántas veces se puede reprobar un ramo?"),
+    ("¿Qué requisitos hay para la titulación?",
+     "requisitos para titularse"),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Umbral y latencia de la caché semántica de respuestas")
+    ap.add_argument("--gold", default="gold_set.json")
+    ap.add_argument("--thresholds", type=float, nargs="+", default=[0.85, 0.9, 0.92, 0.95])
+    ap.add_argument("--entries", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--delay_ms", type=float, default=1500.0, help="latencia del LLM simulado")
+    args = ap.parse_args()
+
+    from rag import pipeline
+    retriever = pipeline.get_retriever()
+    with open(args.gold, encoding="utf-8") as f:
+        gold = [item["question"] for item in json.load(f)]
+
+    # 1) similitud de paráfrasis vs preguntas distintas
+    para = np.array([float(retriever.embed(a) @ retriever.embed(b)) for a, b in PARAPHRASES])
+    G = np.stack([retriever.embed(q) for q in gold])
+    S = G @ G.T
+    np.fill_diagonal(S, -1.0)
+    nearest = S.max(axis=1)   # pregunta distinta más parecida a cada una
+    print(json.dumps({"paraphrase_sim": [round(float(x), 3) for x in para],
+                      "distinct_nearest_sim_max": round(float(nearest.max()), 3)}))
+    for t in args.thresholds:
+        print(json.dumps({"threshold": t, "paraphrase_hits": f"{int((para >= t).sum())}/{len(para)}",
+                          "false_hits": f"{int((nearest >= t).sum())}/{len(gold)}"}))
+
+    # 2) latencia de lookup vs tamaño de la caché
+    d = G.shape[1]
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.entries:
+            cache = AnswerCache(os.path.join(tmp, f"bench{n}.sqlite"))
+            X = rng.standard_normal((n, d)).astype(np.float32)
+            X /= np.linalg.norm(X, axis=1, keepdims=True)
+            for i, v in enumerate(X):
+                cache.put("chatgpt", "bench", v, f"pregunta {i}", "respuesta", ["Documento"])
+            cache.lookup("chatgpt", "bench", X[0])   # carga inicial del grupo desde SQLite
+            lat = []
+            for v in X[rng.integers(0, n, 200)]:
+                t0 = time.perf_counter()
+                cache.lookup("chatgpt", "bench", v)
+                lat.append((time.perf_counter() - t0) * 1000)
+            print(json.dumps({"entries": n, "lookup_p50_ms": round(float(np.percentile(lat, 50)), 3),
+                              "lookup_p99_ms": round(float(np.percentile(lat, 99)), 3)}))
+            cache.close()
+
+        # 3) /ask end-to-end: miss → LLM, hit exacto, hit por paráfrasis
+        llm = FakeOpenAIServer(delay_ms=args.delay_ms).start()
+        os.environ.update(RAG_ANSWER_CACHE="1", RAG_ANSWER_CACHE_PATH=os.path.join(tmp, "answers.sqlite"),
+                          CHATGPT_BASE_URL=llm.base_url, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "x"))
+        if args.thresholds:
+            os.environ["RAG_ANSWER_CACHE_THRESHOLD"] = str(min(args.thresholds))
+        from app_flask import app
+        client = app.test_client()
+        original, paraphrase = PARAPHRASES[0]
+        for label, q in (("miss", original), ("hit_same", original), ("hit_paraphrase", paraphrase)):
+            t0 = time.perf_counter()
+            r = client.post("/ask", json={"question": q, "provider": "chatgpt"}).get_json()
+            print(json.dumps({"case": label, "ms": round((time.perf_counter() - t0) * 1000, 1),
+                              "cached": bool(r.get("cached")), "similarity": r.get("similarity"),
+                              "llm_requests": llm.requests}))
+        print(json.dumps({"answer_cache": pipeline.stats()["answer_cache"]}))
+        llm.stop()
+
+
+if __name__ == "__main__":
+    main()
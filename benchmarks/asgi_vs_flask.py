@@ -0,0 +1,114 @@
+"""Flask (hilos) vs ASGI (uvicorn + achat) con un proveedor lento.
+
+Levanta benchmarks.fake_openai con latencia simulada, arranca cada servidor en un subproceso
+sobre el índice del directorio actual (index.faiss / meta.jsonl) y lo golpea con N clientes
+concurrentes a /ask. Reporta qps, p50/p99 y errores.
+    python -m benchmarks.asgi_vs_flask --delay_ms 800 --concurrency 8 32 64 --requests 256
+"""
+import argparse, asyncio, os, shutil, subprocess, sys, time
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS = ["¿Cuándo inician las clases del segundo semestre 2025?",
+             "¿Qué requisitos hay para la titulación?",
+             "¿Cuántas veces puedo reprobar una asignatura?",
+             "¿Cómo se calcula la nota final?"]
+
+
+def server_cmd(kind, port, threads):
+    if kind == "asgi":
+        return [sys.executable, "-m", "uvicorn", "app_asgi:app", "--host", "127.0.0.1",
+                "--port", str(port), "--log-level", "warning"]
+    if kind == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "app_flask:app", "-b", f"127.0.0.1:{port}",
+                "--workers", "1", "--threads", str(threads), "--log-level", "warning"]
+    # servidor de desarrollo de werkzeug (un hilo por request, sin límite)
+    return [sys.executable, "-m", "flask", "--app", "app_flask", "run", "--port", str(port), "--with-threads"]
+
+
+def start_server(kind, port, threads, env):
+    env = dict(env, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")])))
+    proc = subprocess.Popen(server_cmd(kind, port, threads), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(url + "/stats", timeout=1.0)
+            # primera consulta para cargar modelo e índice antes de medir
+            httpx.post(url + "/ask", json={"question": QUESTIONS[0]}, timeout=120.0)
+            return proc, url
+        except httpx.HTTPError:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{kind} terminó al arrancar (código {proc.returncode})")
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{kind} no respondió")
+
+
+async def load(url, n, concurrency, timeout):
+    lat, errors = [], 0
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def one(i):
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post("/ask", json={"question": QUESTIONS[i % len(QUESTIONS)]})
+                    if r.status_code != 200:
+                        errors += 1
+                        return
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                lat.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n)))
+        wall = time.perf_counter() - t0
+
+    ms = np.array(lat or [0.0]) * 1000
+    return {"qps": round(len(lat) / wall, 1), "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1), "errors": errors, "wall_s": round(wall, 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark Flask con hilos vs ASGI async")
+    ap.add_argument("--requests", type=int, default=256)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 64])
+    ap.add_argument("--delay_ms", type=float, default=800.0, help="latencia simulada del LLM")
+    ap.add_argument("--threads", type=int, default=8, help="hilos de gunicorn para Flask")
+    ap.add_argument("--flask_server", choices=["gunicorn", "werkzeug"],
+                    default="gunicorn" if shutil.which("gunicorn") else "werkzeug")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    fake = FakeOpenAIServer(delay_ms=args.delay_ms).start()
+    env = dict(os.environ, CHATGPT_BASE_URL=fake.base_url)
+    env.setdefault("OPENAI_API_KEY", "fake-key")
+    try:
+        for kind in (args.flask_server, "asgi"):
+            label = f"flask/{kind} --threads {args.threads}" if kind == "gunicorn" else (
+                "flask/werkzeug" if kind == "werkzeug" else "asgi/uvicorn")
+            proc, url = start_server(kind, args.port, args.threads, env)
+            try:
+                print(f"\n=== {label} (LLM {args.delay_ms:.0f} ms) ===")
+                for c in args.concurrency:
+                    r = asyncio.run(load(url, args.requests, c, args.timeout))
+                    print(f"concurrencia {c:>4}: {r}")
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Arranque en frío y latencia por consulta: dense (FAISS) vs hybrid vs lexical (BM25).
+
+Cada modo corre en un proceso nuevo por el mismo camino que app.py (make_retriever), sobre
+index.faiss / meta.jsonl / meta.bm25 del directorio actual. Se mide el tiempo desde que se
+lanza el proceso hasta el primer resultado (incluye importar torch y cargar el modelo en
+dense/hybrid) y luego la latencia de consultas en caliente.
+    python -m benchmarks.bm25_coldstart --repeat 20
+"""
+import argparse, json, os, subprocess, sys, time
+
+CHILD = r"""
+import json, sys, time
+import numpy as np
+spawn_ts, mode, repeat = float(sys.argv[1]), sys.argv[2], int(sys.argv[3])
+queries = json.loads(sys.argv[4])
+from app import make_retriever
+t0 = time.perf_counter()
+retriever = make_retriever(mode, cache_size=0)   # sin caché: se mide la búsqueda
+load_s = time.perf_counter() - t0
+t0 = time.perf_counter()
+retriever.search(queries[0], k=8)
+first_ms = (time.perf_counter() - t0) * 1000
+ready_s = time.time() - spawn_ts
+lat = []
+for _ in range(repeat):
+    for q in queries:
+        t0 = time.perf_counter()
+        retriever.search(q, k=8)
+        lat.append((time.perf_counter() - t0) * 1000)
+print(json.dumps({"mode": mode, "time_to_first_result_s": round(ready_s, 3), "load_s": round(load_s, 3),
+                  "first_query_ms": round(first_ms, 2),
+                  "p50_ms": round(float(np.percentile(lat, 50)), 3), "p99_ms": round(float(np.percentile(lat, 99)), 3),
+                  "torch_loaded": "torch" in sys.modules}))
+"""
+
+DEFAULT_QUERIES = ["eliminación voluntaria de asignaturas", "segundo semestre 2025",
+                   "postergación de estudios", "receso universitario fin de año"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cold start y latencia: dense vs hybrid vs lexical")
+    ap.add_argument("--modes", nargs="+", default=["dense", "hybrid", "lexical"])
+    ap.add_argument("--repeat", type=int, default=20, help="pasadas sobre las consultas (en caliente)")
+    ap.add_argument("--gold", default="gold_set.json", help="preguntas a usar (si existe)")
+    args = ap.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if os.path.exists(args.gold):
+        with open(args.gold, encoding="utf-8") as f:
+            queries = [g["question"] for g in json.load(f)]
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    for mode in args.modes:
+        out = subprocess.run([sys.executable, "-c", CHILD, str(time.time()), mode, str(args.repeat),
+                              json.dumps(queries)], capture_output=True, text=True, env=env)
+        if out.returncode != 0:
+            print(f"[{mode}] ❌ {(out.stderr.strip().splitlines() or ['error'])[-1]}")
+            continue
+        print(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Arranque y memoria: meta.jsonl en memoria vs meta.store (mmap).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.chunk_store --n 50000 200000
+Cada modo se mide en un proceso nuevo (Linux, /proc/self/status). La memoria se separa en
+RssAnon (privada del proceso) y RssFile (páginas del archivo mapeado: compartidas entre
+workers y recuperables por el kernel).
+"""
+import argparse, json, os, random, subprocess, sys, tempfile, time
+
+from rag.chunk_store import ChunkStore, MemoryChunkStore, write_store
+
+
+def rss_mb():
+    out = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                out[line.split(":")[0]] = int(line.split()[1]) / 1024
+    return out.get("RssAnon", 0.0), out.get("RssFile", 0.0)
+
+
+def make_corpus(tmp, n, chars):
+    rng = random.Random(0)
+    words = ["reglamento", "estudiante", "semestre", "asignatura", "calendario", "académico",
+             "evaluación", "matrícula", "convivencia", "vigencia", "año", "2025"]
+    meta_jsonl = os.path.join(tmp, "meta.jsonl")
+
+    def rows():
+        for i in range(n):
+            text = " ".join(rng.choice(words) for _ in range(chars // 9))[:chars]
+            yield {"vid": i, "title": f"Documento {i % 50}", "text": text,
+                   "doc": f"doc{i % 50}.pdf", "vigencia": 2020 + i % 6}
+
+    with open(meta_jsonl, "w", encoding="utf-8") as f:
+        for r in rows():
+            f.write(json.dumps({"vid": r["vid"], "title": r["title"], "text": r["text"]}, ensure_ascii=False) + "\n")
+    write_store(os.path.join(tmp, "meta.store"), rows())
+    return meta_jsonl
+
+
+def child(mode, tmp, n, k=8, queries=1000):
+    base = rss_mb()
+    t0 = time.perf_counter()
+    store = MemoryChunkStore.from_jsonl(os.path.join(tmp, "meta.jsonl")) if mode == "jsonl" \
+        else ChunkStore(os.path.join(tmp, "meta.store"))
+    load_s = time.perf_counter() - t0
+    load_rss = rss_mb()
+
+    rng = random.Random(1)
+    t0 = time.perf_counter()
+    for _ in range(queries):
+        for vid in rng.sample(range(n), k):
+            row = store.row_of(vid)
+            store.title(row), store.text(row)
+    lookup_us = (time.perf_counter() - t0) / queries * 1e6
+    end_rss = rss_mb()
+    print(json.dumps({"mode": mode, "n": n, "load_s": round(load_s, 4),
+                      "anon_after_load_mb": round(load_rss[0] - base[0], 1),
+                      "anon_after_queries_mb": round(end_rss[0] - base[0], 1),
+                      "file_after_queries_mb": round(end_rss[1] - base[1], 1),
+                      "top8_decode_us": round(lookup_us, 1)}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark meta.jsonl vs meta.store")
+    ap.add_argument("--n", type=int, nargs="+", default=[20000, 100000])
+    ap.add_argument("--chars", type=int, default=1200, help="largo aprox. de cada chunk")
+    ap.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        mode, tmp, n = args.child
+        return child(mode, tmp, int(n))
+
+    for n in args.n:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_corpus(tmp, n, args.chars)
+            size = os.path.getsize(os.path.join(tmp, "meta.jsonl")) / 2**20
+            print(f"\n=== N={n} chunks (meta.jsonl {size:.1f} MB) ===")
+            for mode in ("jsonl", "store"):
+                out = subprocess.run([sys.executable, "-m", "benchmarks.chunk_store", "--child", mode, tmp, str(n)],
+                                     capture_output=True, text=True, check=True).stdout
+                print(out.strip())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Tokens de contexto: unir los 8 chunks tal cual vs rag.context.pack_context.
+
+Recupera el top-k de cada pregunta de gold_set.json (índice del directorio actual) y reporta,
+por presupuesto, tokens promedio enviados, ahorro, y si la evidencia anotada sigue en el
+contexto empaquetado (para verificar que el recorte no pierde la respuesta).
+    python -m benchmarks.context_packing --retrieval lexical --budgets 0 2500 1500 1000
+"""
+import argparse, json
+
+import numpy as np
+
+from evaluate_retrieval import first_hit
+from rag.context import pack_context
+from rag.pipeline import make_retriever
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ahorro de tokens del empaquetado de contexto")
+    ap.add_argument("--gold", default="gold_set.json")
+    ap.add_argument("--retrieval", choices=["dense", "hybrid", "lexical"], default="dense")
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--budgets", type=int, nargs="+", default=[0, 2500, 1500, 1000], help="0 = sin límite")
+    args = ap.parse_args()
+
+    with open(args.gold, encoding="utf-8") as f:
+        gold = json.load(f)
+    retriever = make_retriever(args.retrieval)
+    tops = [retriever.search(g["question"], k=args.k) for g in gold]
+
+    naive = np.array([pack_context(top, budget=0)[2]["tokens_naive"] for top in tops])
+    base_hits = sum(1 for g, top in zip(gold, tops) if first_hit(top, g.get("evidence") or {}))
+    print(f"{len(gold)} preguntas, top-{args.k}: {naive.mean():.0f} tokens promedio sin empaquetar "
+          f"(máx {naive.max()}), evidencia presente en {base_hits}")
+    for budget in args.budgets:
+        packed, hits, truncated = [], 0, 0
+        for g, top in zip(gold, tops):
+            _, used, st = pack_context(top, budget=budget)
+            packed.append(st["tokens_packed"])
+            truncated += st["truncated"]
+            hits += bool(first_hit(used, g.get("evidence") or {}))
+        packed = np.array(packed)
+        label = "sin límite" if budget == 0 else f"{budget} tokens"
+        print(f"[{label:>11}] promedio {packed.mean():.0f} tokens (máx {packed.max()}) | "
+              f"ahorro {100 * (1 - packed.sum() / max(naive.sum(), 1)):.1f}% | "
+              f"truncados {truncated} | evidencia presente en {hits}/{len(gold)}")
+
+
+if __name__ == "__main__":
+    main()
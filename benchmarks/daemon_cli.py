@@ -0,0 +1,80 @@
+"""Latencia de punta a punta de `python app.py "pregunta"`: carga en proceso vs rag.daemon.
+
+Usa el índice del directorio actual y benchmarks.fake_openai como LLM (latencia 0), así que el
+tiempo medido es arranque + recuperación + armado del prompt. Levanta el daemon en un
+subproceso, espera a que responda y corre el CLI --runs veces en cada modo.
+    python -m benchmarks.daemon_cli --runs 5 --retrieval dense
+"""
+import argparse, os, subprocess, sys, time
+
+import numpy as np
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTION = "¿Cuándo inician las clases del segundo semestre 2025?"
+
+
+def run_cli(env, retrieval, runs, no_daemon):
+    cmd = [sys.executable, os.path.join(ROOT, "app.py"), QUESTION, "--retrieval", retrieval]
+    if no_daemon:
+        cmd.append("--no_daemon")
+    walls = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+        walls.append(time.perf_counter() - t0)
+    w = np.array(walls)
+    return {"mean_s": round(float(w.mean()), 3), "p50_s": round(float(np.median(w)), 3),
+            "min_s": round(float(w.min()), 3), "max_s": round(float(w.max()), 3)}
+
+
+def wait_daemon(proc, addr, timeout=300):
+    from rag.daemon import DaemonClient
+    host, _, port = addr.rpartition(":")
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"el daemon terminó al arrancar (código {proc.returncode})")
+        client = DaemonClient.connect((host, int(port)))
+        if client is not None:
+            client.close()
+            return time.perf_counter() - t0
+        time.sleep(0.1)
+    raise RuntimeError("el daemon no respondió")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="app.py en proceso vs con daemon de recuperación")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--retrieval", choices=["dense", "hybrid", "lexical"], default="dense")
+    ap.add_argument("--addr", default="127.0.0.1:8392")
+    args = ap.parse_args()
+
+    fake = FakeOpenAIServer().start()
+    env = dict(os.environ, CHATGPT_BASE_URL=fake.base_url, RAG_DAEMON_ADDR=args.addr,
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    env.setdefault("OPENAI_API_KEY", "fake-key")
+    try:
+        local = run_cli(env, args.retrieval, args.runs, no_daemon=True)
+        print(f"en proceso   : {local}")
+
+        proc = subprocess.Popen([sys.executable, "-m", "rag.daemon", "--addr", args.addr,
+                                 "--preload", args.retrieval], env=env, cwd=os.getcwd(),
+                                stdout=subprocess.DEVNULL)
+        try:
+            os.environ["RAG_DAEMON_ADDR"] = args.addr
+            startup = wait_daemon(proc, args.addr)
+            print(f"daemon listo en {startup:.2f}s (una sola vez)")
+            remote = run_cli(env, args.retrieval, args.runs, no_daemon=False)
+            print(f"con daemon   : {remote}")
+            print(f"aceleración p50: x{local['p50_s'] / remote['p50_s']:.1f}")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
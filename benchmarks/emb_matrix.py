@@ -0,0 +1,143 @@
+"""Matriz de embeddings: embeddings.npz + argsort (formato anterior) vs shards .npy con mmap (rag/emb_matrix.py).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.emb_matrix --n 10000 100000 1000000
+Por cada N se genera una matriz sintética [N, 384] (vectores agrupados en temas, normalizados)
+y se escribe en los cuatro formatos. Cada modo se mide en un proceso nuevo (Linux,
+/proc/self/status), con las páginas de los archivos sacadas del page cache antes de lanzarlo
+(posix_fadvise DONTNEED), así que la carga es en frío:
+  npz      → np.load(...npz)["E"] + E @ qv + np.argsort (lo que hacían retriever_jsonl y cmd_query)
+  f32/f16/int8 → EmbeddingMatrix (mmap) + producto por bloques + argpartition
+Se reporta tiempo de carga, RssAnon/RssFile tras cargar y tras las consultas, pico (VmHWM),
+latencia p50/p99 y recall@k contra el top-k exacto en float32.
+"""
+import argparse, json, os, subprocess, sys, tempfile, time
+import numpy as np
+
+from rag.emb_matrix import EmbeddingMatrix, write_matrix
+
+MODES = {"npz": None, "f32": "float32", "f16": "float16", "int8": "int8"}
+
+
+def status_mb():
+    out = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:", "VmHWM:")):
+                out[line.split(":")[0]] = int(line.split()[1]) / 1024
+    return out
+
+
+def make_matrix(n, d, seed=0, topics=256, block=100000):
+    # temas + ruido: los vecinos de una consulta no son casi equidistantes como con ruido puro
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, d)).astype(np.float32)
+    E = np.empty((n, d), dtype=np.float32)
+    for s in range(0, n, block):
+        e = min(s + block, n)
+        E[s:e] = centers[rng.integers(0, topics, e - s)] + 0.8 * rng.standard_normal((e - s, d)).astype(np.float32)
+        E[s:e] /= np.linalg.norm(E[s:e], axis=1, keepdims=True)
+    return E
+
+
+def make_queries(E, q, seed=1):
+    rng = np.random.default_rng(seed)
+    Q = E[rng.integers(0, len(E), q)] + 0.5 * rng.standard_normal((q, E.shape[1])).astype(np.float32) / np.sqrt(E.shape[1])
+    return Q / np.linalg.norm(Q, axis=1, keepdims=True)
+
+
+def drop_cache(d):
+    for name in os.listdir(d):
+        fd = os.open(os.path.join(d, name), os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def child(mode, d, k, block_rows):
+    Q = np.load(os.path.join(os.path.dirname(d), "queries.npy"))
+    base = status_mb()
+    t0 = time.perf_counter()
+    if mode == "npz":
+        E = np.load(os.path.join(d, "embeddings.npz"))["E"]
+    else:
+        M = EmbeddingMatrix(d)
+    load_s = time.perf_counter() - t0
+    load = status_mb()
+
+    lat, top = [], []
+    for qv in Q:
+        t0 = time.perf_counter()
+        if mode == "npz":
+            sims = E @ qv
+            idx = np.argsort(-sims)[:k]
+        else:
+            idx, _ = M.search(qv, k, block_rows)
+        lat.append((time.perf_counter() - t0) * 1000)
+        top.append([int(i) for i in idx])
+    end = status_mb()
+    print(json.dumps({"mode": mode, "load_s": round(load_s, 3),
+                      "anon_after_load_mb": round(load["RssAnon"] - base["RssAnon"], 1),
+                      "file_after_load_mb": round(load["RssFile"] - base["RssFile"], 1),
+                      "anon_after_queries_mb": round(end["RssAnon"] - base["RssAnon"], 1),
+                      "file_after_queries_mb": round(end["RssFile"] - base["RssFile"], 1),
+                      "peak_mb": round(end["VmHWM"], 1),
+                      "p50_ms": round(float(np.percentile(lat, 50)), 2),
+                      "p99_ms": round(float(np.percentile(lat, 99)), 2),
+                      "top": top}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark embeddings.npz vs shards .npy (mmap, float16/int8)")
+    ap.add_argument("--n", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--block_rows", type=int, default=65536)
+    ap.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    ap.add_argument("--tmp", default=None, help="directorio para las matrices (default: tempdir del sistema)")
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        return child(args.child[0], args.child[1], args.k, args.block_rows)
+
+    for n in args.n:
+        with tempfile.TemporaryDirectory(dir=args.tmp) as tmp:
+            t0 = time.perf_counter()
+            E = make_matrix(n, args.dim)
+            Q = make_queries(E, args.queries)
+            np.save(os.path.join(tmp, "queries.npy"), Q)
+            exact = [set(np.argsort(-(E @ q))[:args.k].tolist()) for q in Q]
+            sizes = {}
+            for mode, dtype in MODES.items():
+                if mode not in args.modes:
+                    continue
+                d = os.path.join(tmp, mode)
+                os.makedirs(d)
+                if dtype is None:
+                    np.savez_compressed(os.path.join(d, "embeddings.npz"), E=E)
+                else:
+                    write_matrix(d, E, dtype)
+                sizes[mode] = sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d)) / 2**20
+            del E
+            print(f"\n=== N={n} d={args.dim} (matrices generadas en {time.perf_counter() - t0:.1f}s) ===")
+            for mode in sizes:
+                d = os.path.join(tmp, mode)
+                drop_cache(d)
+                out = subprocess.run([sys.executable, "-m", "benchmarks.emb_matrix", "--child", mode, d,
+                                      "--k", str(args.k), "--block_rows", str(args.block_rows)],
+                                     capture_output=True, text=True)
+                if out.returncode != 0:
+                    print(f"[{mode}] ❌ {(out.stderr.strip().splitlines() or ['error'])[-1]}")
+                    continue
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                top = r.pop("top")
+                r["recall@k"] = round(float(np.mean([len(exact[i] & set(t)) / args.k for i, t in enumerate(top)])), 4)
+                r["disk_mb"] = round(sizes[mode], 1)
+                print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Paridad ONNX vs torch: deriva de coseno por texto y coincidencia de vecinos top-k.
+
+Codifica las preguntas de gold_set.json y una muestra de chunks (meta.store / meta.jsonl del
+directorio actual) con el backend torch y con el ONNX indicado, y falla (exit 1) si el coseno
+mínimo entre ambos embeddings cae bajo --min_cos.
+    python -m benchmarks.encoder_parity --backend onnx --min_cos 0.999
+    python -m benchmarks.encoder_parity --backend onnx-int8 --min_cos 0.98
+"""
+import argparse, json, os, random, sys
+
+import numpy as np
+
+from rag.encoders import load_encoder
+
+FALLBACK = ["¿Cuándo inician las clases del segundo semestre 2025?",
+            "Reglamento de Régimen de Estudios: eliminación voluntaria de asignaturas.",
+            "Calendario académico 2025, receso universitario de fin de año.",
+            "Postergación de estudios en Dirección de Pregrado o equivalente de la Facultad."]
+
+
+def sample_texts(gold, meta, n_chunks, seed=0):
+    texts = []
+    if os.path.exists(gold):
+        with open(gold, encoding="utf-8") as f:
+            texts += [g["question"] for g in json.load(f)]
+    if os.path.exists(meta) or os.path.isdir(os.path.splitext(meta)[0] + ".store"):
+        from rag.chunk_store import open_store
+        store = open_store(meta)
+        rows = random.Random(seed).sample(range(len(store)), min(n_chunks, len(store)))
+        texts += [store.text(r) for r in rows]
+    return texts or FALLBACK
+
+
+def topk_overlap(A, B, k):
+    # para cada texto, fracción de sus k vecinos (en el mismo conjunto) que ambos backends coinciden
+    k = min(k, len(A) - 1)
+    if k < 1:
+        return 1.0
+    def neigh(E):
+        S = E @ E.T
+        np.fill_diagonal(S, -np.inf)
+        return np.argsort(-S, axis=1)[:, :k]
+    na, nb = neigh(A), neigh(B)
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(na, nb)]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Paridad de embeddings ONNX vs torch")
+    ap.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    ap.add_argument("--backend", choices=["onnx", "onnx-int8"], default="onnx")
+    ap.add_argument("--onnx_dir", default=None)
+    ap.add_argument("--gold", default="gold_set.json")
+    ap.add_argument("--meta", default="meta.jsonl")
+    ap.add_argument("--chunks", type=int, default=200, help="chunks de muestra")
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--min_cos", type=float, default=None, help="default: 0.999 (onnx) / 0.98 (onnx-int8)")
+    args = ap.parse_args()
+    min_cos = args.min_cos if args.min_cos is not None else (0.999 if args.backend == "onnx" else 0.98)
+
+    texts = sample_texts(args.gold, args.meta, args.chunks)
+    ref = load_encoder(args.model, "torch").encode(texts, normalize_embeddings=True)
+    got = load_encoder(args.model, args.backend, args.onnx_dir).encode(texts, normalize_embeddings=True)
+    assert got.dtype == np.float32 and got.shape == ref.shape, (got.dtype, got.shape, ref.shape)
+
+    cos = np.sum(ref * got, axis=1)
+    report = {"backend": args.backend, "texts": len(texts), "min_cos": round(float(cos.min()), 6),
+              "mean_cos": round(float(cos.mean()), 6), "p01_cos": round(float(np.percentile(cos, 1)), 6),
+              "max_abs_diff": round(float(np.abs(ref - got).max()), 6),
+              f"top{args.k}_overlap": round(topk_overlap(ref, got, args.k), 4), "threshold": min_cos}
+    print(json.dumps(report, ensure_ascii=False))
+    if cos.min() < min_cos:
+        worst = int(np.argmin(cos))
+        print(f"❌ coseno mínimo {cos.min():.6f} < {min_cos} (texto: {texts[worst][:80]!r})")
+        sys.exit(1)
+    print("✅ paridad OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Backends de embeddings: costo de importación, carga, throughput y memoria.
+
+Cada backend se mide en un proceso nuevo (Linux, /proc/self/status):
+  import_s      → importar el runtime (torch + sentence-transformers vs onnxruntime + tokenizers)
+  load_s        → construir el encoder (leer pesos)
+  queries/s     → consultas cortas de a una (camino de /ask)
+  chunks/s      → chunks de ~400 tokens en batches de --batch (camino de la ingesta)
+  rss_mb / peak_mb → memoria residente tras la carga y pico durante el encode
+    python -m benchmarks.encoders --backends torch onnx onnx-int8 --chunks 256
+"""
+import argparse, json, os, subprocess, sys
+
+CHILD = r"""
+import json, os, sys, time
+def rss():
+    out = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                out[line.split(":")[0]] = int(line.split()[1]) / 1024
+    return out.get("VmRSS", 0.0), out.get("VmHWM", 0.0)
+backend, model, onnx_dir, n_chunks, n_queries, batch = sys.argv[1:7]
+n_chunks, n_queries, batch = int(n_chunks), int(n_queries), int(batch)
+t0 = time.perf_counter()
+if backend == "torch":
+    import sentence_transformers
+else:
+    import onnxruntime, tokenizers
+import_s = time.perf_counter() - t0
+from rag.encoders import load_encoder
+t0 = time.perf_counter()
+enc = load_encoder(model, backend, onnx_dir or None)
+load_s = time.perf_counter() - t0
+load_rss = rss()[0]
+words = ("reglamento estudiante semestre asignatura calendario académico evaluación matrícula "
+         "convivencia vigencia eliminación voluntaria postergación agosto diciembre 2025").split()
+chunk = " ".join(words[i % len(words)] for i in range(300))
+queries = [f"¿Cuándo es la {words[i % len(words)]} del semestre {i}?" for i in range(n_queries)]
+enc.encode(queries[:2], normalize_embeddings=True)
+t0 = time.perf_counter()
+for q in queries:
+    enc.encode([q], normalize_embeddings=True)
+q_per_s = n_queries / (time.perf_counter() - t0)
+t0 = time.perf_counter()
+E = enc.encode([chunk] * n_chunks, batch_size=batch, normalize_embeddings=True)
+c_per_s = n_chunks / (time.perf_counter() - t0)
+print(json.dumps({"backend": backend, "import_s": round(import_s, 2), "load_s": round(load_s, 2),
+                  "queries_per_s": round(q_per_s, 1), "chunks_per_s": round(c_per_s, 1),
+                  "rss_mb": round(load_rss, 1), "peak_mb": round(rss()[1], 1),
+                  "torch_loaded": "torch" in sys.modules, "dtype": str(E.dtype)}))
+"""
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de backends de embeddings")
+    ap.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    ap.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    ap.add_argument("--onnx_dir", default="")
+    ap.add_argument("--chunks", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=32)
+    args = ap.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    for b in args.backends:
+        out = subprocess.run([sys.executable, "-c", CHILD, b, args.model, args.onnx_dir, str(args.chunks),
+                              str(args.queries), str(args.batch)], capture_output=True, text=True, env=env)
+        if out.returncode != 0:
+            print(f"[{b}] ❌ {(out.stderr.strip().splitlines() or ['error'])[-1]}")
+            continue
+        print(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
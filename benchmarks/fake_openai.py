@@ -0,0 +1,154 @@
+"""Servidor local compatible con la API de chat de OpenAI, para pruebas y benchmarks sin red.
+
+    python -m benchmarks.fake_openai --port 8011 --delay_ms 200
+    CHATGPT_BASE_URL=http://127.0.0.1:8011/v1 OPENAI_API_KEY=x python app.py "..."
+
+Responde POST /v1/chat/completions (normal o stream=True), con keep-alive HTTP/1.1.
+Cuenta conexiones TCP aceptadas y requests, y puede inyectar latencia, cola lenta (slow_rate de los
+requests tardan slow_ms extra) y errores 429/500. Los parámetros se pueden cambiar en caliente.
+"""
+import argparse, json, random, socket, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, delay_ms=0.0, jitter_ms=0.0, token_delay_ms=0.0,
+                 fail_rate=0.0, fail_status=429, answer="Lunes 4 de agosto de 2025.", seed=0,
+                 slow_rate=0.0, slow_ms=0.0):
+        super().__init__((host, port), _Handler)
+        self.delay_ms = delay_ms
+        self.jitter_ms = jitter_ms
+        self.token_delay_ms = token_delay_ms
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.answer = answer
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.failures = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def get_request(self):
+        conn = super().get_request()
+        conn[0].setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)   # sin Nagle: cabeceras y cuerpo van en writes separados
+        with self.lock:
+            self.connections += 1
+        return conn
+
+    def handle_error(self, request, client_address):
+        # un cliente que cancela (p.ej. el perdedor de un hedge) corta la conexión a mitad de respuesta
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections = self.requests = self.failures = 0
+
+    def sample_delay(self):
+        with self.lock:
+            j = self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            if self.slow_rate and self.rng.random() < self.slow_rate:
+                j += self.slow_ms
+            fail = self.rng.random() < self.fail_rate
+        return max(0.0, self.delay_ms + j) / 1000.0, fail
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        srv = self.server
+        with srv.lock:
+            srv.requests += 1
+        delay, fail = srv.sample_delay()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "not found"}})
+        time.sleep(delay)
+        if fail:
+            with srv.lock:
+                srv.failures += 1
+            return self._send_json(srv.fail_status, {"error": {"message": "fake failure", "type": "rate_limit"}})
+
+        model = req.get("model", "fake")
+        created = int(time.time())
+        if not req.get("stream"):
+            return self._send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": srv.answer}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(data: str, last=False):
+            b = data.encode("utf-8")
+            # el último chunk va junto al terminador para que el cliente lea la respuesta completa
+            self.wfile.write(f"{len(b):x}\r\n".encode() + b + b"\r\n" + (b"0\r\n\r\n" if last else b""))
+            self.wfile.flush()
+
+        for i, piece in enumerate(srv.answer.split(" ")):
+            delta = {"content": piece if i == 0 else " " + piece}
+            chunk("data: " + json.dumps({"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                                         "created": created, "model": model,
+                                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}) + "\n\n")
+            if srv.token_delay_ms:
+                time.sleep(srv.token_delay_ms / 1000.0)
+        chunk("data: [DONE]\n\n", last=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Servidor falso compatible con OpenAI")
+    ap.add_argument("--port", type=int, default=8011)
+    ap.add_argument("--delay_ms", type=float, default=0.0)
+    ap.add_argument("--jitter_ms", type=float, default=0.0)
+    ap.add_argument("--token_delay_ms", type=float, default=0.0)
+    ap.add_argument("--slow_rate", type=float, default=0.0, help="fracción de requests con slow_ms extra")
+    ap.add_argument("--slow_ms", type=float, default=0.0)
+    ap.add_argument("--fail_rate", type=float, default=0.0)
+    ap.add_argument("--fail_status", type=int, default=429)
+    args = ap.parse_args()
+    srv = FakeOpenAIServer(port=args.port, delay_ms=args.delay_ms, jitter_ms=args.jitter_ms,
+                           token_delay_ms=args.token_delay_ms, fail_rate=args.fail_rate,
+                           fail_status=args.fail_status, slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+    print(f"Servidor falso en {srv.base_url}")
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Búsqueda filtrada por metadatos: IDSelector dentro de FAISS (rag/filters.py) vs post-filtrar un k mayor.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.filtered_search --n 100000 --index_types flat ivf hnsw
+Corpus sintético [N, 384] repartido en --docs documentos de tamaño desigual (Zipf), cada uno con
+sus propios temas (los chunks de un documento quedan cerca entre sí, como en la normativa real) y
+un año de vigencia. Filtros:
+  selectivo → un documento chico (~0.1% de las filas)
+  medio     → el año de vigencia más frecuente (~25%)
+  amplio    → vigencia>=2018 (~85%)
+Para cada tipo de índice y filtro se compara:
+  selector   → Selection.search: index.search con SearchParameters(sel=IDSelector), o búsqueda
+               exacta sobre las filas admitidas en HNSW con filtros selectivos (lo que hace RetrieverFAISS)
+  post xM    → index.search con k·M y descartar lo que no cumple el filtro
+Se reporta latencia p50/p99, recall@k contra el top-k exacto dentro del subconjunto y el
+porcentaje de consultas que devuelven k resultados.
+"""
+import argparse, json, time
+import numpy as np
+import faiss
+
+from benchmarks.emb_matrix import make_queries
+from rag.filters import FacetIndex, parse_filter
+from rag.index_types import make_index
+
+YEARS = list(range(2015, 2026))
+
+
+def make_corpus(n, d, docs, seed=0, topics_per_doc=3):
+    # tamaños Zipf: pocos documentos grandes y muchos chicos
+    rng = np.random.default_rng(seed)
+    sizes = 1.0 / np.arange(1, docs + 1)
+    counts = np.maximum(1, np.floor(sizes / sizes.sum() * n)).astype(int)
+    counts[0] += n - counts.sum()
+    doc_of = np.repeat(np.arange(docs), counts)
+    centers = rng.standard_normal((docs, topics_per_doc, d)).astype(np.float32)
+    E = centers[doc_of, rng.integers(0, topics_per_doc, n)] + 0.8 * rng.standard_normal((n, d)).astype(np.float32)
+    E /= np.linalg.norm(E, axis=1, keepdims=True)
+    # vigencia: 80% de los documentos desde 2018, el resto antes
+    year_of_doc = np.where(rng.random(docs) < 0.8, rng.choice(YEARS[3:], docs), rng.choice(YEARS[:3], docs))
+    return E, doc_of, year_of_doc[doc_of]
+
+
+def pick_filters(doc_of, years):
+    n = len(doc_of)
+    counts = np.bincount(doc_of)
+    small = int(np.argmin(np.abs(counts - 0.001 * n)))
+    year = int(np.bincount(years).argmax())
+    return {"selectivo": f"doc=doc{small:04d}.pdf", "medio": f"vigencia={year}", "amplio": "vigencia>=2018"}
+
+
+def timed(fn, Q):
+    lat, out = [], []
+    for q in Q:
+        t0 = time.perf_counter()
+        out.append(fn(q[None, :]))
+        lat.append((time.perf_counter() - t0) * 1000)
+    return out, lat
+
+
+def main():
+    ap = argparse.ArgumentParser(description="IDSelector vs post-filtrado en búsquedas con filtro por metadatos")
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--docs", type=int, default=400)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--overfetch", type=int, nargs="+", default=[4, 16])
+    ap.add_argument("--index_types", nargs="+", choices=["flat", "ivf", "hnsw", "ivfsq", "ivfpq"],
+                    default=["flat", "ivf", "hnsw"])
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    E, doc_of, years = make_corpus(args.n, args.dim, args.docs)
+    # ids no contiguos, como tras varios builds incrementales (IndexIDMap2)
+    ids = np.arange(args.n, dtype=np.int64) * 2 + 1000
+    facets = FacetIndex.from_columns(ids, [f"Documento {i}" for i in doc_of], [f"doc{i:04d}.pdf" for i in doc_of], years)
+    Q = make_queries(E, args.queries)
+    filters = pick_filters(doc_of, years)
+    print(f"=== N={args.n} d={args.dim} docs={args.docs} k={args.k} (corpus en {time.perf_counter() - t0:.1f}s) ===")
+
+    sels, exact = {}, {}
+    for name, spec in filters.items():
+        t0 = time.perf_counter()
+        sel = facets.selection(parse_filter(spec))
+        build_ms = (time.perf_counter() - t0) * 1000
+        sels[name] = sel
+        # top-k exacto dentro del subconjunto (fuerza bruta sobre las filas admitidas)
+        S = Q @ E[sel.rows].T
+        top = np.argsort(-S, axis=1)[:, :args.k]
+        exact[name] = [set(sel.ids[t].tolist()) for t in top]
+        print(json.dumps({"filter": name, "spec": spec, "rows": sel.count, "fraction": round(sel.fraction, 4),
+                          "selector": type(sel.selector).__name__, "build_ms": round(build_ms, 2)}))
+
+    for kind in args.index_types:
+        t0 = time.perf_counter()
+        base = make_index(kind, args.dim, args.n)
+        if not base.is_trained:
+            base.train(E)
+        index = faiss.IndexIDMap2(base)
+        index.add_with_ids(E, ids)
+        print(f"\n--- {kind} (build {time.perf_counter() - t0:.1f}s) ---")
+        for name, sel in sels.items():
+            allowed = set(sel.ids.tolist())
+            variants = [("selector", lambda q: sel.search(index, q, args.k)[1][0])]
+            for m in args.overfetch:
+                def post(q, m=m):
+                    found = index.search(q, args.k * m)[1][0]
+                    return np.array([i for i in found if i in allowed][:args.k], dtype=np.int64)
+                variants.append((f"post x{m}", post))
+            for label, fn in variants:
+                out, lat = timed(fn, Q)
+                got = [set(int(i) for i in r if i >= 0) for r in out]
+                print(json.dumps({"index": kind, "filter": name, "method": label,
+                                  "p50_ms": round(float(np.percentile(lat, 50)), 3),
+                                  "p99_ms": round(float(np.percentile(lat, 99)), 3),
+                                  f"recall@{args.k}": round(float(np.mean([len(g & e) / len(e) for g, e in zip(got, exact[name])])), 4),
+                                  "full_k": round(float(np.mean([len(g) >= min(args.k, sel.count) for g in got])), 4)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Hot-reload del índice bajo carga: ningún request falla y el p99 no se dispara durante el cambio.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.hot_reload --n 100000 --workers 2 --clients 16 --duration 40 --swap_every 5
+Publica dos versiones sintéticas (indexes/v1 y indexes/v2, rag/bundles.py) en un directorio temporal,
+levanta app_flask con gunicorn.conf.py y le manda /ask en lazo cerrado desde --clients hilos mientras
+cada --swap_every segundos alterna la versión activa: una vez con POST /admin/reload (recarga el worker
+que atiende y escribe indexes/CURRENT) y otra escribiendo solo indexes/CURRENT (los workers la toman
+con su watcher, RAG_RELOAD_INTERVAL=1). Reporta p50/p99 de los requests que empezaron cerca de un
+cambio (--window segundos después) contra el resto, errores y las versiones que siguen vivas al final.
+Termina con código 1 si algún request falló o si quedó un worker con otra versión.
+Con --dim debe coincidir la dimensión del modelo (384 para all-MiniLM-L6-v2).
+"""
+import argparse, json, os, shutil, subprocess, sys, tempfile, threading, time
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.preload_workers import QUESTIONS, ROOT, children, free_port, make_workspace
+from rag import bundles
+
+
+def publish_versions(tmp, n, dim):
+    root = os.path.join(tmp, "indexes")
+    for seed, version in enumerate(("v1", "v2")):
+        src = os.path.join(tmp, f"build-{version}")
+        os.makedirs(src)
+        make_workspace(src, n + seed * 1000, dim, seed=seed)
+        bundles.publish(os.path.join(src, "index.faiss"), os.path.join(src, "meta.jsonl"),
+                        version=version, root=root, make_active=False)
+        shutil.rmtree(src)
+    bundles.activate("v1", root)
+    return root
+
+
+def start_server(tmp, port, workers, threads, env, timeout):
+    cmd = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+           "--chdir", tmp, "--log-level", "warning", "app_flask:app"]
+    env = dict(env, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads), GUNICORN_BIND=f"127.0.0.1:{port}")
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    while True:
+        try:
+            httpx.get(url + "/stats", timeout=1.0)
+            return proc, url
+        except httpx.HTTPError:
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn terminó al arrancar (código {proc.returncode})")
+            if time.perf_counter() - t0 > timeout:
+                proc.kill()
+                raise RuntimeError("gunicorn no respondió")
+            time.sleep(0.2)
+
+
+def client_loop(url, stop, out, i):
+    with httpx.Client(base_url=url, timeout=60.0) as client:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                status = client.post("/ask", json={"question": QUESTIONS[i % len(QUESTIONS)]}).status_code
+            except httpx.HTTPError:
+                status = -1
+            out.append((t0, time.perf_counter() - t0, status))
+            i += 1
+
+
+def summary(lat_s):
+    ms = np.array(lat_s or [0.0]) * 1000
+    return {"requests": len(lat_s), "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1), "max_ms": round(float(ms.max()), 1)}
+
+
+def worker_versions(url, workers, tries=50):
+    # /stats lo atiende un worker cualquiera: se pregunta hasta ver a todos
+    seen = {}
+    with httpx.Client(base_url=url, timeout=10.0) as client:
+        for _ in range(tries):
+            s = client.get("/stats").json()
+            seen[s["pid"]] = s.get("index_version")
+            if len(seen) >= workers:
+                break
+    return seen
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latencia y errores de /ask durante cambios de versión del índice")
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=8, help="hilos por worker de gunicorn")
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=40.0)
+    ap.add_argument("--swap_every", type=float, default=5.0)
+    ap.add_argument("--window", type=float, default=2.0, help="segundos tras un cambio que cuentan como 'durante'")
+    ap.add_argument("--delay_ms", type=float, default=50.0, help="latencia del LLM simulado")
+    ap.add_argument("--timeout", type=float, default=300.0)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="hot_reload_")
+    llm = FakeOpenAIServer(delay_ms=args.delay_ms).start()
+    proc = None
+    try:
+        t0 = time.perf_counter()
+        root = publish_versions(tmp, args.n, args.dim)
+        print(f"=== N={args.n} d={args.dim} versiones={bundles.list_versions(root)} "
+              f"(publicadas en {time.perf_counter() - t0:.1f}s) ===")
+        env = dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "x"), CHATGPT_BASE_URL=llm.base_url,
+                   RAG_CACHE_SIZE="0", RAG_RELOAD_INTERVAL="1", RAG_INDEX_MMAP="1",
+                   PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])))
+        env.pop("RAG_ADMIN_TOKEN", None)
+        proc, url = start_server(tmp, free_port(), args.workers, args.threads, env, args.timeout)
+        # calentamiento: todos los workers con la versión inicial cargada
+        for _ in range(4 * args.workers):
+            httpx.post(url + "/ask", json={"question": QUESTIONS[0]}, timeout=120.0)
+
+        stop, results, swaps = threading.Event(), [], []
+        clients = [threading.Thread(target=client_loop, args=(url, stop, results, i), daemon=True)
+                   for i in range(args.clients)]
+        for c in clients:
+            c.start()
+        t_end = time.perf_counter() + args.duration
+        n_swap = 0
+        while time.perf_counter() + args.swap_every < t_end:
+            time.sleep(args.swap_every)
+            n_swap += 1
+            target = "v2" if n_swap % 2 else "v1"
+            ts = time.perf_counter()
+            if n_swap % 2:
+                r = httpx.post(url + "/admin/reload", json={"version": target}, timeout=120.0)
+                info = {"via": "admin", "status": r.status_code, "load_sec": r.json().get("last_load_sec")}
+            else:
+                bundles.activate(target, root)
+                info = {"via": "CURRENT"}
+            swaps.append(ts)
+            print(json.dumps({"swap": n_swap, "to": target, "at_s": round(ts - (t_end - args.duration), 1), **info}),
+                  flush=True)
+        time.sleep(max(0.0, t_end - time.perf_counter()))
+        stop.set()
+        for c in clients:
+            c.join()
+
+        errors = sum(1 for _, _, s in results if s != 200)
+        near = [lat for ts, lat, _ in results if any(0 <= ts - s <= args.window for s in swaps)]
+        far = [lat for ts, lat, _ in results if not any(0 <= ts - s <= args.window for s in swaps)]
+        time.sleep(2.0)   # el watcher de cada worker alcanza la última versión
+        versions = worker_versions(url, args.workers)
+        expected = bundles.current_version(root)
+        with httpx.Client(base_url=url, timeout=10.0) as client:
+            info = client.get("/admin/version").json()
+        print(json.dumps({"swaps": len(swaps), "errors": errors, "during_swap": summary(near),
+                          "steady": summary(far), "workers": len(children(proc.pid)),
+                          "worker_versions": sorted(versions.values()), "expected": expected,
+                          "retired_in_use": info.get("retired_in_use"), "reloads": info.get("reloads")}))
+        ok = errors == 0 and set(versions.values()) == {expected}
+        print("[HOT_RELOAD] OK" if ok else "[HOT_RELOAD] FALLÓ")
+        sys.exit(0 if ok else 1)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        llm.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""rag/ingest.py: escritura de chunks.parquet en una pasada vs el flujo de otra revisión.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.ingest_parquet --scales 50 500 --baseline_rev HEAD~1
+Genera un corpus sintético (s copias de cada .txt de --docs_dir, con una fila por archivo en
+sources.csv) y corre ingest_docs en un proceso nuevo por variante:
+  actual        → rag/ingest.py del árbol de trabajo (solo parquet)
+  actual+jsonl  → idem, pidiendo también chunks.jsonl
+  <rev>         → rag/ingest.py de esa revisión (git show), con su CLI por defecto:
+                  p.ej. el flujo anterior JSONL → parquet en dos pasadas
+Reporta tiempo, pico de RSS (VmHWM), tamaño del parquet y si las tablas coinciden.
+"""
+import argparse, csv, json, os, subprocess, sys, tempfile, time
+
+import pyarrow.parquet as pq
+
+from benchmarks.streaming_ingest import make_corpus
+
+CHILD = r"""
+import json, sys, time
+def vm_hwm_mb():
+    # VmHWM y no ru_maxrss: ru_maxrss sobrevive al exec y puede reflejar el RSS del proceso padre
+    with open("/proc/self/status") as f:
+        return next(int(l.split()[1]) for l in f if l.startswith("VmHWM:")) / 1024
+sys.path.insert(0, sys.argv[1])
+from ingest import ingest_docs
+docs, sources, out_parquet, out_jsonl = sys.argv[2:6]
+t0 = time.perf_counter()
+ingest_docs(docs, sources, out_jsonl or None, out_parquet)
+print(json.dumps({"wall_s": time.perf_counter() - t0,
+                  "peak_mb": vm_hwm_mb()}))
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_sources(docs_dir, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["title", "url", "vigencia", "fecha_descarga", "filename"])
+        for i, name in enumerate(sorted(os.listdir(docs_dir))):
+            w.writerow([f"Documento {i}", f"https://www.ufro.cl/doc{i}", 2020 + i % 6, "2025-09-29", name])
+
+
+def module_dir(rev, tmp):
+    # rag/ingest.py de otra revisión, importable como "ingest"
+    if rev is None:
+        return os.path.join(ROOT, "rag")
+    d = os.path.join(tmp, "rev")
+    os.makedirs(d, exist_ok=True)
+    src = subprocess.run(["git", "-C", ROOT, "show", f"{rev}:rag/ingest.py"], capture_output=True, text=True, check=True)
+    with open(os.path.join(d, "ingest.py"), "w", encoding="utf-8") as f:
+        f.write(src.stdout)
+    return d
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de rag/ingest.py: parquet en una pasada vs otra revisión")
+    ap.add_argument("--docs_dir", default="data/docs")
+    ap.add_argument("--scales", type=int, nargs="+", default=[50, 500])
+    ap.add_argument("--baseline_rev", default=None, help="revisión git a comparar (p.ej. HEAD~1)")
+    ap.add_argument("--tmp", default=None)
+    args = ap.parse_args()
+
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(dir=args.tmp) as tmp:
+            docs = os.path.join(tmp, "docs")
+            os.makedirs(docs)
+            size = make_corpus(args.docs_dir, docs, scale)
+            sources = os.path.join(tmp, "sources.csv")
+            write_sources(docs, sources)
+            print(f"\n=== x{scale}: {len(os.listdir(docs))} archivos, {size / 2**20:.1f} MB ===")
+
+            variants = [("actual", None, False), ("actual+jsonl", None, True)]
+            if args.baseline_rev:
+                variants.append((args.baseline_rev, args.baseline_rev, True))
+            ref = None
+            for i, (name, rev, jsonl) in enumerate(variants):
+                out_parquet = os.path.join(tmp, f"chunks_{i}.parquet")
+                out_jsonl = out_parquet[:-len(".parquet")] + ".jsonl" if jsonl else ""
+                out = subprocess.run([sys.executable, "-c", CHILD, module_dir(rev, tmp), docs, sources,
+                                      out_parquet, out_jsonl], capture_output=True, text=True)
+                if out.returncode != 0:
+                    print(f"[{name}] ❌ {(out.stderr.strip().splitlines() or ['error'])[-1]}")
+                    continue
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                table = pq.read_table(out_parquet)
+                ref = table if ref is None else ref
+                print(json.dumps({"variant": name, "chunks": table.num_rows, "wall_s": round(r["wall_s"], 2),
+                                  "peak_rss_mb": round(r["peak_mb"], 1),
+                                  "parquet_mb": round(os.path.getsize(out_parquet) / 2**20, 2),
+                                  "row_groups": pq.ParquetFile(out_parquet).num_row_groups,
+                                  "same_rows": table.to_pylist() == ref.to_pylist()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Compara la ingesta serial vs paralela de rag/ingest.py.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.ingest_workers --docs_dir data/docs --workers 1 2 4
+"""
+import argparse, os, tempfile, time
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from rag.ingest import ingest_docs
+
+
+def run(docs_dir, sources_csv, workers, out_dir):
+    out_parquet = os.path.join(out_dir, f"chunks_w{workers}.parquet")
+    t0 = time.perf_counter()
+    ingest_docs(docs_dir, sources_csv, None, out_parquet, workers=workers)
+    return time.perf_counter() - t0, out_parquet
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de ingesta serial vs paralela")
+    ap.add_argument("--docs_dir", default="data/docs")
+    ap.add_argument("--sources_csv", default="data/sources.csv")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    workers = sorted(set([1] + args.workers))
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for w in workers:
+            times = []
+            for _ in range(args.repeat):
+                dt, out = run(args.docs_dir, args.sources_csv, w, tmp)
+                times.append(dt)
+            results[w] = (min(times), out)
+
+        base_t, base_out = results[1]
+        print("\n=== INGESTA (mejor de %d) ===" % args.repeat)
+        for w, (t, out) in results.items():
+            same = pq.read_table(base_out).equals(pq.read_table(out))
+            print(f"workers={w:<3} {t:8.3f}s  speedup={base_t / t:5.2f}x  salida_idéntica={same}")
+            assert same, f"La salida con workers={w} difiere del modo serial"
+        print(f"\nDocumentos: {len(list(Path(args.docs_dir).glob('*.pdf')) + list(Path(args.docs_dir).glob('*.txt')))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Costo de la instrumentación de rag/metrics.py en el camino caliente.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.metrics_overhead --iters 200000
+    python -m benchmarks.metrics_overhead --search   # además RetrieverFAISS.search con y sin histogramas
+Mide el costo por span (with span(...): pass) con histogramas activos, desactivados (RAG_METRICS=0)
+y dentro de un trace(), contra un bucle vacío. Con --search compara la latencia de
+RetrieverFAISS.search (caché desactivada, así cada consulta pasa por encode + FAISS) con los
+histogramas activos e inactivos, intercalando las corridas.
+"""
+import argparse, json, time
+
+import numpy as np
+
+from rag import metrics
+
+
+def per_call_ns(fn, iters):
+    t0 = time.perf_counter()
+    fn(iters)
+    return (time.perf_counter() - t0) / iters * 1e9
+
+
+def bare(n):
+    for _ in range(n):
+        pass
+
+
+def spans(n):
+    for _ in range(n):
+        with metrics.span("bench"):
+            pass
+
+
+def spans_labeled(n):
+    for _ in range(n):
+        with metrics.span("bench", provider="fake"):
+            pass
+
+
+def spans_traced(n):
+    with metrics.trace():
+        spans(n)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Overhead de los spans/histogramas de rag/metrics.py")
+    ap.add_argument("--iters", type=int, default=200000)
+    ap.add_argument("--search", action="store_true", help="mide también RetrieverFAISS.search")
+    ap.add_argument("--faiss", default="index.faiss")
+    ap.add_argument("--meta", default="meta.jsonl")
+    ap.add_argument("--gold", default="gold_set.json")
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    base = per_call_ns(bare, args.iters)
+    out = {"loop_ns": round(base, 1)}
+    for name, fn in (("span", spans), ("span_labeled", spans_labeled), ("span_in_trace", spans_traced)):
+        metrics.ENABLED = True
+        out[f"{name}_ns"] = round(per_call_ns(fn, args.iters) - base, 1)
+    metrics.ENABLED = False
+    out["span_disabled_ns"] = round(per_call_ns(spans, args.iters) - base, 1)
+    metrics.ENABLED = True
+    print(json.dumps(out))
+
+    if not args.search:
+        return
+    from retriever_faiss import RetrieverFAISS
+    with open(args.gold, encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+    retriever = RetrieverFAISS(args.faiss, args.meta, cache_size=0)
+    retriever.search(questions[0])   # calentamiento
+    lat = {True: [], False: []}
+    for _ in range(args.rounds):
+        for enabled in (True, False):
+            metrics.ENABLED = enabled
+            for q in questions:
+                t0 = time.perf_counter()
+                retriever.search(q, k=8)
+                lat[enabled].append((time.perf_counter() - t0) * 1000)
+    metrics.ENABLED = True
+    for enabled, ms in lat.items():
+        print(json.dumps({"metrics": "on" if enabled else "off", "queries": len(ms),
+                          "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                          "mean_ms": round(float(np.mean(ms)), 3)}))
+
+
+if __name__ == "__main__":
+    main()
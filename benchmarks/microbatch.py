@@ -0,0 +1,61 @@
+"""Throughput de recuperación: search() por consulta vs MicroBatcher, a varios niveles de concurrencia.
+
+Uso (desde la raíz del proyecto, con index.faiss + meta.jsonl construidos):
+    python -m benchmarks.microbatch --concurrency 1 4 16 64 --max_batch 32 --max_wait_ms 3
+"""
+import argparse, json, time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from retriever_faiss import RetrieverFAISS
+from rag.microbatch import MicroBatcher
+
+
+def run(search, questions, concurrency, total, k):
+    lat = []
+
+    def one(i):
+        t0 = time.perf_counter()
+        search(questions[i % len(questions)], k=k)
+        lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, range(total)))
+    wall = time.perf_counter() - t0
+    ms = np.array(lat) * 1000
+    return {"qps": round(total / wall, 1), "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de micro-batching de recuperación")
+    ap.add_argument("--faiss", default="index.faiss")
+    ap.add_argument("--meta", default="meta.jsonl")
+    ap.add_argument("--gold", default="gold_set.json")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    ap.add_argument("--total", type=int, default=512, help="consultas por nivel de concurrencia")
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--max_batch", type=int, default=32)
+    ap.add_argument("--max_wait_ms", type=float, default=3.0)
+    args = ap.parse_args()
+
+    with open(args.gold, encoding="utf-8") as f:
+        questions = [q["question"] for q in json.load(f)]
+    retriever = RetrieverFAISS(args.faiss, args.meta)
+    retriever.search(questions[0], k=args.k)   # calentamiento
+
+    print(f"{'conc':>5} | {'modo':<10} | {'qps':>8} | {'p50 ms':>8} | {'p99 ms':>8} | lote medio")
+    for c in args.concurrency:
+        r = run(retriever.search, questions, c, args.total, args.k)
+        print(f"{c:>5} | {'directo':<10} | {r['qps']:>8} | {r['p50_ms']:>8} | {r['p99_ms']:>8} | 1")
+        batcher = MicroBatcher(retriever.search_batch, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+        r = run(batcher.search, questions, c, args.total, args.k)
+        print(f"{c:>5} | {'microbatch':<10} | {r['qps']:>8} | {r['p50_ms']:>8} | {r['p99_ms']:>8} | "
+              f"{batcher.stats()['avg_batch_size']}")
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
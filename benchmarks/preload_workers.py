@@ -0,0 +1,165 @@
+"""Memoria total de gunicorn con 1, 4 y 8 workers: carga por worker vs mmap vs preload + fork.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.preload_workers --n 200000 --workers 1 4 8
+Arma en un directorio temporal un índice sintético (index.faiss IndexIDMap2 plano [N, dim] y
+meta.store) y levanta app_flask con gunicorn.conf.py en tres modos:
+  lazy     → RAG_PRELOAD=0 RAG_INDEX_MMAP=0: cada worker lee índice y modelo en su primer request
+  mmap     → RAG_PRELOAD=0 RAG_INDEX_MMAP=1: cada worker carga el modelo; el índice es page cache compartido
+  preload  → RAG_PRELOAD=1 RAG_INDEX_MMAP=1: el maestro abre índice/store y carga el modelo antes del fork
+El proveedor es benchmarks.fake_openai. Tras un /ask por worker (hasta ver el store mapeado en
+todos) se suman Rss, Pss y memoria privada (USS) del maestro y los workers desde
+/proc/<pid>/smaps_rollup. Rss cuenta las páginas compartidas una vez por proceso; Pss las reparte
+entre quienes las comparten, así la suma de Pss es la memoria real del conjunto.
+Solo Linux. Con --dim debe coincidir la dimensión del modelo (384 para all-MiniLM-L6-v2).
+"""
+import argparse, json, os, shutil, socket, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+import faiss
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from rag.chunk_store import write_store
+from rag.index_types import write_index
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"lazy": {"RAG_PRELOAD": "0", "RAG_INDEX_MMAP": "0"},
+         "mmap": {"RAG_PRELOAD": "0", "RAG_INDEX_MMAP": "1"},
+         "preload": {"RAG_PRELOAD": "1", "RAG_INDEX_MMAP": "1"}}
+QUESTIONS = ["¿Cuándo inician las clases del segundo semestre 2025?",
+             "¿Qué requisitos hay para la titulación?",
+             "¿Cuántas veces puedo reprobar una asignatura?",
+             "¿Cómo se calcula la nota final?"]
+
+
+def make_workspace(tmp, n, dim, chars=600, seed=0):
+    rng = np.random.default_rng(seed)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    for start in range(0, n, 50000):
+        X = rng.standard_normal((min(50000, n - start), dim)).astype(np.float32)
+        X /= np.linalg.norm(X, axis=1, keepdims=True)
+        index.add_with_ids(X, np.arange(start, start + len(X), dtype=np.int64))
+    write_index(index, os.path.join(tmp, "index.faiss"))
+    words = ["reglamento", "estudiante", "semestre", "asignatura", "calendario", "académico",
+             "evaluación", "matrícula", "convivencia", "vigencia", "año", "2025"]
+    filler = (" ".join(words) + " ") * (chars // 100 + 1)
+    write_store(os.path.join(tmp, "meta.store"),
+                ({"vid": i, "title": f"Documento {i % 50}", "text": f"Fragmento {i}. " + filler[:chars],
+                  "doc": f"doc{i % 50}.pdf", "vigencia": 2020 + i % 6} for i in range(n)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def rollup(pid):
+    # kB → MB de Rss, Pss y USS (Private_Clean + Private_Dirty)
+    out = {"rss": 0.0, "pss": 0.0, "uss": 0.0}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                out[key.lower()] += int(rest.split()[0]) / 1024
+            elif key in ("Private_Clean", "Private_Dirty"):
+                out["uss"] += int(rest.split()[0]) / 1024
+    return out
+
+
+def store_mapped(pid):
+    with open(f"/proc/{pid}/maps") as f:
+        return "texts.bin" in f.read()
+
+
+def run(mode, workers, tmp, llm_url, timeout):
+    port = free_port()
+    env = dict(os.environ, **MODES[mode], WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f"127.0.0.1:{port}",
+               OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "x"), CHATGPT_BASE_URL=llm_url,
+               RAG_CACHE_SIZE="0", PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])))
+    cmd = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+           "--chdir", tmp, "--log-level", "warning", "app_flask:app"]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            try:
+                httpx.get(url + "/stats", timeout=1.0)
+                break
+            except httpx.HTTPError:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"gunicorn terminó al arrancar (código {proc.returncode})")
+                if time.perf_counter() - t0 > timeout:
+                    raise RuntimeError("gunicorn no respondió")
+                time.sleep(0.2)
+        ready_s = time.perf_counter() - t0
+
+        # rondas de requests concurrentes hasta que todos los workers atendieron (store mapeado)
+        def ask(i):
+            return httpx.post(url + "/ask", json={"question": QUESTIONS[i % len(QUESTIONS)]}, timeout=120.0).status_code
+
+        codes = []
+        with ThreadPoolExecutor(2 * workers) as pool:
+            while True:
+                pids = children(proc.pid)
+                if len(pids) == workers and all(store_mapped(p) for p in pids):
+                    break
+                if time.perf_counter() - t0 > timeout:
+                    raise RuntimeError("no todos los workers cargaron el índice")
+                codes += pool.map(ask, range(2 * workers))
+            codes += pool.map(ask, range(2 * workers))   # una ronda más con todos cargados
+        time.sleep(0.5)
+
+        per = {p: rollup(p) for p in [proc.pid] + children(proc.pid)}
+        total = {k: round(sum(m[k] for m in per.values()), 1) for k in ("rss", "pss", "uss")}
+        worker_pss = [m["pss"] for p, m in per.items() if p != proc.pid]
+        return {"mode": mode, "workers": workers, "ready_s": round(ready_s, 2),
+                "requests": len(codes), "errors": sum(c != 200 for c in codes),
+                "rss_total_mb": total["rss"], "pss_total_mb": total["pss"], "uss_total_mb": total["uss"],
+                "master_pss_mb": round(per[proc.pid]["pss"], 1),
+                "worker_pss_mb": round(float(np.mean(worker_pss)), 1)}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="RSS/PSS total de gunicorn con y sin preload + mmap")
+    ap.add_argument("--n", type=int, default=200000, help="vectores/chunks del índice sintético")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    ap.add_argument("--timeout", type=float, default=300.0)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="preload_workers_")
+    llm = FakeOpenAIServer(delay_ms=5).start()
+    try:
+        t0 = time.perf_counter()
+        make_workspace(tmp, args.n, args.dim)
+        size = os.path.getsize(os.path.join(tmp, "index.faiss")) / 2**20
+        print(f"=== N={args.n} d={args.dim} index.faiss={size:.0f} MB (workspace en {time.perf_counter() - t0:.1f}s) ===")
+        for workers in args.workers:
+            for mode in args.modes:
+                print(json.dumps(run(mode, workers, tmp, llm.base_url, args.timeout)), flush=True)
+    finally:
+        llm.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Proveedor nuevo por request (comportamiento anterior) vs registro con pool keep-alive.
+
+Levanta benchmarks.fake_openai en un puerto local y cuenta conexiones TCP y latencia por request.
+    python -m benchmarks.provider_pool --requests 200 --concurrency 1 8
+"""
+import argparse, os, time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "¿Cuándo inician las clases del segundo semestre 2025?"}]
+
+
+def run(server, make_provider, n, concurrency):
+    server.reset_counters()
+    lat = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        make_provider().chat(MESSAGES)
+        lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, range(n)))
+    wall = time.perf_counter() - t0
+    ms = np.array(lat) * 1000
+    return {"connections": server.connections, "requests": server.requests,
+            "mean_ms": round(float(ms.mean()), 2), "p99_ms": round(float(np.percentile(ms, 99)), 2),
+            "wall_s": round(wall, 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de reutilización de clientes de proveedor")
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    ap.add_argument("--delay_ms", type=float, default=0.0, help="latencia simulada del servidor")
+    args = ap.parse_args()
+
+    server = FakeOpenAIServer(delay_ms=args.delay_ms).start()
+    os.environ["CHATGPT_BASE_URL"] = server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+
+    from providers.chatgpt import ChatGPTProvider
+    from providers import registry
+
+    try:
+        for c in args.concurrency:
+            fresh = run(server, lambda: ChatGPTProvider(), args.requests, c)
+            registry.reset()
+            pooled = run(server, lambda: registry.get_provider("chatgpt"), args.requests, c)
+            print(f"\n=== {args.requests} requests, concurrencia {c} ===")
+            print(f"proveedor nuevo por request: {fresh}")
+            print(f"registro + pool keep-alive : {pooled}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Proveedor replay (providers/replay.py): grabar contra un LLM y reproducir el benchmark sin red.
+
+Uso (desde el directorio con index.faiss / meta.jsonl y gold_set.json):
+    python -m benchmarks.replay --delay_ms 800 --jitter_ms 400
+1) record: evaluate_benchmark.run_benchmark con "replay:chatgpt" contra un benchmarks.fake_openai con
+   latencia variable; cada respuesta y su latencia quedan en la grabación.
+2) Se apaga el servidor y se repite el benchmark con cada --latency (REPLAY_LATENCY): mismas respuestas,
+   cero llamadas de red, y la latencia del proveedor según el modo (recorded reproduce la grabada,
+   none deja solo el pipeline propio). Cada modo corre dos veces para mostrar que es repetible.
+3) app_flask (test client): un /ask grabado con el servidor arriba se reproduce offline en /ask y /ask_stream.
+Termina con código 1 si alguna respuesta difiere o alguna pregunta no estaba grabada.
+"""
+import argparse, json, os, sys, tempfile
+
+import numpy as np
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+def summary(label, rows, recorded=None):
+    prov = np.array([r["provider_sec"] for r in rows]) * 1000
+    retr = np.array([r["retrieval_sec"] for r in rows]) * 1000
+    out = {"run": label, "questions": len(rows),
+           "provider_p50_ms": round(float(np.percentile(prov, 50)), 1),
+           "provider_p95_ms": round(float(np.percentile(prov, 95)), 1),
+           "retrieval_p50_ms": round(float(np.percentile(retr, 50)), 1),
+           "total_sec": round(float(sum(r["latency_sec"] for r in rows)), 2)}
+    if recorded is not None:
+        out["same_answers"] = all(a["answer"] == b["answer"] for a, b in zip(rows, recorded))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Grabar y reproducir respuestas del LLM para benchmarks offline")
+    ap.add_argument("--gold", default="gold_set.json")
+    ap.add_argument("--delay_ms", type=float, default=800.0, help="latencia del LLM simulado al grabar")
+    ap.add_argument("--jitter_ms", type=float, default=400.0)
+    ap.add_argument("--latency", nargs="+", default=["recorded", "none", "fixed:200", "lognormal:800:0.5"],
+                    help="modos REPLAY_LATENCY a reproducir")
+    args = ap.parse_args()
+
+    import evaluate_benchmark
+    from providers import registry
+    from rag import pipeline
+    retriever = pipeline.get_retriever()
+    with open(args.gold, encoding="utf-8") as f:
+        gold = json.load(f)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        cassette = os.path.join(tmp, "cassette.jsonl")
+        llm = FakeOpenAIServer(delay_ms=args.delay_ms, jitter_ms=args.jitter_ms, seed=3).start()
+        os.environ.update(CHATGPT_BASE_URL=llm.base_url, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "x"),
+                          REPLAY_CASSETTE=cassette, REPLAY_MODE="record", PROVIDER_MAX_RETRIES="0")
+        try:
+            recorded = evaluate_benchmark.run_benchmark(["replay:chatgpt"], gold, retriever)
+            print(json.dumps({**summary("record", recorded), "llm_requests": llm.requests,
+                              **registry.get_provider("replay:chatgpt").stats()}))
+        finally:
+            llm.stop()
+            registry.reset()
+
+        # sin servidor: cualquier llamada de red fallaría
+        os.environ.update(REPLAY_MODE="replay", CHATGPT_BASE_URL="http://127.0.0.1:9/v1")
+        for mode in args.latency:
+            os.environ["REPLAY_LATENCY"] = mode
+            for run in (1, 2):
+                registry.reset()
+                try:
+                    rows = evaluate_benchmark.run_benchmark(["replay:chatgpt"], gold, retriever)
+                except RuntimeError as e:
+                    print(f"[REPLAY] {e}")
+                    ok = False
+                    continue
+                s = summary(f"replay {mode} #{run}", rows, recorded)
+                if mode == "recorded":
+                    # la latencia reproducida sigue a la grabada pregunta por pregunta
+                    diff = [abs(a["provider_sec"] - b["provider_sec"]) * 1000 for a, b in zip(rows, recorded)]
+                    s["max_diff_vs_recorded_ms"] = round(max(diff), 1)
+                stats = registry.get_provider("replay:chatgpt").stats()
+                print(json.dumps({**s, "hits": stats["hits"], "misses": stats["misses"]}))
+                ok &= s["same_answers"] and stats["misses"] == 0
+
+        # mismo proveedor desde la app web (prompt de rag.pipeline.prepare, con el presupuesto por defecto):
+        # se graba un /ask con el servidor arriba y se reproduce /ask + /ask_stream sin él
+        from app_flask import app
+        client = app.test_client()
+        q = {"question": gold[0]["question"], "provider": "replay:chatgpt"}
+        llm = FakeOpenAIServer(delay_ms=args.delay_ms, seed=4).start()
+        os.environ.update(REPLAY_MODE="record", REPLAY_LATENCY="none", CHATGPT_BASE_URL=llm.base_url)
+        registry.reset()
+        live = (client.post("/ask", json=q).get_json() or {}).get("answer")
+        llm.stop()
+        os.environ.update(REPLAY_MODE="replay", CHATGPT_BASE_URL="http://127.0.0.1:9/v1")
+        registry.reset()
+        r = client.post("/ask", json=q)
+        sse = client.post("/ask_stream", json=q).get_data(as_text=True)
+        streamed = "".join(json.loads(line[len("data: "):])["t"] for event in sse.split("\n\n")
+                           if event.startswith("event: token") for line in event.split("\n")[1:])
+        answer = (r.get_json() or {}).get("answer", "")
+        print(json.dumps({"run": "app_flask", "status": r.status_code, "live": live, "replayed": answer,
+                          "streamed": streamed}))
+        ok &= r.status_code == 200 and bool(live) and answer == streamed == live
+        registry.reset()
+    print("[REPLAY] OK" if ok else "[REPLAY] FALLÓ")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
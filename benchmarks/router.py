@@ -0,0 +1,184 @@
+"""Proveedor router (providers/router.py) contra dos servidores falsos con cola lenta y fallas.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.router --requests 300 --concurrency 8
+Levanta dos benchmarks.fake_openai (chatgpt: rápido con cola lenta; deepseek: algo más lento y estable)
+y corre cuatro fases:
+  tail     → mismos requests directo a cada backend y por el router (chat): p50/p95/p99 y cuántos
+             requests extra costó el hedging
+  failure  → chatgpt responde 500 a todo: el circuito se abre y el router sigue respondiendo con deepseek
+  recovery → chatgpt vuelve: pasado ROUTER_OPEN_SEC, un request de prueba cierra el circuito
+  async    → lo mismo con achat (el perdedor del hedge se cancela), y el circuito con requests de prueba
+             cancelados: chatgpt vuelve lento, la prueba pierde el hedge (achat) o el cliente corta un
+             astream antes del primer token; el circuito debe volver a abrirse (no quedar half-open) y
+             cerrarse cuando chatgpt vuelve a responder rápido
+Termina con código 1 si el router devolvió algún error, el circuito no se abrió/cerró o los contadores
+de victorias superan a los hedges/failovers lanzados.
+"""
+import argparse, asyncio, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "¿Cuándo inician las clases?"}]
+
+
+def summary(name, lat, errors, wall, extra=None):
+    ms = np.array(lat or [0.0]) * 1000
+    out = {"target": name, "requests": len(lat) + errors, "errors": errors,
+           "p50_ms": round(float(np.percentile(ms, 50)), 1), "p95_ms": round(float(np.percentile(ms, 95)), 1),
+           "p99_ms": round(float(np.percentile(ms, 99)), 1), "qps": round(len(lat) / wall, 1)}
+    return {**out, **(extra or {})}
+
+
+def run_sync(provider, n, concurrency):
+    def one(_):
+        t0 = time.perf_counter()
+        try:
+            provider.chat(MESSAGES)
+            return time.perf_counter() - t0
+        except Exception:
+            return None
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        res = list(pool.map(one, range(n)))
+    lat = [r for r in res if r is not None]
+    return lat, len(res) - len(lat), time.perf_counter() - t0
+
+
+async def run_async(provider, n, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    lat, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await provider.achat(MESSAGES)
+                lat.append(time.perf_counter() - t0)
+            except Exception:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return lat, errors, time.perf_counter() - t0
+
+
+async def async_phases(router, a, b, args):
+    def state():
+        return router.stats()["backends"]["chatgpt"]["state"]
+
+    # el perdedor del hedge se cancela
+    a.reset_counters(), b.reset_counters()
+    lat, errors, wall = await run_async(router, args.requests, args.concurrency)
+    print(json.dumps(summary("router_async", lat, errors, wall,
+                             {"upstream_per_request": round((a.requests + b.requests) / args.requests, 3)})))
+    ok = not errors
+
+    # abre el circuito de chatgpt
+    a.fail_rate = 1.0
+    lat, errors, wall = await run_async(router, 20, args.concurrency)
+    opened = state()
+    a.fail_rate, a.delay_ms = 0.0, args.slow_ms * 2
+    ok &= not errors and opened == "open"
+
+    # prueba half-open que pierde el hedge contra deepseek y se cancela
+    await asyncio.sleep(args.open_sec + 0.1)
+    lat, errors, wall = await run_async(router, 1, 1)
+    await asyncio.sleep(0.05)   # la cancelación del perdedor corre en el loop después de responder
+    after_hedge = state()
+    ok &= not errors and after_hedge == "open"
+
+    # astream cerrado por el cliente antes del primer token de la prueba
+    await asyncio.sleep(args.open_sec + 0.1)
+    gen = router.astream(MESSAGES)
+    try:
+        await asyncio.wait_for(gen.__anext__(), timeout=0.2)
+    except asyncio.TimeoutError:
+        pass
+    await gen.aclose()
+    after_stream = state()
+    ok &= after_stream == "open"
+
+    # chatgpt vuelve a responder rápido: la siguiente prueba cierra el circuito
+    a.delay_ms = args.fast_ms
+    await asyncio.sleep(args.open_sec + 0.1)
+    lat, errors, wall = await run_async(router, 20, args.concurrency)
+    recovered = state()
+    ok &= not errors and recovered == "closed"
+    print(json.dumps({"phase": "async_probe", "opened": opened, "after_lost_hedge": after_hedge,
+                      "after_closed_stream": after_stream, "recovered": recovered}))
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Hedging y circuit breaker del proveedor router")
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--fast_ms", type=float, default=150.0, help="latencia base de chatgpt")
+    ap.add_argument("--slow_rate", type=float, default=0.04,
+                    help="fracción de requests lentos de chatgpt (el hedge al p95 recorta colas < 5%%)")
+    ap.add_argument("--slow_ms", type=float, default=2000.0)
+    ap.add_argument("--steady_ms", type=float, default=250.0, help="latencia base de deepseek")
+    ap.add_argument("--open_sec", type=float, default=2.0)
+    args = ap.parse_args()
+
+    a = FakeOpenAIServer(delay_ms=args.fast_ms, jitter_ms=30, slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+                         fail_status=500, seed=1).start()
+    b = FakeOpenAIServer(delay_ms=args.steady_ms, jitter_ms=30, slow_rate=0.01, slow_ms=args.slow_ms,
+                         fail_status=500, seed=2).start()
+    os.environ.update(OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "x"), DEEPSEEK_API_KEY=os.getenv("DEEPSEEK_API_KEY", "x"),
+                      CHATGPT_BASE_URL=a.base_url, DEEPSEEK_BASE_URL=b.base_url, PROVIDER_MAX_RETRIES="0",
+                      ROUTER_BACKENDS="chatgpt,deepseek", ROUTER_OPEN_SEC=str(args.open_sec))
+    from providers import registry
+    ok = True
+    try:
+        print(f"=== chatgpt {args.fast_ms:.0f}ms (+{args.slow_ms:.0f}ms en {args.slow_rate:.0%}) | "
+              f"deepseek {args.steady_ms:.0f}ms | {args.requests} requests, concurrencia {args.concurrency} ===")
+        # tail: directo vs router
+        for name in ("chatgpt", "deepseek", "router"):
+            a.reset_counters(), b.reset_counters()
+            lat, errors, wall = run_sync(registry.get_provider(name), args.requests, args.concurrency)
+            extra = {"upstream_per_request": round((a.requests + b.requests) / args.requests, 3)}
+            print(json.dumps(summary(name, lat, errors, wall, extra)))
+            ok &= not (name == "router" and errors)
+        router = registry.get_provider("router")
+        print(json.dumps({"phase": "tail", **router.stats()}))
+
+        # failure: chatgpt cae
+        a.fail_rate = 1.0
+        a.reset_counters(), b.reset_counters()
+        lat, errors, wall = run_sync(router, args.requests // 2, args.concurrency)
+        state = router.stats()["backends"]["chatgpt"]["state"]
+        print(json.dumps(summary("router_chatgpt_down", lat, errors, wall,
+                                 {"chatgpt_requests": a.requests, "deepseek_requests": b.requests,
+                                  "chatgpt_state": state})))
+        ok &= not errors and state == "open"
+
+        # recovery: chatgpt vuelve y el request de prueba cierra el circuito
+        a.fail_rate = 0.0
+        time.sleep(args.open_sec + 0.1)
+        lat, errors, wall = run_sync(router, args.requests // 2, args.concurrency)
+        state = router.stats()["backends"]["chatgpt"]["state"]
+        print(json.dumps(summary("router_recovered", lat, errors, wall, {"chatgpt_state": state})))
+        ok &= not errors and state == "closed"
+
+        # async: todo en un único event loop (el pool async del registro queda atado a él)
+        ok &= asyncio.run(async_phases(router, a, b, args))
+        final = router.stats()
+        print(json.dumps({"phase": "final", **final}))
+        # una victoria solo cuenta para el request que lanzó el hedge / el failover
+        ok &= final["hedge_wins"] <= final["hedges"] and final["failover_wins"] <= final["failovers"]
+    finally:
+        registry.reset()
+        a.stop(), b.stop()
+    print("[ROUTER] OK" if ok else "[ROUTER] FALLÓ")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Pico de memoria de chunk_embed.py ingest a medida que crece el corpus.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.streaming_ingest --scales 1 10 50
+Para cada escala s se genera un corpus sintético con s copias de cada documento de --docs_dir
+(cada copia con un encabezado distinto, así ningún chunk se repite) y se corre una ingesta
+completa (--full --no_cache) en un proceso nuevo. Se reporta tamaño del corpus, chunks, tiempo
+y el pico de RSS (VmHWM) del proceso: con la ingesta en streaming el pico depende del
+documento más grande, del batch y del shard, no de la cantidad de documentos.
+"""
+import argparse, json, os, subprocess, sys, tempfile, time
+from pathlib import Path
+
+CHILD = r"""
+import json, runpy, sys
+def vm_hwm_mb():
+    # VmHWM y no ru_maxrss: ru_maxrss sobrevive al exec y puede reflejar el RSS del proceso padre
+    with open("/proc/self/status") as f:
+        return next(int(l.split()[1]) for l in f if l.startswith("VmHWM:")) / 1024
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+print(json.dumps({"peak_mb": vm_hwm_mb()}))
+"""
+
+
+def make_corpus(src_dir, out_dir, scale):
+    docs = sorted(p for p in Path(src_dir).iterdir() if p.suffix.lower() == ".txt")
+    assert docs, f"No hay .txt en {src_dir}"
+    size = 0
+    for i in range(scale):
+        for p in docs:
+            text = f"Copia {i} de {p.stem}.\n\n" + p.read_text(encoding="utf-8", errors="ignore")
+            out = Path(out_dir) / f"{p.stem}_{i:05d}.txt"
+            out.write_text(text, encoding="utf-8")
+            size += out.stat().st_size
+    return size
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pico de RSS de la ingesta en streaming vs tamaño del corpus")
+    ap.add_argument("--docs_dir", default="data/docs")
+    ap.add_argument("--scales", type=int, nargs="+", default=[1, 10, 50])
+    ap.add_argument("--batch_size", type=int, default=256)
+    ap.add_argument("--emb_dtype", default="float32")
+    ap.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    ap.add_argument("--tmp", default=None, help="directorio para los corpus (default: tempdir del sistema)")
+    args = ap.parse_args()
+
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chunk_embed.py")
+    print(f"=== chunk_embed.py ingest (batch {args.batch_size}, {args.emb_dtype}) ===")
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(dir=args.tmp) as tmp:
+            docs, index = os.path.join(tmp, "docs"), os.path.join(tmp, "index")
+            os.makedirs(docs)
+            size = make_corpus(args.docs_dir, docs, scale)
+            t0 = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", CHILD, script, "ingest", "--data_dir", docs, "--out_dir", index,
+                                  "--full", "--no_cache", "--model", args.model, "--batch_size", str(args.batch_size),
+                                  "--emb_dtype", args.emb_dtype], capture_output=True, text=True)
+            wall = time.perf_counter() - t0
+            if out.returncode != 0:
+                print(f"[x{scale}] ❌ {(out.stderr.strip().splitlines() or ['error'])[-1]}")
+                continue
+            with open(os.path.join(index, "embeddings.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            peak = json.loads(out.stdout.strip().splitlines()[-1])["peak_mb"]
+            print(json.dumps({"scale": scale, "docs": len(os.listdir(docs)), "corpus_mb": round(size / 2**20, 2),
+                              "chunks": meta["n"], "shards": len(meta["shards"]), "wall_s": round(wall, 2),
+                              "peak_rss_mb": round(peak, 1)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,163 @@
 from pathlib import Path
-import os, json
+import os, json, time, argparse
 import numpy as np
 import faiss
 
-def main(index_dir="index", out_path="index.faiss", meta_out="meta.jsonl"):
+from rag.index_types import INDEX_TYPES, make_index, built_kind, index_kind, supports_remove, evaluate, write_report, write_index
+from rag.chunk_store import write_store, store_path_for, title_from_path
+from rag.bm25 import write_bm25, bm25_path_for
+from rag.emb_matrix import EmbeddingMatrix
+from rag.ingest import load_sources_by_filename
+
+def _load_meta_vids(meta_out):
+    # vector ids del índice anterior (None si meta.jsonl es del formato viejo, sin "vid")
+    vids = []
+    with open(meta_out, encoding="utf-8") as f:
+        for line in f:
+            m = json.loads(line)
+            if "vid" not in m:
+                return None
+            vids.append(m["vid"])
+    return vids
+
+def _update_index(out_path, meta_out, E, ids, index_type, nlist=None):
+    # actualización incremental: borra los vectores que ya no están y agrega solo los nuevos
+    if not (os.path.exists(out_path) and os.path.exists(meta_out)):
+        return None
+    old_vids = _load_meta_vids(meta_out)
+    if old_vids is None:
+        return None
+    index = faiss.read_index(out_path)
+    if not isinstance(index, faiss.IndexIDMap2) or index.d != E.shape[1] or index.ntotal != len(old_vids):
+        return None
+    # otro tipo pedido, o HNSW (no admite remove_ids) → reconstrucción completa. Se compara con lo que
+    # make_index construiría hoy: un ivf* que se guardó como flat por falta de datos sigue incremental
+    # mientras el corpus no alcance para entrenarlo, y se reconstruye (avisando) cuando alcanza
+    stored, wanted = index_kind(index), built_kind(index_type, len(E), nlist)
+    if stored != wanted:
+        if wanted == index_type and stored == built_kind(index_type, len(old_vids), nlist):
+            print(f"[FAISS] {out_path} quedó como {stored} (pocos vectores para {index_type}); "
+                  f"con {len(E)} ya alcanza: reconstrucción completa")
+        else:
+            print(f"[FAISS] {out_path} es {stored} y se pidió {index_type}: reconstrucción completa")
+        return None
+    if not supports_remove(index):
+        return None
+
+    old_set = set(old_vids)
+    new_set = set(ids.tolist())
+    drop = np.array(sorted(old_set - new_set), dtype="int64")
+    add_mask = np.array([v not in old_set for v in ids.tolist()], dtype=bool)
+    if len(drop):
+        index.remove_ids(drop)
+    if add_mask.any():
+        index.add_with_ids(E[add_mask], ids[add_mask])
+    if index.ntotal != len(ids):
+        return None
+    print(f"[FAISS] Incremental: +{int(add_mask.sum())} / -{len(drop)} vectores")
+    return index
+
+def main(index_dir="index", out_path="index.faiss", meta_out="meta.jsonl", full=False,
+         sources_csv="data/sources.csv",
+         index_type="flat", nlist=None, hnsw_m=32, ef_construction=200, pq_m=None,
+         nprobe=None, ef_search=64, report_k=8):
     idx_dir = Path(index_dir)
-    emb_path = idx_dir / "embeddings.npz"
     chunks_path = idx_dir / "chunks.jsonl"
-    assert emb_path.exists() and chunks_path.exists(), "Faltan embeddings.npz o chunks.jsonl (corre chunk_embed.py ingest)"
+    assert chunks_path.exists(), "Falta chunks.jsonl (corre chunk_embed.py ingest)"
 
     # carga embeddings
-    E = np.load(str(emb_path))["E"].astype("float32")  # [N, d]
+    E = EmbeddingMatrix(idx_dir).to_float32()  # [N, d] (shards en float32/float16/int8)
     # normaliza para producto interno (IP)
     norms = np.linalg.norm(E, axis=1, keepdims=True) + 1e-12
     E = E / norms
 
-    # crea índice FAISS
-    d = E.shape[1]
-    index = faiss.IndexFlatIP(d)
-    index.add(E)
-
-    # guarda índice
-    faiss.write_index(index, out_path)
-
     # copia/estandariza metadatos para consulta ligera
-    # (dejamos un jsonl plano con {title,text} para no depender del path completo)
-    metas = []
+    # (dejamos un jsonl plano con {vid,title,text} para no depender del path completo)
+    sources = load_sources_by_filename(sources_csv)
+    metas, extra = [], []
     with open(chunks_path, encoding="utf-8") as f:
         for line in f:
             m = json.loads(line)
             fname = os.path.basename(m["path"])
-            title = fname.replace(".pdf","").replace(".txt","").replace("_"," ").title()
-            metas.append({"title": title, "text": m["text"]})
+            meta = {"title": title_from_path(fname), "text": m["text"]}
+            if "vid" in m:
+                meta = {"vid": m["vid"], **meta}
+            metas.append(meta)
+            extra.append({"doc": fname, "vigencia": sources.get(fname, {}).get("vigencia", 0)})
+    has_vids = bool(metas) and all("vid" in m for m in metas)
+
+    # crea índice FAISS (con ids estables → IndexIDMap2, que permite borrar/agregar por id)
+    d = E.shape[1]
+    index = None
+    ids = np.array([m["vid"] for m in metas], dtype="int64") if has_vids else None
+    if has_vids and not full:
+        index = _update_index(out_path, meta_out, E, ids, index_type, nlist=nlist)
+    if index is None:
+        base = make_index(index_type, d, len(E), nlist=nlist, hnsw_m=hnsw_m,
+                          ef_construction=ef_construction, pq_m=pq_m, nprobe=nprobe, ef_search=ef_search)
+        if not base.is_trained:
+            t0 = time.perf_counter()
+            base.train(E)
+            print(f"[FAISS] Entrenamiento {index_kind(base)}: {time.perf_counter() - t0:.2f}s")
+        if has_vids:
+            index = faiss.IndexIDMap2(base)
+            index.add_with_ids(E, ids)
+        else:
+            index = base
+            index.add(E)
+
+    # índice, metadatos, store y BM25 van a nombres temporales y se renombran juntos al final: un
+    # servidor en modo local (watcher de rag/pipeline.py) no ve un index.faiss nuevo con el store viejo
+    renames = []
+    write_index(index, out_path, renames=renames)
 
-    with open(meta_out, "w", encoding="utf-8") as f:
+    tmp_meta = f"{meta_out}.tmp{os.getpid()}"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
         for m in metas:
             f.write(json.dumps(m, ensure_ascii=False) + "\n")
+    renames.append((tmp_meta, meta_out))
+    # mismo contenido en formato binario mmap (lo que cargan los retrievers)
+    store_path = store_path_for(meta_out)
+    write_store(store_path, ({**m, **x} for m, x in zip(metas, extra)), renames=renames)
+    # índice léxico BM25 sobre las mismas filas (modos --retrieval lexical / hybrid de app.py)
+    write_bm25(bm25_path_for(meta_out), (m["text"] for m in metas), renames=renames)
+    for src, dst in renames:
+        os.replace(src, dst)
+
+    print(f"✅ FAISS listo: {out_path} ({index_kind(index)}) | metadatos: {meta_out} + {store_path} + {bm25_path_for(meta_out)} | vectores: {index.ntotal}")
 
-    print(f"✅ FAISS listo: {out_path} | metadatos: {meta_out} | vectores: {index.ntotal}")
+    # recall@k contra búsqueda exacta + latencias, para decidir si el tipo aproximado vale la pena
+    if index_kind(index) != "flat" and len(E):
+        report = evaluate(index, E, ids, k=report_k)
+        write_report(report, out_path + ".report.json")
+        k = report["k"]
+        print(f"[FAISS] recall@{k}={report[f'recall@{k}']} "
+              f"p50={report['p50_ms']}ms p99={report['p99_ms']}ms "
+              f"(flat p50={report['flat']['p50_ms']}ms p99={report['flat']['p99_ms']}ms) {report['search_param']}")
+        for row in report["sweep"]:
+            print("        ", row)
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser(description="Construye index.faiss + meta.jsonl desde index/")
+    ap.add_argument("--index_dir", default="index")
+    ap.add_argument("--out", default="index.faiss")
+    ap.add_argument("--meta", default="meta.jsonl")
+    ap.add_argument("--full", action="store_true", help="reconstruye desde cero en vez de actualizar")
+    ap.add_argument("--index_type", choices=INDEX_TYPES, default="flat")
+    ap.add_argument("--nlist", type=int, default=None, help="listas IVF (default: ~4·sqrt(N))")
+    ap.add_argument("--hnsw_m", type=int, default=32)
+    ap.add_argument("--ef_construction", type=int, default=200)
+    ap.add_argument("--pq_m", type=int, default=None, help="subvectores PQ (debe dividir a d)")
+    ap.add_argument("--nprobe", type=int, default=None, help="nprobe por defecto guardado en el índice IVF")
+    ap.add_argument("--ef_search", type=int, default=64, help="efSearch por defecto guardado en el índice HNSW")
+    ap.add_argument("--report_k", type=int, default=8)
+    ap.add_argument("--publish", nargs="?", const="", default=None, metavar="VERSION",
+                    help="copia el resultado a indexes/<VERSION> y lo activa (hot-reload, rag/bundles.py)")
+    args = ap.parse_args()
+    main(args.index_dir, args.out, args.meta, full=args.full, index_type=args.index_type,
+         nlist=args.nlist, hnsw_m=args.hnsw_m, ef_construction=args.ef_construction,
+         pq_m=args.pq_m, nprobe=args.nprobe, ef_search=args.ef_search, report_k=args.report_k)
+    if args.publish is not None:
+        from rag.bundles import bundles_dir, publish
+        version = publish(args.out, args.meta, version=args.publish or None)
+        print(f"[BUNDLES] publicada y activa: {bundles_dir() / version}")
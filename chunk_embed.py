@@ -1,8 +1,12 @@
 import os, re, json, argparse
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import tiktoken
 from pypdf import PdfReader
+from rag.manifest import Manifest, file_hash
+from rag.emb_cache import EmbeddingCache
+from rag.chunk_store import write_store, title_from_path, open_store
+from rag.emb_matrix import DTYPES, EmbeddingMatrix, MatrixWriter, matrix_exists
+from rag.encoders import load_encoder, cache_key, resolve_backend
 
 def read_txt(path): 
     return open(path, "r", encoding="utf-8", errors="ignore").read()
@@ -13,24 +17,24 @@ def read_pdf(path):
     except:
         return ""
 
-def load_docs(data_dir):
-    docs = []
+def iter_doc_files(data_dir):
     for root,_,files in os.walk(data_dir):
-        for fn in files:
-            path = os.path.join(root, fn)
-            if fn.lower().endswith(".txt"):
-                txt = read_txt(path)
-            elif fn.lower().endswith(".pdf"):
-                txt = read_pdf(path)
-            else:
-                continue
-            # limpieza ligera
-            txt = re.sub(r'\u00AD', '', txt)         # soft hyphen
-            txt = re.sub(r'\s+\n', '\n', txt)
-            txt = re.sub(r'\n{3,}', '\n\n', txt).strip()
-            if txt:
-                docs.append((path, txt))
-    return docs
+        for fn in sorted(files):
+            if fn.lower().endswith((".txt",".pdf")):
+                yield os.path.join(root, fn)
+
+def read_doc(path):
+    txt = read_txt(path) if path.lower().endswith(".txt") else read_pdf(path)
+    # limpieza ligera
+    txt = re.sub(r'\u00AD', '', txt)         # soft hyphen
+    txt = re.sub(r'\s+\n', '\n', txt)
+    txt = re.sub(r'\n{3,}', '\n\n', txt).strip()
+    return txt
+
+def iter_docs(paths):
+    # generador: solo el texto del documento en curso está en memoria
+    for path in paths:
+        yield path, read_doc(path)
 
 def chunk_by_tokens(text, tokenizer, chunk_size=400, overlap=70):
     ids = tokenizer.encode(text)
@@ -48,40 +52,123 @@ def embed_texts(model, texts):
         texts, convert_to_numpy=True, normalize_embeddings=True
     ).astype("float32")
 
+def _load_previous(out_dir, keep_paths):
+    # corrida anterior, solo para los archivos sin cambios: matriz (mmap) y, por archivo,
+    # [(fila, offset de la línea en chunks.jsonl)]; las filas se copian al escribir el índice nuevo
+    chunks_path=os.path.join(out_dir,"chunks.jsonl")
+    if not keep_paths or not (matrix_exists(out_dir) and os.path.exists(chunks_path)):
+        return None,{}
+    prev={}
+    with open(chunks_path,"rb") as f:
+        row=0
+        for line in iter(f.readline,b""):
+            path=json.loads(line)["path"]
+            if path in keep_paths:
+                prev.setdefault(path,[]).append((row,f.tell()-len(line)))
+            row+=1
+    return EmbeddingMatrix(out_dir),prev
+
+def _iter_jsonl(path):
+    with open(path,encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
 def cmd_ingest(args):
+    # pipeline en streaming: documentos → chunks → batches de embeddings → shards de vectores
+    # + chunks.jsonl. La memoria queda acotada por el documento más grande, un batch y un shard,
+    # no por el tamaño del corpus.
     tok = tiktoken.get_encoding("cl100k_base")
-    model = SentenceTransformer(args.model)
-    docs = load_docs(args.data_dir)
-
-    metas,texts=[],[]
-    doc_id=0
-    for path,txt in docs:
-        for cid,s,e,sub in chunk_by_tokens(txt,tok,args.chunk_size,args.overlap):
-            metas.append({"doc_id":doc_id,"path":path,"chunk_id":cid,"text":sub})
-            texts.append(sub)
-        doc_id+=1
-
-    E = embed_texts(model,texts)
     os.makedirs(args.out_dir,exist_ok=True)
-    np.savez_compressed(os.path.join(args.out_dir,"embeddings.npz"),E=E)
-    with open(os.path.join(args.out_dir,"chunks.jsonl"),"w",encoding="utf-8") as f:
-        for m in metas:
-            f.write(json.dumps(m,ensure_ascii=False)+"\n")
+
+    # modelo perezoso: si todo sale de la caché, no se carga el encoder (RAG_ENCODER)
+    model = None
+    def encode(texts):
+        nonlocal model
+        if model is None:
+            model = load_encoder(args.model)
+        return embed_texts(model,texts)
+    cache = None if args.no_cache else EmbeddingCache(
+        args.cache or os.path.join(args.out_dir,"emb_cache.sqlite"), cache_key(args.model))
+
+    params = {"model":args.model,"chunk_size":args.chunk_size,"overlap":args.overlap}
+    if resolve_backend()!="torch":
+        params["encoder"]=resolve_backend()   # cambiar de backend reprocesa todo
+    manifest = Manifest(os.path.join(args.out_dir,"manifest.json"), params)
+    if args.full:
+        manifest.reset()
+    current = {path:file_hash(path) for path in iter_doc_files(args.data_dir)}
+    added,changed,removed,unchanged = manifest.diff(current)
+    for path in removed:
+        manifest.remove(path)
+    prev_E,prev = _load_previous(args.out_dir,set(unchanged))
+    unchanged = set(p for p in unchanged if p in prev)   # sin filas previas → se reprocesa
+    print(f"[INGEST] agregados={len(added)} cambiados={len(changed)} "
+          f"eliminados={len(removed)} sin_cambios={len(unchanged)}")
+
+    chunks_path = os.path.join(args.out_dir,"chunks.jsonl")
+    writer = MatrixWriter(args.out_dir,args.emb_dtype)
+    out = open(chunks_path+".tmp","w",encoding="utf-8")
+    prev_f = open(chunks_path,"rb") if prev else None
+    pending = []   # [(meta, vector previo | None)] en orden de salida
+    n_chunks = 0
+
+    def flush():
+        nonlocal pending,n_chunks
+        if not pending:
+            return
+        texts = [m["text"] for m,v in pending if v is None]
+        E = iter(cache.encode(texts,encode) if cache else encode(texts)) if texts else iter(())
+        writer.append(np.stack([v if v is not None else next(E) for _,v in pending]))
+        for m,_ in pending:
+            out.write(json.dumps(m,ensure_ascii=False)+"\n")
+        n_chunks += len(pending)
+        pending = []
+
+    def add(meta,vec=None):
+        pending.append((meta,vec))
+        if len(pending)>=args.batch_size:
+            flush()
+
+    todo = [p for p in sorted(current) if p not in unchanged]
+    docs = iter_docs(todo)
+    for path in sorted(current):
+        if path in unchanged:
+            for row,off in prev[path]:
+                prev_f.seek(off)
+                add(json.loads(prev_f.readline()),prev_E.rows(row,row+1)[0])
+            continue
+        _,txt = next(docs)
+        chunks = chunk_by_tokens(txt,tok,args.chunk_size,args.overlap) if txt else []
+        vids = manifest.assign(path,current[path],[cid for cid,_,_,_ in chunks])
+        doc_id = manifest.entry(path)["doc_id"]
+        for (cid,s,e,sub),vid in zip(chunks,vids):
+            add({"doc_id":doc_id,"path":path,"chunk_id":cid,"vid":vid,"text":sub})
+    flush()
+
+    out.close()
+    if prev_f:
+        prev_f.close()
+    writer.close()
+    os.replace(chunks_path+".tmp",chunks_path)
+    write_store(os.path.join(args.out_dir,"chunks.store"),
+                ({"vid":m["vid"],"title":title_from_path(m["path"]),"doc":m["path"],"text":m["text"]}
+                 for m in _iter_jsonl(chunks_path)))
+    manifest.save()
+    if cache:
+        print(f"[CACHE] hits={cache.hits} misses={cache.misses}")
+        cache.close()
     print("✅ Índice creado en",args.out_dir,
-          f"({len(metas)} chunks, modelo {args.model})")
+          f"({n_chunks} chunks en {len(writer.shards)} shards, modelo {args.model}, embeddings {args.emb_dtype})")
 
 def cmd_query(args):
-    arr=np.load(os.path.join(args.index_dir,"embeddings.npz"))
-    E=arr["E"]
-    metas=[json.loads(l) for l in open(os.path.join(args.index_dir,"chunks.jsonl"),encoding="utf-8")]
-    model=SentenceTransformer(args.model)
+    E=EmbeddingMatrix(args.index_dir)
+    store=open_store(os.path.join(args.index_dir,"chunks.jsonl"))
+    model=load_encoder(args.model)
     qv=embed_texts(model,[args.query])[0]
-    sims=E@qv
-    idx=np.argsort(-sims)[:args.k]
-    for r,i in enumerate(idx,1):
-        m=metas[int(i)]
-        print(f"#{r} score={float(sims[i]):.4f} | {m['path']}")
-        print(m['text'][:300].replace("\n"," "))
+    idx,sims=E.search(qv,args.k)
+    for r,(i,s) in enumerate(zip(idx,sims),1):
+        print(f"#{r} score={float(s):.4f} | {store.doc(int(i))}")
+        print(store.text(int(i))[:300].replace("\n"," "))
         print("-"*60)
 
 def build_argparser():
@@ -94,6 +181,12 @@ def build_argparser():
     pi.add_argument("--chunk_size",type=int,default=400)   # 👈 nuevo default
     pi.add_argument("--overlap",type=int,default=70)       # 👈 nuevo default
     pi.add_argument("--model",type=str,default="sentence-transformers/all-MiniLM-L6-v2")
+    pi.add_argument("--full",action="store_true",help="ignora manifest.json y reprocesa todo")
+    pi.add_argument("--cache",type=str,default=None,help="caché de embeddings (default: <out_dir>/emb_cache.sqlite)")
+    pi.add_argument("--no_cache",action="store_true")
+    pi.add_argument("--emb_dtype",choices=DTYPES,default="float32",
+                    help="almacenamiento de los shards de embeddings (float16 = mitad de disco/RAM, int8 = un cuarto)")
+    pi.add_argument("--batch_size",type=int,default=256,help="chunks por batch de embeddings (acota la memoria)")
     pi.set_defaults(func=cmd_ingest)
 
     pq=sub.add_parser("query")
@@ -1,19 +1,12 @@
 import json, csv, time, re
 from dotenv import load_dotenv
-from providers.chatgpt import ChatGPTProvider
-from providers.deepseek import DeepSeekProvider
+from providers.registry import get_provider
 from retriever_jsonl import Retriever
 from rag.prompts import SYSTEM_PROMPT
+from rag.context import pack_context
 
 WORD_RE = re.compile(r"[A-Za-zÁÉÍÓÚÜÑáéíóúüñ0-9]{3,}")
 
-def get_provider(name: str):
-    if name == "chatgpt":
-        return ChatGPTProvider()
-    if name == "deepseek":
-        return DeepSeekProvider()
-    raise ValueError("Proveedor no válido. Usa chatgpt | deepseek.")
-
 def tokenize(s: str):
     if not s:
         return []
@@ -31,7 +24,7 @@ def score_keywords(expected: str, answer: str, min_len=3, threshold=0.6):
     cov = inter / len(exp_tokens)
     return cov >= threshold
 
-def run_eval(gold_file="gold_set.json", out_file="results.csv", provider_name="chatgpt"):
+def run_eval(gold_file="gold_set.json", out_file="results.csv", provider_name="chatgpt", context_tokens=None):
     load_dotenv()
     provider = get_provider(provider_name)
     retriever = Retriever("index")
@@ -46,8 +39,9 @@ def run_eval(gold_file="gold_set.json", out_file="results.csv", provider_name="c
 
         start = time.time()
         top = retriever.search(question, k=8)
-        context = "\n\n".join([r["text"] for r in top])
-        refs = ", ".join(sorted(set([r["title"] for r in top])))
+        # chunks solapados fusionados, dentro del presupuesto de tokens (RAG_CONTEXT_TOKENS)
+        context, used, ctx = pack_context(top, budget=context_tokens)
+        refs = ", ".join(sorted(set([r["title"] for r in used])))
 
         messages = [
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -70,7 +64,9 @@ def run_eval(gold_file="gold_set.json", out_file="results.csv", provider_name="c
             "references": refs,
             "latency_sec": round(latency,2),
             "abstained": abstained,
-            "correct_kw": correct_kw
+            "correct_kw": correct_kw,
+            "context_tokens": ctx["tokens_packed"],
+            "context_tokens_saved": ctx["tokens_saved"]
         })
         print(f"[OK] {question} | correct_kw={correct_kw} | abstained={abstained}")
 
@@ -1,10 +1,12 @@
-import json, csv, time, re, argparse
+import json, csv, os, time, re, argparse
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from providers.chatgpt import ChatGPTProvider
-from providers.deepseek import DeepSeekProvider
+from providers.ratelimit import RateLimiter, call_with_retry
+from providers.registry import get_provider
 from retriever_faiss import RetrieverFAISS
-from rag.prompts import SYSTEM_PROMPT
+from rag.pipeline import build_messages
+from rag.metrics import span, trace
 
 WORD_RE = re.compile(r"[A-Za-zÁÉÍÓÚÜÑáéíóúüñ0-9]{3,}")
 STOP = {"de","del","la","el","lo","los","las","y","o","u","en","para","por","segun","según","un","una","al","con","que","se","es"}
@@ -24,55 +26,84 @@ def score_keywords(expected: str, answer: str, min_len=3, threshold=0.6):
     cov = inter / len(exp_tokens)
     return cov >= threshold
 
-def get_provider(name: str):
-    if name == "chatgpt":
-        return ChatGPTProvider()
-    if name == "deepseek":
-        return DeepSeekProvider()
-    raise ValueError("Proveedor no válido. Usa chatgpt | deepseek.")
+# columnas <etapa>_sec del CSV (spans de rag/metrics.py)
+STAGES = ("encode", "faiss_search", "results", "prompt")
 
-def run_one_provider(provider_name: str, gold, retriever, k=8):
+def run_one(provider_name: str, item, retriever, k=8, limiter=None, retries=4, context_tokens=None):
+    # latencia aislada = recuperación + el intento de chat que tuvo éxito;
+    # no incluye la espera en el limitador ni el backoff de los 429
     provider = get_provider(provider_name)
-    rows = []
-    for item in gold:
-        question = item["question"]
-        expected = item["expected"]
+    question = item["question"]
+    expected = item["expected"]
 
-        t0 = time.time()
+    # etapas de la recuperación (encode / faiss_search / results) y del prompt
+    t0 = time.perf_counter()
+    with trace() as stages:
         top = retriever.search(question, k=k)
-        context = "\n\n".join([r["text"] for r in top])
-        refs = ", ".join(sorted(set([r["title"] for r in top])))
-
-        user_prompt = (
-            f"Pregunta: {question}\n\n"
-            f"Contexto:\n{context}\n\n"
-            "Responde SOLO con base al contexto. "
-            "Si no hay información suficiente, responde: 'No encontrado en normativa UFRO'.\n"
-            f"Al final agrega:\nReferencias:\n{refs}"
-        )
-
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt}
-        ]
-
+        with span("prompt"):
+            # el mismo prompt que arman app.py y las apps web
+            ref_titles, messages, ctx = build_messages(question, top, budget=context_tokens, with_ctx=True)
+            refs = ", ".join(ref_titles)
+    retrieval_sec = time.perf_counter() - t0
+
+    def attempt():
+        if limiter is not None:
+            limiter.acquire()
+        t1 = time.perf_counter()
         answer = provider.chat(messages)
-        latency = time.time() - t0
-        abstained = "no encontrado en normativa ufro" in answer.lower()
-        correct_kw = score_keywords(expected, answer)
-
-        rows.append({
-            "provider": provider_name,
-            "question": question,
-            "expected": expected,
-            "answer": answer,
-            "references": refs,
-            "latency_sec": round(latency, 2),
-            "abstained": abstained,
-            "correct_kw": correct_kw
-        })
-        print(f"[{provider_name}] {question} | correct_kw={correct_kw} | abstained={abstained} | {latency:.2f}s")
-    return rows
+        return answer, time.perf_counter() - t1
+
+    def on_retry(n, delay):
+        print(f"[{provider_name}] 429 → reintento {n}/{retries} en {delay:.1f}s")
+
+    answer, chat_sec = call_with_retry(attempt, retries=retries, on_retry=on_retry)
+    latency = retrieval_sec + chat_sec
+    abstained = "no encontrado en normativa ufro" in answer.lower()
+    correct_kw = score_keywords(expected, answer)
+
+    print(f"[{provider_name}] {question} | correct_kw={correct_kw} | abstained={abstained} | {latency:.2f}s")
+    return {
+        "provider": provider_name,
+        "question": question,
+        "expected": expected,
+        "answer": answer,
+        "references": refs,
+        "latency_sec": round(latency, 2),
+        "retrieval_sec": round(retrieval_sec, 4),
+        **{f"{stage}_sec": round(stages.get(stage, 0.0), 4) for stage in STAGES},
+        "provider_sec": round(chat_sec, 4),
+        "abstained": abstained,
+        "correct_kw": correct_kw,
+        "context_tokens": ctx["tokens_packed"],
+        "context_tokens_saved": ctx["tokens_saved"]
+    }
+
+def run_benchmark(providers, gold, retriever, k=8, concurrency=1, rates=None, retries=4, context_tokens=None):
+    # preguntas y proveedores en paralelo; las filas se devuelven en orden fijo
+    # (proveedor, pregunta) sin importar en qué orden terminen
+    rates = rates or {}
+    limiters = {p: RateLimiter(rates.get(p)) for p in providers}
+    tasks = [(p, item) for p in providers for item in gold]
+
+    def one(task):
+        p, item = task
+        return run_one(p, item, retriever, k=k, limiter=limiters[p], retries=retries,
+                       context_tokens=context_tokens)
+
+    if concurrency <= 1:
+        return [one(t) for t in tasks]
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        return list(ex.map(one, tasks))
+
+def parse_rates(specs):
+    # ["chatgpt=2", "deepseek=0.5"] → {"chatgpt": 2.0, "deepseek": 0.5} (llamadas por segundo)
+    rates = {}
+    for spec in specs or []:
+        name, _, value = spec.partition("=")
+        if not value:
+            raise ValueError(f"--rate espera proveedor=llamadas_por_segundo, no '{spec}'")
+        rates[name.strip().lower()] = float(value)
+    return rates
 
 def summarize(rows):
     by_provider = defaultdict(list)
@@ -85,6 +116,10 @@ def summarize(rows):
         correct = sum(1 for x in lst if x["correct_kw"])
         abst = sum(1 for x in lst if x["abstained"])
         lat_mean = sum(x["latency_sec"] for x in lst) / n if n else 0.0
+        ctx_mean = sum(x["context_tokens"] for x in lst) / n if n else 0.0
+        saved_mean = sum(x["context_tokens_saved"] for x in lst) / n if n else 0.0
+        retr_mean = sum(x["retrieval_sec"] for x in lst) / n if n else 0.0
+        prov_mean = sum(x["provider_sec"] for x in lst) / n if n else 0.0
         summary.append({
             "provider": prov,
             "total_questions": n,
@@ -93,6 +128,10 @@ def summarize(rows):
             "abstained_count": abst,
             "abstained_rate_%": round(100 * abst / n, 1) if n else 0.0,
             "avg_latency_sec": round(lat_mean, 2),
+            "avg_retrieval_sec": round(retr_mean, 4),
+            "avg_provider_sec": round(prov_mean, 4),
+            "avg_context_tokens": round(ctx_mean, 1),
+            "avg_context_tokens_saved": round(saved_mean, 1),
         })
     return summary
 
@@ -102,18 +141,30 @@ def main():
     parser.add_argument("--gold", default="gold_set.json", help="Ruta al gold set")
     parser.add_argument("--out", default="results_benchmark.csv", help="CSV combinado de salida")
     parser.add_argument("--summary", default="results_benchmark_summary.csv", help="Resumen por proveedor")
-    parser.add_argument("--providers", nargs="+", default=["chatgpt","deepseek"], help="Lista de proveedores a evaluar")
+    parser.add_argument("--providers", nargs="+", default=["chatgpt","deepseek"], help="Lista de proveedores a evaluar (replay:<proveedor> reproduce respuestas grabadas, ver providers/replay.py)")
     parser.add_argument("--k", type=int, default=8, help="Top-k para recuperación")
+    parser.add_argument("--concurrency", type=int, default=1, help="Llamadas simultáneas (preguntas y proveedores)")
+    parser.add_argument("--rate", nargs="*", default=[], metavar="PROVEEDOR=RPS",
+                        help="Límite de llamadas por segundo por proveedor, p.ej. chatgpt=2 deepseek=1")
+    parser.add_argument("--retries", type=int, default=4, help="Reintentos ante 429 (respeta Retry-After)")
+    parser.add_argument("--context_tokens", type=int, default=None,
+                        help="Presupuesto de tokens del contexto (default RAG_CONTEXT_TOKENS o 2500; 0 = sin límite)")
     args = parser.parse_args()
+    rates = parse_rates(args.rate)
+
+    # los 429 se reintentan aquí (fuera de la latencia medida), no dentro del cliente OpenAI
+    os.environ["PROVIDER_MAX_RETRIES"] = "0"
 
     with open(args.gold, encoding="utf-8") as f:
         gold = json.load(f)
 
-    retriever = RetrieverFAISS("index.faiss", "meta.jsonl")
-    all_rows = []
-    for prov in args.providers:
-        rows = run_one_provider(prov, gold, retriever, k=args.k)
-        all_rows.extend(rows)
+    # sin caché de consultas: todos los proveedores comparten el retriever y, con ella, desde el segundo
+    # cada fila saldría de la caché (etapas en 0 y latency_sec sin la recuperación real)
+    retriever = RetrieverFAISS("index.faiss", "meta.jsonl", cache_size=0)
+    t0 = time.perf_counter()
+    all_rows = run_benchmark(args.providers, gold, retriever, k=args.k, concurrency=args.concurrency,
+                             rates=rates, retries=args.retries, context_tokens=args.context_tokens)
+    print(f"\n⏱️  {len(all_rows)} llamadas en {time.perf_counter() - t0:.1f}s (concurrencia {args.concurrency})")
 
     # CSV combinado
     with open(args.out, "w", newline="", encoding="utf-8") as f:
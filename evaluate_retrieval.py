@@ -0,0 +1,216 @@
+import json, os, re, subprocess, sys, time, unicodedata, argparse
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Benchmark de recuperación sin LLM sobre gold_set.json.
+# Cada pregunta trae "evidence": {"doc": archivo(s) fuente, "text": [fragmentos literales]}.
+# Un resultado es relevante si viene de uno de esos documentos y (si hay "text") contiene
+# alguno de los fragmentos. Reporta recall@k (preguntas con evidencia en el top-k), MRR,
+# latencia por consulta (p50/p95/p99), tiempo de build (--build), tiempo de carga y memoria.
+# Cada backend corre en un proceso aparte para que la memoria medida sea solo la suya.
+
+BACKENDS = ("jsonl", "faiss", "parquet", "bm25", "hybrid")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_SPACES_RE = re.compile(r"\s+")
+
+def norm(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(c for c in s if not unicodedata.combining(c)).lower()
+    return _SPACES_RE.sub(" ", s).strip()
+
+def doc_key(path: str) -> str:
+    # "data/docs/Reglamento_X.pdf", "Reglamento_X.pdf" y "Reglamento_X" → misma clave
+    stem = os.path.splitext(os.path.basename(str(path)))[0]
+    return norm(stem.replace("_", " "))
+
+def is_relevant(result, evidence) -> bool:
+    docs = evidence.get("doc") or []
+    docs = [docs] if isinstance(docs, str) else docs
+    if docs and doc_key(result.get("doc", "")) not in {doc_key(d) for d in docs}:
+        return False
+    snippets = evidence.get("text") or []
+    if not snippets:
+        return True
+    text = norm(result.get("text", ""))
+    return any(norm(t) in text for t in snippets)
+
+def first_hit(results, evidence):
+    # posición (1-based) del primer resultado relevante, o None
+    if not evidence:
+        return None
+    for rank, r in enumerate(results, 1):
+        if is_relevant(r, evidence):
+            return rank
+    return None
+
+def rss_mb():
+    # Linux: memoria residente del proceso; en otros sistemas no se reporta
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def load_backend(name, args):
+    if name == "jsonl":
+        from retriever_jsonl import Retriever
+        return Retriever(args.index_dir)
+    if name == "faiss":
+        from retriever_faiss import RetrieverFAISS
+        # sin caché de consultas: se mide la búsqueda, no los hits
+        return RetrieverFAISS(args.faiss, args.meta, cache_size=0)
+    if name == "parquet":
+        from rag.retrieve import ParquetRetriever
+        return ParquetRetriever(args.parquet_index, args.parquet_meta, args.parquet_chunks)
+    if name == "bm25":
+        from rag.bm25 import LexicalRetriever
+        return LexicalRetriever(args.meta)
+    if name == "hybrid":
+        from retriever_faiss import RetrieverFAISS
+        from rag.bm25 import HybridRetriever, LexicalRetriever
+        return HybridRetriever(RetrieverFAISS(args.faiss, args.meta, cache_size=0), LexicalRetriever(args.meta))
+    raise ValueError(f"Backend desconocido: {name}")
+
+def build_commands(name, args):
+    py = sys.executable
+    if name == "jsonl":
+        return [[py, os.path.join(ROOT, "chunk_embed.py"), "ingest", "--data_dir", args.docs_dir, "--out_dir", args.index_dir, "--full"]]
+    if name in ("faiss", "bm25", "hybrid"):
+        # reutiliza los embeddings de index/: mide solo la construcción del índice FAISS (+ meta.bm25)
+        return [[py, os.path.join(ROOT, "build_faiss.py"), "--full", "--index_dir", args.index_dir, "--out", args.faiss, "--meta", args.meta]]
+    return [[py, "-m", "rag.ingest", "--docs_dir", args.docs_dir],
+            [py, "-m", "rag.embed", "--full"]]
+
+def percentiles(ms):
+    a = np.asarray(ms, dtype=np.float64)
+    return {"mean_ms": round(float(a.mean()), 3), "p50_ms": round(float(np.percentile(a, 50)), 3),
+            "p95_ms": round(float(np.percentile(a, 95)), 3), "p99_ms": round(float(np.percentile(a, 99)), 3)}
+
+def run_backend(name, gold, ks, args):
+    # se ejecuta dentro del proceso hijo
+    if name != "bm25" and os.getenv("RAG_ENCODER", "torch") == "torch":
+        import sentence_transformers  # noqa: F401  (la importación de torch no cuenta como carga del índice)
+    base_rss = rss_mb()
+    t0 = time.perf_counter()
+    retriever = load_backend(name, args)
+    load_sec = time.perf_counter() - t0
+    load_rss = rss_mb()
+
+    kmax = max(ks)
+    retriever.search(gold[0]["question"], k=kmax)   # calentamiento
+
+    lat_ms, ranks = [], []
+    for rep in range(args.repeat):
+        for item in gold:
+            t0 = time.perf_counter()
+            results = retriever.search(item["question"], k=kmax)
+            lat_ms.append((time.perf_counter() - t0) * 1000)
+            if rep == 0:
+                ranks.append(first_hit(results, item.get("evidence") or {}))
+
+    n = len(gold)
+    out = {
+        "queries": n,
+        "recall": {f"@{k}": round(sum(1 for r in ranks if r and r <= k) / n, 4) for k in ks},
+        f"mrr@{kmax}": round(sum(1.0 / r for r in ranks if r) / n, 4),
+        "latency": percentiles(lat_ms),
+        "load_sec": round(load_sec, 3),
+        "rss_mb": round(load_rss, 1) if load_rss is not None else None,
+        "load_rss_mb": round(load_rss - base_rss, 1) if load_rss is not None else None,
+        "torch_loaded": "torch" in sys.modules,
+        "per_query": [{"question": g["question"], "rank": r} for g, r in zip(gold, ranks)],
+    }
+    return out
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        base = json.load(f)
+    print(f"\n=== Diferencia contra {baseline_path} (commit {base.get('commit')}) ===")
+    for name, cur in report["backends"].items():
+        old = base.get("backends", {}).get(name)
+        if not old or "error" in cur or "error" in old:
+            continue
+        diffs = [f"recall{k} {cur['recall'][k] - old['recall'].get(k, 0):+.3f}" for k in cur["recall"]]
+        mrr = next(k for k in cur if k.startswith("mrr@"))
+        diffs.append(f"{mrr} {cur[mrr] - old.get(mrr, 0):+.3f}")
+        diffs.append(f"p50 {cur['latency']['p50_ms'] - old['latency']['p50_ms']:+.2f}ms")
+        diffs.append(f"load {cur['load_sec'] - old['load_sec']:+.2f}s")
+        print(f"[{name}] " + " | ".join(diffs))
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de recuperación (sin LLM) sobre gold_set.json")
+    ap.add_argument("--gold", default="gold_set.json")
+    ap.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    ap.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 8], help="cortes para recall@k")
+    ap.add_argument("--repeat", type=int, default=5, help="pasadas sobre el gold set para la latencia")
+    ap.add_argument("--build", action="store_true", help="reconstruye cada índice (--full) y mide el tiempo")
+    ap.add_argument("--docs_dir", default="data/docs")
+    ap.add_argument("--index_dir", default="index")
+    ap.add_argument("--faiss", default="index.faiss")
+    ap.add_argument("--meta", default="meta.jsonl")
+    ap.add_argument("--parquet_index", default="data/index.faiss")
+    ap.add_argument("--parquet_meta", default="data/meta.parquet")
+    ap.add_argument("--parquet_chunks", default="data/chunks.parquet")
+    ap.add_argument("--out", default="results_retrieval.json", help="reporte JSON (para comparar entre commits)")
+    ap.add_argument("--baseline", default=None, help="reporte JSON anterior para mostrar diferencias")
+    ap.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    with open(args.gold, encoding="utf-8") as f:
+        gold = json.load(f)
+    if args.child:
+        print(json.dumps(run_backend(args.child, gold, sorted(set(args.k)), args), ensure_ascii=False))
+        return
+
+    missing = sum(1 for g in gold if not g.get("evidence"))
+    if missing:
+        print(f"[WARN] {missing} preguntas sin 'evidence' en {args.gold}: cuentan como no encontradas")
+
+    report = {"commit": git_commit(), "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "gold": args.gold, "k": sorted(set(args.k)), "repeat": args.repeat, "backends": {}}
+    child_argv = [a for a in sys.argv[1:] if a != "--build"]
+    for name in args.backends:
+        entry = {}
+        if args.build:
+            t0 = time.perf_counter()
+            for cmd in build_commands(name, args):
+                print(f"[BUILD] {' '.join(cmd[1:])}")
+                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            entry["build_sec"] = round(time.perf_counter() - t0, 2)
+
+        proc = subprocess.run([sys.executable, os.path.join(ROOT, "evaluate_retrieval.py"), *child_argv, "--child", name],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            entry["error"] = (proc.stderr.strip().splitlines() or ["error"])[-1]
+            print(f"[{name}] ❌ {entry['error']}")
+        else:
+            entry.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+            lat = entry["latency"]
+            recall = " ".join(f"R{k}={v:.2f}" for k, v in entry["recall"].items())
+            mrr = next(k for k in entry if k.startswith("mrr@"))
+            print(f"[{name}] {recall} {mrr}={entry[mrr]:.3f} | p50={lat['p50_ms']:.2f}ms "
+                  f"p99={lat['p99_ms']:.2f}ms | carga={entry['load_sec']:.2f}s "
+                  f"rss={entry['rss_mb']}MB (+{entry['load_rss_mb']}MB)"
+                  + (f" | build={entry['build_sec']}s" if "build_sec" in entry else ""))
+        report["backends"][name] = entry
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Reporte guardado en {args.out}")
+    if args.baseline:
+        compare(report, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import gc, os
+
+# Despliegue multi-worker de app_flask con índice y modelo compartidos entre procesos:
+#   gunicorn -c gunicorn.conf.py app_flask:app
+# Con preload (default) el maestro abre index.faiss con mmap, meta.store (mmap) y el modelo torch
+# antes del fork: los workers comparten esas páginas (archivo o copy-on-write) en vez de cargar
+# cada uno su copia, así la memoria total casi no crece con la cantidad de workers.
+#   WEB_CONCURRENCY    → workers (default 4)
+#   GUNICORN_BIND      → default 127.0.0.1:5000
+#   GUNICORN_THREADS   → hilos por worker (default 1)
+#   RAG_PRELOAD=0      → sin preload: cada worker carga todo en su primer request
+#   RAG_INDEX_MMAP     → default 1 aquí (también sirve sin preload: el page cache es compartido)
+# Medición de RSS/PSS con 1, 4 y 8 workers: python -m benchmarks.preload_workers
+
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:5000")
+workers = int(os.getenv("WEB_CONCURRENCY") or 4)
+threads = int(os.getenv("GUNICORN_THREADS") or 1)
+# las llamadas al LLM pueden tardar hasta PROVIDER_READ_TIMEOUT (60 s) más reintentos
+timeout = int(os.getenv("GUNICORN_TIMEOUT") or 180)
+preload_app = os.getenv("RAG_PRELOAD", "1") != "0"
+os.environ.setdefault("RAG_INDEX_MMAP", "1")
+
+def when_ready(server):
+    # corre una vez en el maestro, con la app ya importada y antes de crear los workers
+    if not preload_app:
+        return
+    from rag import pipeline
+    pipeline.preload()
+    # los objetos ya creados pasan a la generación permanente: el GC de cada worker no los
+    # recorre (ni escribe sus cabeceras), así sus páginas siguen compartidas tras el fork
+    gc.freeze()
+
+def post_fork(server, worker):
+    if preload_app:
+        from rag import pipeline
+        pipeline.after_fork()
@@ -1,4 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Iterator
 
 class Provider(ABC):
     name: str
@@ -6,3 +8,16 @@ class Provider(ABC):
     @abstractmethod
     def chat(self, messages: list[dict], **kwargs) -> str:
         ...
+
+    def stream(self, messages: list[dict], **kwargs) -> Iterator[str]:
+        # por defecto, un solo fragmento con la respuesta completa;
+        # los proveedores con API de streaming lo sobreescriben
+        yield self.chat(messages, **kwargs)
+
+    async def achat(self, messages: list[dict], **kwargs) -> str:
+        # por defecto, chat() en un hilo para no bloquear el event loop;
+        # los proveedores con cliente async lo sobreescriben
+        return await asyncio.to_thread(self.chat, messages, **kwargs)
+
+    async def astream(self, messages: list[dict], **kwargs) -> AsyncIterator[str]:
+        yield await self.achat(messages, **kwargs)
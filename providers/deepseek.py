@@ -1,24 +1,12 @@
-import os
-from openai import OpenAI
-from .base import Provider
+from typing import Optional
+import httpx
+from .openai_compat import OpenAICompatProvider
 
-class DeepSeekProvider(Provider):
+class DeepSeekProvider(OpenAICompatProvider):
     name = "deepseek"
+    api_key_env = "DEEPSEEK_API_KEY"
+    base_url = "https://api.deepseek.com"
 
-    def __init__(self, model: str = "deepseek-chat"):
-        api_key = os.getenv("DEEPSEEK_API_KEY")
-        if not api_key:
-            raise RuntimeError("DEEPSEEK_API_KEY no está en .env")
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com"
-        )
-        self.model = model
-
-    def chat(self, messages: list[dict], **kwargs) -> str:
-        resp = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=kwargs.get("temperature", 0)
-        )
-        return resp.choices[0].message.content
+    def __init__(self, model: str = "deepseek-chat", http_client: Optional[httpx.Client] = None,
+                 async_http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(model, http_client=http_client, async_http_client=async_http_client)
@@ -0,0 +1,103 @@
+import os
+from typing import AsyncIterator, Callable, Iterator, Optional, Union
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from rag.metrics import span
+from .base import Provider
+
+# Timeouts y reintentos (configurables por entorno):
+#   PROVIDER_CONNECT_TIMEOUT (s, default 5), PROVIDER_READ_TIMEOUT (s, default 60),
+#   PROVIDER_MAX_RETRIES (default 2; backoff exponencial con jitter del cliente OpenAI,
+#   solo ante errores de conexión, 408/409/429 y 5xx)
+
+def provider_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=float(os.getenv("PROVIDER_CONNECT_TIMEOUT") or 5),
+        read=float(os.getenv("PROVIDER_READ_TIMEOUT") or 60),
+        write=10.0,
+        pool=5.0,
+    )
+
+def provider_max_retries() -> int:
+    return int(os.getenv("PROVIDER_MAX_RETRIES") or 2)
+
+class OpenAICompatProvider(Provider):
+    # base común para APIs compatibles con OpenAI (OpenRouter, DeepSeek, ...)
+    api_key_env: str
+    base_url: str
+
+    def __init__(self, model: str, http_client: Optional[httpx.Client] = None,
+                 async_http_client: Union[httpx.AsyncClient, Callable[[], httpx.AsyncClient], None] = None):
+        api_key = os.getenv(self.api_key_env)
+        if not api_key:
+            raise RuntimeError(f"{self.api_key_env} no está en .env")
+
+        # <NOMBRE>_BASE_URL permite apuntar a otro endpoint (p.ej. un servidor local de pruebas)
+        self._client_kwargs = dict(
+            api_key=api_key,
+            base_url=os.getenv(f"{self.name.upper()}_BASE_URL") or self.base_url,
+            timeout=provider_timeout(),
+            max_retries=provider_max_retries()
+        )
+        self.client = OpenAI(http_client=http_client, **self._client_kwargs)
+        self._async_http_client = async_http_client
+        self._aclient = None
+        self.model = model
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        # cliente async perezoso: solo se crea si se usa achat/astream (servidor ASGI);
+        # async_http_client puede ser una fábrica para no crear el pool async si no se usa
+        if self._aclient is None:
+            client = self._async_http_client
+            if callable(client):
+                client = client()
+            self._aclient = AsyncOpenAI(http_client=client, **self._client_kwargs)
+        return self._aclient
+
+    def chat(self, messages: list[dict], **kwargs) -> str:
+        with span("provider", provider=self.name):
+            resp = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=kwargs.get("temperature", 0)
+            )
+        return resp.choices[0].message.content
+
+    def stream(self, messages: list[dict], **kwargs) -> Iterator[str]:
+        # el context manager cierra la respuesta y devuelve la conexión al pool
+        with self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=kwargs.get("temperature", 0),
+            stream=True
+        ) as resp:
+            for chunk in resp:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+
+    async def achat(self, messages: list[dict], **kwargs) -> str:
+        with span("provider", provider=self.name):
+            resp = await self.aclient.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=kwargs.get("temperature", 0)
+            )
+        return resp.choices[0].message.content
+
+    async def astream(self, messages: list[dict], **kwargs) -> AsyncIterator[str]:
+        async with await self.aclient.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=kwargs.get("temperature", 0),
+            stream=True
+        ) as resp:
+            async for chunk in resp:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
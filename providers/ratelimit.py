@@ -0,0 +1,63 @@
+import random, threading, time
+from typing import Callable, Optional, TypeVar
+
+import openai
+
+# Límite de tasa por proveedor y reintentos ante 429 para los scripts de evaluación.
+# El limitador espacia las llamadas (token bucket con ráfaga `burst`); los reintentos
+# respetan Retry-After si el servidor lo envía y si no usan backoff exponencial con jitter.
+
+T = TypeVar("T")
+
+class RateLimiter:
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        # rate: llamadas por segundo (None o <= 0 = sin límite)
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        # bloquea hasta tener un token; devuelve los segundos esperados
+        if self.rate is None:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+def is_rate_limited(exc: Exception) -> bool:
+    return isinstance(exc, openai.RateLimitError) or getattr(exc, "status_code", None) == 429
+
+def retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def call_with_retry(fn: Callable[[], T], retries: int = 4, base_delay: float = 1.0,
+                    max_delay: float = 30.0, on_retry: Optional[Callable[[int, float], None]] = None) -> T:
+    # reintenta fn() solo ante 429; cualquier otro error se propaga
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not is_rate_limited(e) or attempt == retries:
+                raise
+            delay = retry_after(e)
+            if delay is None:
+                delay = min(max_delay, base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+            if on_retry:
+                on_retry(attempt + 1, delay)
+            time.sleep(delay)
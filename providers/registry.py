@@ -0,0 +1,88 @@
+import os, threading
+from typing import Dict
+import httpx
+from .base import Provider
+from .chatgpt import ChatGPTProvider
+from .deepseek import DeepSeekProvider
+from .openai_compat import provider_timeout
+from .replay import ReplayProvider
+from .router import RouterProvider
+
+# Registro de proveedores: una instancia por proceso y por nombre, todas sobre un
+# único httpx.Client con pool de conexiones keep-alive (se reutiliza el TLS).
+#   PROVIDER_MAX_CONNECTIONS (default 100), PROVIDER_MAX_KEEPALIVE (default 20)
+
+PROVIDERS = {
+    "chatgpt": ChatGPTProvider,
+    "deepseek": DeepSeekProvider,
+    # hedging + circuit breaker sobre ROUTER_BACKENDS (providers/router.py)
+    "router": RouterProvider,
+    # grabación/reproducción offline de otro proveedor: "replay" o "replay:<proveedor>" (providers/replay.py)
+    "replay": ReplayProvider,
+}
+
+_lock = threading.Lock()
+_instances: Dict[str, Provider] = {}
+_http_client = None
+_async_http_client = None
+_pid = None
+
+def _check_fork():
+    # tras un fork (gunicorn --preload) los sockets del padre no se comparten: se recrea todo
+    global _http_client, _async_http_client, _pid
+    if _pid != os.getpid():
+        _instances.clear()
+        _http_client = None
+        _async_http_client = None
+        _pid = os.getpid()
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("PROVIDER_MAX_CONNECTIONS") or 100),
+        max_keepalive_connections=int(os.getenv("PROVIDER_MAX_KEEPALIVE") or 20),
+        keepalive_expiry=60.0,
+    )
+
+def http_client() -> httpx.Client:
+    global _http_client
+    with _lock:
+        _check_fork()
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits(), timeout=provider_timeout())
+        return _http_client
+
+def async_http_client() -> httpx.AsyncClient:
+    # pool async compartido (servidor ASGI); se usa dentro de un único event loop
+    global _async_http_client
+    with _lock:
+        _check_fork()
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(limits=_limits(), timeout=provider_timeout())
+        return _async_http_client
+
+def get_provider(name: str) -> Provider:
+    name = (name or "").strip().lower()
+    base, _, backend = name.partition(":")
+    if base not in PROVIDERS or (backend and base != "replay") or backend == "replay":
+        raise ValueError(f"Proveedor no válido. Usa {' | '.join(PROVIDERS)} (o replay:<proveedor>).")
+    kwargs = {"backend": backend} if backend else {}
+    client = http_client()
+    with _lock:
+        if name not in _instances:
+            _instances[name] = PROVIDERS[base](http_client=client, async_http_client=async_http_client, **kwargs)
+        return _instances[name]
+
+def stats() -> Dict[str, Dict]:
+    # contadores de los proveedores que los tienen (router, replay), para GET /stats
+    with _lock:
+        return {name: p.stats() for name, p in _instances.items() if hasattr(p, "stats")}
+
+def reset():
+    # cierra el pool y olvida las instancias (tests/benchmarks)
+    global _http_client, _async_http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _async_http_client = None
+        _instances.clear()
@@ -0,0 +1,194 @@
+import asyncio, hashlib, json, os, random, threading, time
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from rag.metrics import span
+from .base import Provider
+
+# Proveedor de grabación/reproducción ("replay:<backend>", p.ej. replay:chatgpt), para medir el
+# pipeline propio sin red ni claves y sin el jitter del proveedor remoto.
+#   REPLAY_MODE=record → llama al backend real y graba respuesta + latencia observada
+#   REPLAY_MODE=replay → (default) responde desde la grabación; una pregunta no grabada es un error
+#   REPLAY_MODE=auto   → reproduce lo grabado y graba lo que falte
+# La grabación (REPLAY_CASSETTE, default replay_cassette.jsonl) es un JSONL, una línea por llamada,
+# con clave = sha256 de los mensajes + temperatura; si una clave se graba varias veces vale la última.
+# Latencia simulada al reproducir (REPLAY_LATENCY):
+#   recorded (default) → la latencia grabada de esa llamada
+#   empirical          → una latencia al azar de las grabadas para el mismo backend
+#   fixed:MS           → siempre MS milisegundos
+#   lognormal:MS:SIGMA → lognormal con mediana MS y desviación SIGMA (en log)
+#   none               → sin espera
+# REPLAY_LATENCY_SCALE multiplica la latencia (default 1) y REPLAY_SEED fija el azar.
+
+MODES = ("record", "replay", "auto")
+
+def cassette_key(messages, **kwargs) -> str:
+    payload = {"messages": messages, "temperature": kwargs.get("temperature", 0)}
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+class ReplayProvider(Provider):
+    name = "replay"
+
+    def __init__(self, backend: Optional[str] = None, cassette: Optional[str] = None, mode: Optional[str] = None,
+                 latency: Optional[str] = None, http_client=None, async_http_client=None):
+        self.backend_name = (backend or os.getenv("REPLAY_BACKEND") or "chatgpt").strip().lower()
+        self.name = f"replay:{self.backend_name}"
+        self.mode = (mode or os.getenv("REPLAY_MODE") or "replay").strip().lower()
+        if self.mode not in MODES:
+            raise ValueError(f"REPLAY_MODE inválido: '{self.mode}' (usa {' | '.join(MODES)})")
+        self.cassette = cassette or os.getenv("REPLAY_CASSETTE") or "replay_cassette.jsonl"
+        self._latency_fn = self._parse_latency(latency or os.getenv("REPLAY_LATENCY") or "recorded")
+        self.scale = float(os.getenv("REPLAY_LATENCY_SCALE") or 1.0)
+        self._rng = random.Random(int(os.getenv("REPLAY_SEED") or 0))
+        self._lock = threading.Lock()
+        self._backend = None
+        self.entries: Dict[str, Dict] = {}
+        self._load()
+        self.hits = self.misses = self.recorded = 0
+
+    # --- grabación ---
+
+    def _load(self):
+        if not os.path.exists(self.cassette):
+            return
+        with open(self.cassette, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    e = json.loads(line)
+                    if e.get("backend") == self.backend_name:
+                        self.entries[e["key"]] = e
+
+    def _append(self, entry: Dict):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.entries[entry["key"]] = entry
+            self.recorded += 1
+            d = os.path.dirname(self.cassette)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            with open(self.cassette, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    @property
+    def backend(self) -> Provider:
+        # solo para grabar: reproducir no necesita claves ni red
+        if self._backend is None:
+            from .registry import get_provider
+            self._backend = get_provider(self.backend_name)
+        return self._backend
+
+    def _entry(self, key: str) -> Optional[Dict]:
+        if self.mode == "record":
+            return None
+        e = self.entries.get(key)
+        with self._lock:
+            if e is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if e is None and self.mode == "replay":
+            raise RuntimeError(f"{self.name}: llamada no grabada en {self.cassette} "
+                               f"(clave {key[:12]}; usa REPLAY_MODE=auto o record para grabarla)")
+        return e
+
+    def _record(self, key, messages, answer, latency, ttft=None):
+        entry = {"key": key, "backend": self.backend_name, "model": getattr(self.backend, "model", None),
+                 "answer": answer, "latency_sec": round(latency, 4), "recorded_at": round(time.time(), 3),
+                 "question": messages[-1]["content"][:200] if messages else ""}
+        if ttft is not None:
+            entry["ttft_sec"] = round(ttft, 4)
+        self._append(entry)
+
+    # --- latencia simulada ---
+
+    def _parse_latency(self, spec: str):
+        kind, _, arg = spec.strip().lower().partition(":")
+        if kind == "none":
+            return lambda e: 0.0
+        if kind == "recorded":
+            return lambda e: e.get("latency_sec", 0.0)
+        if kind == "empirical":
+            return lambda e: self._rng.choice([x.get("latency_sec", 0.0) for x in self.entries.values()])
+        if kind == "fixed":
+            ms = float(arg or 0)
+            return lambda e: ms / 1000.0
+        if kind == "lognormal":
+            median, _, sigma = arg.partition(":")
+            mu, s = float(median or 1000), float(sigma or 0.5)
+            return lambda e: self._rng.lognormvariate(0.0, s) * mu / 1000.0
+        raise ValueError(f"REPLAY_LATENCY inválido: '{spec}' (recorded | empirical | fixed:MS | lognormal:MS:SIGMA | none)")
+
+    def _delay(self, e: Dict) -> float:
+        with self._lock:
+            return max(0.0, self._latency_fn(e) * self.scale)
+
+    # --- Provider ---
+
+    def chat(self, messages: list[dict], **kwargs) -> str:
+        key = cassette_key(messages, **kwargs)
+        e = self._entry(key)
+        with span("provider", provider=self.name):
+            if e is not None:
+                time.sleep(self._delay(e))
+                return e["answer"]
+            t0 = time.perf_counter()
+            answer = self.backend.chat(messages, **kwargs)
+        self._record(key, messages, answer, time.perf_counter() - t0)
+        return answer
+
+    async def achat(self, messages: list[dict], **kwargs) -> str:
+        key = cassette_key(messages, **kwargs)
+        e = self._entry(key)
+        with span("provider", provider=self.name):
+            if e is not None:
+                await asyncio.sleep(self._delay(e))
+                return e["answer"]
+            t0 = time.perf_counter()
+            answer = await self.backend.achat(messages, **kwargs)
+        self._record(key, messages, answer, time.perf_counter() - t0)
+        return answer
+
+    def _pieces(self, e: Dict):
+        # la respuesta en fragmentos por palabra; primero el tiempo al primer token, luego el resto repartido
+        words = e["answer"].split(" ")
+        total = self._delay(e)
+        ttft = min(total, e["ttft_sec"] * self.scale) if "ttft_sec" in e and total else total
+        rest = (total - ttft) / max(1, len(words) - 1)
+        return [(ttft if i == 0 else rest, w if i == 0 else " " + w) for i, w in enumerate(words)]
+
+    def stream(self, messages: list[dict], **kwargs) -> Iterator[str]:
+        key = cassette_key(messages, **kwargs)
+        e = self._entry(key)
+        if e is not None:
+            for wait, piece in self._pieces(e):
+                if wait:
+                    time.sleep(wait)
+                yield piece
+            return
+        t0, ttft, pieces = time.perf_counter(), None, []
+        for piece in self.backend.stream(messages, **kwargs):
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+            pieces.append(piece)
+            yield piece
+        self._record(key, messages, "".join(pieces), time.perf_counter() - t0, ttft)
+
+    async def astream(self, messages: list[dict], **kwargs) -> AsyncIterator[str]:
+        key = cassette_key(messages, **kwargs)
+        e = self._entry(key)
+        if e is not None:
+            for wait, piece in self._pieces(e):
+                if wait:
+                    await asyncio.sleep(wait)
+                yield piece
+            return
+        t0, ttft, pieces = time.perf_counter(), None, []
+        async for piece in self.backend.astream(messages, **kwargs):
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+            pieces.append(piece)
+            yield piece
+        self._record(key, messages, "".join(pieces), time.perf_counter() - t0, ttft)
+
+    def stats(self) -> Dict:
+        return {"mode": self.mode, "cassette": self.cassette, "entries": len(self.entries),
+                "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
@@ -0,0 +1,347 @@
+import asyncio, os, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional
+
+from rag import metrics
+from .base import Provider
+
+# Proveedor "router": reparte entre varios backends (ROUTER_BACKENDS, default "chatgpt,deepseek") según
+# su latencia y errores recientes.
+#   - primario: el backend sano con menor p50 en la ventana (con pocas muestras, el orden configurado)
+#   - hedging: si el primario no respondió al llegar a su p95 (ROUTER_HEDGE_QUANTILE), se lanza el mismo
+#     request al siguiente y gana el primero que responda; si el primario falla, se pasa al siguiente sin esperar
+#   - circuit breaker: ROUTER_FAILURES fallas seguidas, o una tasa de error >= ROUTER_ERROR_RATE en la
+#     ventana, abren el circuito del backend por ROUTER_OPEN_SEC s; después pasa un único request de
+#     prueba (half-open) que lo cierra si responde bien
+# En chat() el request perdedor no se puede cancelar (termina en segundo plano y cuenta para las
+# estadísticas); en achat() se cancela. stream()/astream() no hacen hedging: el backend se elige igual
+# y solo se cambia de backend si falla antes del primer token.
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+def _env_float(name, default):
+    v = os.getenv(name)
+    return float(v) if v else default
+
+class _Backend:
+    """Latencias y resultados recientes de un backend + estado de su circuito."""
+
+    def __init__(self, provider: Provider, window: int):
+        self.provider = provider
+        self.name = provider.name
+        self.latencies = deque(maxlen=window)   # segundos, solo respuestas exitosas
+        self.outcomes = deque(maxlen=window)    # True = ok
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.opens = 0
+        self.requests = self.failures = 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        lat = sorted(self.latencies)
+        if not lat:
+            return None
+        return lat[min(len(lat) - 1, int(q * len(lat)))]
+
+    def error_rate(self) -> float:
+        return 1.0 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+class RouterProvider(Provider):
+    name = "router"
+
+    def __init__(self, backends: Optional[List[str]] = None,
+                 resolve: Optional[Callable[[str], Provider]] = None,
+                 http_client=None, async_http_client=None):
+        # backends por nombre; se resuelven con el registro (providers/registry.py) en el primer uso
+        names = backends or (os.getenv("ROUTER_BACKENDS") or "chatgpt,deepseek").split(",")
+        self.names = [n.strip().lower() for n in names if n.strip()]
+        if not self.names or "router" in self.names:
+            raise ValueError(f"ROUTER_BACKENDS inválido: {self.names}")
+        self._resolve = resolve
+        self.window = int(_env_float("ROUTER_WINDOW", 100))
+        self.min_samples = int(_env_float("ROUTER_MIN_SAMPLES", 10))
+        self.hedge_quantile = _env_float("ROUTER_HEDGE_QUANTILE", 0.95)
+        # espera antes del hedge mientras no hay muestras, y mínimo para no duplicar requests rápidos
+        self.hedge_default = _env_float("ROUTER_HEDGE_DEFAULT_MS", 3000) / 1000.0
+        self.hedge_min = _env_float("ROUTER_HEDGE_MIN_MS", 50) / 1000.0
+        self.failure_threshold = int(_env_float("ROUTER_FAILURES", 5))
+        self.error_rate_threshold = _env_float("ROUTER_ERROR_RATE", 0.5)
+        self.open_seconds = _env_float("ROUTER_OPEN_SEC", 30)
+        self._backends: Optional[List[_Backend]] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=int(_env_float("ROUTER_THREADS", 32)),
+                                            thread_name_prefix="router")
+        # contadores (bajo _lock: se actualizan desde los hilos del pool); hedge_wins / failover_wins
+        # cuentan las respuestas que vinieron del request lanzado por el hedge / por el failover
+        self.hedges = self.hedge_wins = self.failovers = self.failover_wins = self.rejected = 0
+
+    @property
+    def backends(self) -> List[_Backend]:
+        if self._backends is None:
+            resolve = self._resolve
+            if resolve is None:
+                from .registry import get_provider as resolve
+            backends = [_Backend(resolve(n), self.window) for n in self.names]
+            with self._lock:
+                if self._backends is None:
+                    self._backends = backends
+        return self._backends
+
+    # --- estado de los backends ---
+
+    def _allow(self, b: _Backend, now: float) -> bool:
+        # llamado con _lock tomado
+        if b.state == CLOSED:
+            return True
+        if b.state == OPEN and now >= b.open_until:
+            b.state = HALF_OPEN   # deja pasar un request de prueba
+            return True
+        return False
+
+    def _order(self) -> List[_Backend]:
+        # backends que admiten un request, el más rápido primero. El request de prueba de un circuito
+        # half-open va primero (así siempre se lanza) y queda cubierto por el hedge/failover al siguiente
+        # (un solo request de prueba por llamada: un segundo half-open podría no lanzarse nunca)
+        backends, now = self.backends, time.monotonic()
+        allowed, probing = [], False
+        with self._lock:
+            for b in backends:
+                if probing and b.state == OPEN:
+                    continue
+                if self._allow(b, now):
+                    allowed.append(b)
+                    probing |= b.state == HALF_OPEN
+
+        def key(item):
+            i, b = item
+            p50 = b.quantile(0.5) if len(b.latencies) >= self.min_samples else None
+            return (b.state != HALF_OPEN, p50 is None, p50 or 0.0, i)
+
+        return [b for _, b in sorted(enumerate(allowed), key=key)]
+
+    def _hedge_delay(self, b: _Backend) -> float:
+        if len(b.latencies) < self.min_samples:
+            return self.hedge_default
+        return max(self.hedge_min, b.quantile(self.hedge_quantile))
+
+    def _record(self, b: _Backend, ok: bool, latency: Optional[float] = None):
+        # latency solo de chat/achat: el tiempo al primer token de un stream no se mezcla con el p95
+        with self._lock:
+            b.requests += 1
+            b.outcomes.append(ok)
+            if ok:
+                if latency is not None:
+                    b.latencies.append(latency)
+                b.consecutive_failures = 0
+                if b.state != CLOSED:
+                    b.state = CLOSED
+                return
+            b.failures += 1
+            b.consecutive_failures += 1
+            trip = (b.state == HALF_OPEN or b.consecutive_failures >= self.failure_threshold
+                    or (len(b.outcomes) >= self.min_samples and b.error_rate() >= self.error_rate_threshold))
+            if trip and b.state != OPEN:
+                self._open(b)
+
+    def _open(self, b: _Backend):
+        # llamado con _lock tomado
+        b.state = OPEN
+        b.open_until = time.monotonic() + self.open_seconds
+        b.opens += 1
+        b.outcomes.clear()   # al volver, la tasa de error se mide desde cero
+
+    def _abandon(self, b: _Backend, latency: Optional[float] = None):
+        # request sin resultado: perdedor cancelado de un hedge o stream cerrado antes del primer token.
+        # No cuenta como falla, pero si era el request de prueba de un circuito half-open el circuito
+        # vuelve a abrirse (si no, quedaría half-open y nadie más lo probaría)
+        with self._lock:
+            if latency is not None:
+                b.latencies.append(latency)
+            if b.state == HALF_OPEN:
+                self._open(b)
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _no_backend(self):
+        self._count("rejected")
+        return RuntimeError(f"Sin proveedores disponibles: circuito abierto en {', '.join(self.names)}")
+
+    def _call(self, b: _Backend, messages, kwargs):
+        t0 = time.perf_counter()
+        try:
+            out = b.provider.chat(messages, **kwargs)
+        except Exception:
+            self._record(b, False)
+            raise
+        self._record(b, True, time.perf_counter() - t0)
+        return out
+
+    async def _acall(self, b: _Backend, messages, kwargs):
+        t0 = time.perf_counter()
+        try:
+            out = await b.provider.achat(messages, **kwargs)
+        except asyncio.CancelledError:
+            # perdedor de un hedge: lo que ya esperó entra como latencia (cota inferior); si no, un
+            # backend que se volvió lento conservaría su p50 viejo
+            self._abandon(b, time.perf_counter() - t0)
+            raise
+        except Exception:
+            self._record(b, False)
+            raise
+        self._record(b, True, time.perf_counter() - t0)
+        return out
+
+    def _won(self, kind: str):
+        # kind: "primary", "hedge" o "failover" (quién lanzó el request que respondió)
+        if kind != "primary":
+            self._count(kind + "_wins")
+
+    # --- Provider ---
+
+    def chat(self, messages: list[dict], **kwargs) -> str:
+        order = self._order()
+        if not order:
+            raise self._no_backend()
+        with metrics.span("router_chat"):
+            pending = {self._executor.submit(self._call, order[0], messages, kwargs): "primary"}
+            launched, last_launch, error = 1, time.monotonic(), None
+            while pending:
+                timeout = None
+                if launched < len(order):
+                    timeout = max(0.0, last_launch + self._hedge_delay(order[launched - 1]) - time.monotonic())
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # el último lanzado pasó su p95: hedge al siguiente
+                    self._count("hedges")
+                    pending[self._executor.submit(self._call, order[launched], messages, kwargs)] = "hedge"
+                    launched, last_launch = launched + 1, time.monotonic()
+                    continue
+                for fut in done:
+                    kind = pending.pop(fut)
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    self._won(kind)
+                    return result
+                if not pending and launched < len(order):
+                    # falló sin hedge en curso: failover inmediato al siguiente
+                    self._count("failovers")
+                    pending[self._executor.submit(self._call, order[launched], messages, kwargs)] = "failover"
+                    launched, last_launch = launched + 1, time.monotonic()
+            raise error
+
+    async def achat(self, messages: list[dict], **kwargs) -> str:
+        order = self._order()
+        if not order:
+            raise self._no_backend()
+        with metrics.span("router_chat"):
+            pending = {asyncio.ensure_future(self._acall(order[0], messages, kwargs)): "primary"}
+            launched, last_launch, error = 1, time.monotonic(), None
+            try:
+                while pending:
+                    timeout = None
+                    if launched < len(order):
+                        timeout = max(0.0, last_launch + self._hedge_delay(order[launched - 1]) - time.monotonic())
+                    done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        self._count("hedges")
+                        pending[asyncio.ensure_future(self._acall(order[launched], messages, kwargs))] = "hedge"
+                        launched, last_launch = launched + 1, time.monotonic()
+                        continue
+                    for task in done:
+                        kind = pending.pop(task)
+                        if task.exception() is not None:
+                            error = task.exception()
+                            continue
+                        self._won(kind)
+                        return task.result()
+                    if not pending and launched < len(order):
+                        self._count("failovers")
+                        pending[asyncio.ensure_future(self._acall(order[launched], messages, kwargs))] = "failover"
+                        launched, last_launch = launched + 1, time.monotonic()
+                raise error
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    def stream(self, messages: list[dict], **kwargs) -> Iterator[str]:
+        order = self._order()
+        if not order:
+            raise self._no_backend()
+        error = None
+        for i, b in enumerate(order):
+            started = settled = False
+            try:
+                for piece in b.provider.stream(messages, **kwargs):
+                    if not started:
+                        started = settled = True
+                        self._record(b, True)
+                        self._won("failover" if i else "primary")
+                    yield piece
+                if not started:
+                    settled = True
+                    self._record(b, True)
+                    self._won("failover" if i else "primary")
+                return
+            except Exception as e:
+                if started:
+                    raise   # ya se enviaron tokens: no se puede reintentar en otro backend
+                settled = True
+                self._record(b, False)
+                error = e
+                if i + 1 < len(order):
+                    self._count("failovers")
+            finally:
+                if not settled:
+                    self._abandon(b)   # cerrado/cancelado antes del primer token
+        raise error
+
+    async def astream(self, messages: list[dict], **kwargs):
+        order = self._order()
+        if not order:
+            raise self._no_backend()
+        error = None
+        for i, b in enumerate(order):
+            started = settled = False
+            try:
+                async for piece in b.provider.astream(messages, **kwargs):
+                    if not started:
+                        started = settled = True
+                        self._record(b, True)
+                        self._won("failover" if i else "primary")
+                    yield piece
+                if not started:
+                    settled = True
+                    self._record(b, True)
+                    self._won("failover" if i else "primary")
+                return
+            except Exception as e:
+                if started:
+                    raise
+                settled = True
+                self._record(b, False)
+                error = e
+                if i + 1 < len(order):
+                    self._count("failovers")
+            finally:
+                if not settled:
+                    self._abandon(b)
+        raise error
+
+    def stats(self) -> Dict:
+        def ms(v):
+            return round(v * 1000, 1) if v is not None else None
+
+        with self._lock:
+            backends = {b.name: {"state": b.state, "requests": b.requests, "failures": b.failures,
+                                 "error_rate": round(b.error_rate(), 3), "opens": b.opens,
+                                 "p50_ms": ms(b.quantile(0.5)), "p95_ms": ms(b.quantile(self.hedge_quantile)),
+                                 "samples": len(b.latencies)}
+                        for b in (self._backends or [])}
+            return {"backends": backends, "hedges": self.hedges, "hedge_wins": self.hedge_wins,
+                    "failovers": self.failovers, "failover_wins": self.failover_wins, "rejected": self.rejected}
@@ -0,0 +1,151 @@
+from pathlib import Path
+import json, sqlite3, threading, time
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+# Caché persistente de respuestas del LLM por similitud de pregunta (SQLite).
+# Clave: (proveedor, versión del índice, filtro) + embedding normalizado de la pregunta; una pregunta
+# nueva reutiliza la respuesta y las referencias de una anterior si el coseno entre ambas supera
+# `threshold`. La búsqueda es fuerza bruta en memoria sobre los embeddings del grupo (unos miles
+# de preguntas: microsegundos), recargada incrementalmente desde SQLite (id > último visto), así
+# varios workers comparten lo que cada uno guarda.
+# Invalidación: cada consulta busca solo entre las respuestas de su versión del índice, así que una
+# versión nueva empieza vacía. Las filas de otras versiones no se borran al cambiar (durante un
+# hot-reload escalonado hay workers en ambas versiones y se borrarían entre sí): se eliminan en la
+# poda, cuando la versión lleva `stale_after` segundos sin respuestas nuevas; además rigen `ttl` y
+# `max_entries`.
+
+class _Group:
+    __slots__ = ("ids", "created", "E", "last_id")
+
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.created = np.zeros(0, dtype=np.float64)
+        self.E = None
+        self.last_id = 0
+
+class AnswerCache:
+    def __init__(self, path, threshold: float = 0.92, ttl: Optional[float] = 7 * 86400, max_entries: int = 50000,
+                 stale_after: float = 3600.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = float(threshold)
+        self.ttl = ttl
+        self.max_entries = int(max_entries)
+        self.stale_after = float(stale_after)
+        # una conexión por proceso compartida entre hilos (serializada con _lock); WAL deja leer
+        # a los demás workers mientras uno escribe
+        self.conn = sqlite3.connect(str(self.path), timeout=10.0, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, provider TEXT NOT NULL, version TEXT NOT NULL,"
+            " filter TEXT NOT NULL, question TEXT NOT NULL, dim INTEGER NOT NULL, v BLOB NOT NULL,"
+            " answer TEXT NOT NULL, refs TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_group ON answers (provider, version, filter, id)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._groups: Dict[Tuple[str, str, str], _Group] = {}
+        self._version = None   # la última versión vista: la que nunca se poda
+        self._seen = set()
+        self.hits = self.misses = self.stores = self.invalidated = self.expired = 0
+
+    def _set_version(self, version: str):
+        # primera vez que este proceso ve una versión (arranque o hot-reload): poda las abandonadas.
+        # Los requests en curso sobre la versión anterior no cuentan como cambio (no alternan la poda)
+        if version == self._version or version in self._seen:
+            return
+        self._seen.add(version)
+        self._version = version
+        self._prune()
+
+    def _refresh(self, key) -> _Group:
+        g = self._groups.get(key)
+        if g is None:
+            g = self._groups[key] = _Group()
+        rows = self.conn.execute(
+            "SELECT id, created, dim, v FROM answers WHERE provider = ? AND version = ? AND filter = ? AND id > ?"
+            " ORDER BY id", (*key, g.last_id)).fetchall()
+        if rows:
+            E = np.stack([np.frombuffer(v, dtype=np.float32, count=dim) for _, _, dim, v in rows])
+            g.E = E if g.E is None else np.concatenate([g.E, E])
+            g.ids = np.concatenate([g.ids, np.array([r[0] for r in rows], dtype=np.int64)])
+            g.created = np.concatenate([g.created, np.array([r[1] for r in rows], dtype=np.float64)])
+            g.last_id = rows[-1][0]
+        return g
+
+    def lookup(self, provider: str, version: str, vec: np.ndarray, filter: str = "") -> Optional[Dict]:
+        """{answer, references, question, similarity} de la pregunta guardada más parecida, o None."""
+        key = (provider, version, filter or "")
+        with self._lock:
+            self._set_version(version)
+            g = self._refresh(key)
+            if g.E is None or not len(g.ids):
+                self.misses += 1
+                return None
+            sims = g.E @ np.asarray(vec, dtype=np.float32)
+            if self.ttl is not None:
+                sims[g.created < time.time() - self.ttl] = -np.inf
+            j = int(np.argmax(sims))
+            if sims[j] < self.threshold:
+                self.misses += 1
+                return None
+            row = self.conn.execute("SELECT question, answer, refs FROM answers WHERE id = ?",
+                                    (int(g.ids[j]),)).fetchone()
+            if row is None:   # la borró otro worker (TTL / max_entries)
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"answer": row[1], "references": json.loads(row[2]), "question": row[0],
+                "similarity": round(float(sims[j]), 4)}
+
+    def put(self, provider: str, version: str, vec: np.ndarray, question: str, answer: str, references,
+            filter: str = ""):
+        vec = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            self._set_version(version)
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO answers (provider, version, filter, question, dim, v, answer, refs, created)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (provider, version, filter or "", question, int(vec.shape[0]), vec.tobytes(), answer,
+                     json.dumps(list(references), ensure_ascii=False), time.time()))
+            self.stores += 1
+            if self.stores % 100 == 0:
+                self._prune()
+
+    def _prune(self):
+        # versiones sin respuestas nuevas hace stale_after s, expiradas por TTL y, sobre max_entries,
+        # las más antiguas
+        with self.conn:
+            if self._version is not None:
+                self.invalidated += self.conn.execute(
+                    "DELETE FROM answers WHERE version != ? AND version IN (SELECT version FROM answers"
+                    " GROUP BY version HAVING MAX(created) < ?)",
+                    (self._version, time.time() - self.stale_after)).rowcount
+            if self.ttl is not None:
+                self.expired += self.conn.execute("DELETE FROM answers WHERE created < ?",
+                                                  (time.time() - self.ttl,)).rowcount
+            self.conn.execute("DELETE FROM answers WHERE id <= (SELECT id FROM answers ORDER BY id DESC"
+                              " LIMIT 1 OFFSET ?)", (self.max_entries,))
+        # las filas borradas pueden seguir en memoria: se recargan los grupos desde cero
+        self._groups.clear()
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM answers")
+            self._groups.clear()
+
+    def stats(self):
+        with self._lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        total = self.hits + self.misses
+        return {"size": size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0, "stores": self.stores,
+                "invalidated": self.invalidated, "expired": self.expired,
+                "threshold": self.threshold, "ttl": self.ttl, "stale_after": self.stale_after,
+                "version": self._version}
+
+    def close(self):
+        self.conn.close()
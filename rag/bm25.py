@@ -0,0 +1,249 @@
+from array import array
+from collections import Counter
+from pathlib import Path
+import argparse, json, math, os, re, time, unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from rag.chunk_store import MemoryChunkStore, open_store
+
+# Índice léxico BM25 sobre los mismos chunks que meta.store / chunks.store.
+# Directorio *.bm25 (mismo estilo que el *.store):
+#   offsets.npy  → int64[V+1], las postings del término t están en [offsets[t], offsets[t+1])
+#   postings.npy → int32[nnz] filas (ordenadas dentro de cada término)
+#   tfs.npy      → uint16[nnz] frecuencia del término en la fila
+#   doc_len.npy  → int32[N] largo (en términos) de cada fila
+#   meta.json    → vocabulario (término → posición en la lista), N, avgdl, k1, b
+# Se abre con mmap: no importa torch ni sentence-transformers, así que una consulta
+# puramente léxica arranca en milisegundos.
+
+BM25_SUFFIX = ".bm25"
+VERSION = 1
+
+STOPWORDS = {
+    "a", "al", "ante", "bajo", "con", "contra", "cual", "cuales", "cuando", "de", "del", "desde",
+    "donde", "durante", "e", "el", "ella", "ellos", "en", "entre", "es", "esa", "ese", "esta",
+    "este", "esto", "fue", "ha", "hasta", "la", "las", "le", "les", "lo", "los", "mas", "me", "mi",
+    "muy", "no", "nos", "o", "para", "pero", "por", "que", "quien", "se", "segun", "ser", "si",
+    "sin", "sobre", "son", "su", "sus", "tambien", "te", "tu", "u", "un", "una", "uno", "unos",
+    "unas", "y", "ya",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ORDINAL_RE = re.compile(r"^(\d+)(?:o|a|er|ro|do|to|vo|no)$")   # 2º → "2o", 1er → 1
+
+def _fold(text: str) -> str:
+    # minúsculas y sin tildes: "Eliminación" → "eliminacion", "2º" → "2o"
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def _stem(t: str) -> str:
+    # stemming liviano para español: plural y vocal final
+    # (clases/clase → clas, actividades/actividad → actividad, académica/académico → academic)
+    if len(t) > 4 and t.endswith("es"):
+        t = t[:-2]
+    elif len(t) > 3 and t.endswith("s"):
+        t = t[:-1]
+    if len(t) > 4 and t[-1] in "aeo":
+        t = t[:-1]
+    return t
+
+def analyze(text: str) -> List[str]:
+    out = []
+    for t in _TOKEN_RE.findall(_fold(text or "")):
+        m = _ORDINAL_RE.match(t)
+        if m:
+            t = m.group(1)
+        if t.isdigit():
+            out.append(t.lstrip("0") or "0")    # "04 de agosto" y "4 de agosto" → "4"
+        elif len(t) > 1 and t not in STOPWORDS:
+            out.append(_stem(t))
+    return out
+
+def bm25_path_for(meta_path: str) -> str:
+    # meta.jsonl → meta.bm25 ; index/chunks.jsonl → index/chunks.bm25
+    return os.path.splitext(meta_path)[0] + BM25_SUFFIX
+
+def write_bm25(path, texts: Iterable[str], k1: float = 1.2, b: float = 0.75, renames=None) -> int:
+    """Construye el índice en streaming (las filas siguen el orden de `texts`); devuelve N.
+
+    renames: como en write_store, deja los renombres pendientes en la lista.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    vocab: Dict[str, int] = {}
+    tids, rows, tfs, doc_len = array("i"), array("i"), array("i"), array("i")
+    for row, text in enumerate(texts):
+        terms = analyze(text)
+        doc_len.append(len(terms))
+        for term, tf in Counter(terms).items():
+            tids.append(vocab.setdefault(term, len(vocab)))
+            rows.append(row)
+            tfs.append(tf)
+
+    tids = np.frombuffer(tids, dtype=np.int32)
+    rows = np.frombuffer(rows, dtype=np.int32)
+    order = np.lexsort((rows, tids))
+    counts = np.bincount(tids, minlength=len(vocab))
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    doc_len = np.frombuffer(doc_len, dtype=np.int32)
+
+    # como write_store: cada archivo va a *.tmp y se renombra al final, así un BM25Index abierto
+    # (mmap) en otro proceso sigue viendo los archivos viejos y no uno truncado (filas erradas o SIGBUS)
+    tmp = f".tmp{os.getpid()}"
+    written = []
+
+    def save(name, arr):
+        with open(path / (name + tmp), "wb") as f:
+            np.save(f, arr)
+        written.append(name)
+
+    save("offsets.npy", offsets)
+    save("postings.npy", rows[order])
+    save("tfs.npy", np.minimum(np.frombuffer(tfs, dtype=np.int32)[order], 65535).astype(np.uint16))
+    save("doc_len.npy", doc_len)
+    with open(path / ("meta.json" + tmp), "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION, "n": int(len(doc_len)), "k1": k1, "b": b,
+                   "avgdl": float(doc_len.mean()) if len(doc_len) else 0.0,
+                   "terms": list(vocab)}, f, ensure_ascii=False)
+    written.append("meta.json")
+    pairs = [(path / (name + tmp), path / name) for name in written]
+    if renames is None:
+        for src, dst in pairs:
+            os.replace(src, dst)
+    else:
+        renames.extend(pairs)
+    return len(doc_len)
+
+class BM25Index:
+    def __init__(self, path):
+        path = Path(path)
+        assert (path / "meta.json").exists(), f"No existe {path}. Corre python -m rag.bm25 --meta <meta.jsonl>"
+        with open(path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.n, self.k1, self.b, self.avgdl = meta["n"], meta["k1"], meta["b"], meta["avgdl"] or 1.0
+        self.vocab = {t: i for i, t in enumerate(meta["terms"])}
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.postings = np.load(path / "postings.npy", mmap_mode="r")
+        self.tfs = np.load(path / "tfs.npy", mmap_mode="r")
+        self.doc_len = np.load(path / "doc_len.npy", mmap_mode="r")
+
+    def __len__(self):
+        return self.n
+
+    def search_rows(self, query: str, k: int = 8, allowed=None) -> Tuple[np.ndarray, np.ndarray]:
+        # puntaje disperso: solo se tocan las postings de los términos de la consulta;
+        # allowed(filas) → máscara de filas admitidas (filtro por metadatos, ver rag/filters.py)
+        parts_rows, parts_scores = [], []
+        for term in set(analyze(query)):
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            s, e = int(self.offsets[tid]), int(self.offsets[tid + 1])
+            rows = np.asarray(self.postings[s:e])
+            tf = np.asarray(self.tfs[s:e], dtype=np.float32)
+            df = e - s
+            idf = math.log(1.0 + (self.n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * np.asarray(self.doc_len[rows], dtype=np.float32) / self.avgdl)
+            parts_rows.append(rows)
+            parts_scores.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+        if not parts_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        cand, inv = np.unique(np.concatenate(parts_rows), return_inverse=True)
+        scores = np.bincount(inv, weights=np.concatenate(parts_scores)).astype(np.float32)
+        if allowed is not None:
+            keep = allowed(cand)
+            cand, scores = cand[keep], scores[keep]
+        if len(cand) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(cand))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return cand[top].astype(np.int64), scores[top]
+
+def _open_rows(meta_path: str):
+    # meta.jsonl / chunks.jsonl (o su .store) y también data/chunks.parquet de rag/ingest.py
+    if meta_path.endswith(".parquet"):
+        import pandas as pd
+        df = pd.read_parquet(meta_path, columns=["doc_id", "title", "text"])
+        return MemoryChunkStore([{"title": t, "text": x, "doc": d}
+                                 for d, t, x in zip(df["doc_id"], df["title"], df["text"])])
+    return open_store(meta_path)
+
+class LexicalRetriever:
+    def __init__(self, meta_path="meta.jsonl", bm25_path: Optional[str] = None):
+        self.store = _open_rows(meta_path)
+        self.index = BM25Index(bm25_path or bm25_path_for(meta_path))
+        if len(self.index) != len(self.store):
+            raise RuntimeError(f"Índice BM25 desactualizado ({len(self.index)} filas vs {len(self.store)}). "
+                               f"Corre python -m rag.bm25 --meta {meta_path}")
+        self._facets = None
+
+    def search(self, query: str, k: int = 8, filter=None) -> List[Dict]:
+        allowed = None
+        if filter is not None:
+            # import perezoso: rag.filters carga faiss, innecesario para la búsqueda léxica simple
+            from rag.filters import FacetIndex, parse_filter
+            fkey = parse_filter(filter)
+            if fkey:
+                if self._facets is None:
+                    self._facets = FacetIndex.from_store(self.store)
+                sel = self._facets.selection(fkey)
+                if sel.empty:
+                    return []
+                allowed = sel.allows_rows
+        rows, scores = self.index.search_rows(query, k, allowed=allowed)
+        return [{"title": self.store.title(int(r)), "text": self.store.text(int(r)),
+                 "doc": self.store.doc(int(r)), "score": float(s), "row": int(r)}
+                for r, s in zip(rows, scores)]
+
+    def search_batch(self, queries: List[str], k: int = 8, filter=None) -> List[List[Dict]]:
+        return [self.search(q, k, filter=filter) for q in queries]
+
+def rrf_fuse(rankings: List[List[Dict]], k: int = 8, rrf_k: int = 60) -> List[Dict]:
+    # Reciprocal Rank Fusion por fila del store: score = Σ 1 / (rrf_k + rank)
+    fused: Dict[int, float] = {}
+    first: Dict[int, Dict] = {}
+    for results in rankings:
+        for rank, r in enumerate(results, 1):
+            fused[r["row"]] = fused.get(r["row"], 0.0) + 1.0 / (rrf_k + rank)
+            first.setdefault(r["row"], r)
+    best = sorted(fused, key=lambda row: -fused[row])[:k]
+    return [{**first[row], "score": fused[row]} for row in best]
+
+class HybridRetriever:
+    """Denso (RetrieverFAISS) + BM25 sobre el mismo meta.store, fusionados con RRF."""
+
+    def __init__(self, dense, lexical: LexicalRetriever, depth: int = 30, rrf_k: int = 60):
+        if len(lexical.store) != len(dense.store):
+            raise RuntimeError("El índice BM25 y el FAISS no cubren las mismas filas; reconstruye con build_faiss.py")
+        self.dense, self.lexical = dense, lexical
+        self.depth, self.rrf_k = depth, rrf_k
+
+    def search(self, query: str, k: int = 8, filter=None) -> List[Dict]:
+        depth = max(k, self.depth)
+        return rrf_fuse([self.dense.search(query, k=depth, filter=filter),
+                         self.lexical.search(query, k=depth, filter=filter)],
+                        k=k, rrf_k=self.rrf_k)
+
+    def search_batch(self, queries: List[str], k: int = 8, filter=None) -> List[List[Dict]]:
+        depth = max(k, self.depth)
+        dense = self.dense.search_batch(queries, k=depth, filter=filter)
+        return [rrf_fuse([d, self.lexical.search(q, k=depth, filter=filter)], k=k, rrf_k=self.rrf_k)
+                for q, d in zip(queries, dense)]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Índice BM25 sobre meta.jsonl / chunks.jsonl / chunks.parquet")
+    ap.add_argument("--meta", default="meta.jsonl", help="meta.jsonl (build_faiss.py), index/chunks.jsonl o data/chunks.parquet")
+    ap.add_argument("--out", default=None, help="default: <meta sin extensión>.bm25")
+    ap.add_argument("--k1", type=float, default=1.2)
+    ap.add_argument("--b", type=float, default=0.75)
+    args = ap.parse_args()
+
+    store = _open_rows(args.meta)
+    out = args.out or bm25_path_for(args.meta)
+    t0 = time.perf_counter()
+    n = write_bm25(out, (store.text(i) for i in range(len(store))), k1=args.k1, b=args.b)
+    print(f"[BM25] {n} chunks → {out} ({time.perf_counter() - t0:.2f}s)")
@@ -0,0 +1,135 @@
+from pathlib import Path
+import argparse, json, os, re, shutil, time
+from typing import Dict, List, Optional, Tuple
+
+from rag.bm25 import bm25_path_for
+from rag.chunk_store import store_path_for
+
+# Versiones del índice para recargar sin reiniciar el servidor (hot-reload, ver rag/pipeline.py):
+#   indexes/<versión>/   → index.faiss, meta.jsonl, meta.store/, meta.bm25/ (inmutables una vez publicados)
+#   indexes/CURRENT      → nombre de la versión activa (se reemplaza atómicamente)
+# publish copia el resultado de build_faiss.py a una versión nueva y la activa; los servidores ven
+# el cambio de CURRENT y cargan la versión nueva junto a la que está sirviendo antes de cambiarla.
+# Sin indexes/CURRENT se usa index.faiss / meta.jsonl del directorio actual (versión "local").
+# RAG_BUNDLES_DIR cambia el directorio (default "indexes").
+
+LOCAL = "local"
+FAISS_NAME, META_NAME = "index.faiss", "meta.jsonl"
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+def bundles_dir(root=None) -> Path:
+    return Path(root or os.getenv("RAG_BUNDLES_DIR") or "indexes")
+
+def current_version(root=None) -> Optional[str]:
+    try:
+        v = (bundles_dir(root) / "CURRENT").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return v or None
+
+def list_versions(root=None) -> List[str]:
+    d = bundles_dir(root)
+    if not d.is_dir():
+        return []
+    return sorted(p.name for p in d.iterdir() if p.is_dir() and _VERSION_RE.match(p.name))
+
+def resolve(version=None, root=None) -> Tuple[str, str, str]:
+    # (versión, ruta de index.faiss, ruta de meta.jsonl) de la versión pedida o de la activa
+    version = version or current_version(root)
+    if version is None or version == LOCAL:
+        return LOCAL, FAISS_NAME, META_NAME
+    d = bundles_dir(root) / version
+    if not _VERSION_RE.match(version) or not (d / FAISS_NAME).exists():
+        raise ValueError(f"No existe la versión de índice '{version}' en {bundles_dir(root)}")
+    return version, str(d / FAISS_NAME), str(d / META_NAME)
+
+def activate(version, root=None):
+    resolve(version, root)   # valida que exista
+    d = bundles_dir(root)
+    tmp = d / f"CURRENT.tmp{os.getpid()}"
+    tmp.write_text(version + "\n", encoding="utf-8")
+    os.replace(tmp, d / "CURRENT")
+
+def signature(faiss_path, meta_path) -> Dict[str, List[int]]:
+    # mtime_ns y tamaño de index.faiss, meta.jsonl y los archivos de meta.store / meta.bm25. Las versiones
+    # publicadas son inmutables, pero en modo local build_faiss.py los reemplaza con el mismo nombre
+    files = [faiss_path, meta_path]
+    for d in (store_path_for(meta_path), bm25_path_for(meta_path)):
+        if os.path.isdir(d):
+            files += [os.path.join(d, name) for name in sorted(os.listdir(d))]
+    sig = {}
+    for f in files:
+        try:
+            st = os.stat(f)
+        except OSError:
+            continue
+        sig[f] = [st.st_mtime_ns, st.st_size]
+    return sig
+
+def publish(faiss_path=FAISS_NAME, meta_path=META_NAME, version=None, root=None, make_active=True) -> str:
+    # copia a un directorio temporal y lo renombra al final, así un proceso nunca ve una versión a
+    # medio copiar
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    if not _VERSION_RE.match(version) or version == LOCAL:
+        raise ValueError(f"Nombre de versión inválido: '{version}'")
+    d = bundles_dir(root)
+    dest = d / version
+    if dest.exists():
+        raise ValueError(f"La versión '{version}' ya existe en {d}")
+    d.mkdir(parents=True, exist_ok=True)
+    tmp = d / f".{version}.tmp{os.getpid()}"
+    tmp.mkdir()
+    try:
+        shutil.copy2(faiss_path, tmp / FAISS_NAME)
+        if os.path.exists(faiss_path + ".report.json"):
+            shutil.copy2(faiss_path + ".report.json", tmp / (FAISS_NAME + ".report.json"))
+        if os.path.exists(meta_path):   # los retrievers prefieren meta.store; meta.jsonl es opcional
+            shutil.copy2(meta_path, tmp / META_NAME)
+        for src, dst in ((store_path_for(meta_path), store_path_for(META_NAME)),
+                         (bm25_path_for(meta_path), bm25_path_for(META_NAME))):
+            if os.path.isdir(src):
+                shutil.copytree(src, tmp / dst)
+        os.rename(tmp, dest)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if make_active:
+        activate(version, root)
+    return version
+
+def prune(keep=3, root=None) -> List[str]:
+    # borra las versiones más antiguas salvo la activa; un proceso que aún tenga abierta una versión
+    # borrada sigue leyendo sus archivos (mmap) hasta soltarla
+    current = current_version(root)
+    old = [v for v in list_versions(root) if v != current]
+    removed = old[:max(0, len(old) - max(0, keep - 1))]
+    for v in removed:
+        shutil.rmtree(bundles_dir(root) / v)
+    return removed
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Versiones del índice (indexes/<versión> + indexes/CURRENT)")
+    ap.add_argument("--root", default=None, help="directorio de versiones (default RAG_BUNDLES_DIR o indexes)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("publish", help="copia index.faiss + meta.* a una versión nueva y la activa")
+    p.add_argument("--faiss", default=FAISS_NAME)
+    p.add_argument("--meta", default=META_NAME)
+    p.add_argument("--version", default=None, help="default: fecha y hora")
+    p.add_argument("--no_activate", action="store_true")
+    p = sub.add_parser("activate", help="cambia la versión activa (p.ej. rollback)")
+    p.add_argument("version")
+    sub.add_parser("list")
+    p = sub.add_parser("prune", help="borra versiones antiguas")
+    p.add_argument("--keep", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.cmd == "publish":
+        v = publish(args.faiss, args.meta, args.version, args.root, make_active=not args.no_activate)
+        print(f"[BUNDLES] publicada {bundles_dir(args.root) / v}" + ("" if args.no_activate else " (activa)"))
+    elif args.cmd == "activate":
+        activate(args.version, args.root)
+        print(f"[BUNDLES] activa: {args.version}")
+    elif args.cmd == "list":
+        print(json.dumps({"current": current_version(args.root), "versions": list_versions(args.root)}))
+    else:
+        print(f"[BUNDLES] borradas: {prune(args.keep, args.root)}")
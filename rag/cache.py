@@ -0,0 +1,63 @@
+import re, threading, time, unicodedata
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# Caché LRU acotada con TTL opcional, segura entre hilos, con contadores de
+# hits / misses / evictions (por tamaño) / expirations (por TTL).
+
+MISSING = object()
+
+_SPACES_RE = re.compile(r"\s+")
+
+def normalize_query(q: str) -> str:
+    # "¿Cuándo inician las clases?" y "cuándo inician las  clases" → misma clave
+    q = unicodedata.normalize("NFC", q or "").lower().strip()
+    q = q.strip("¿?¡!.,;: ")
+    return _SPACES_RE.sub(" ", q)
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = int(maxsize)
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is MISSING:
+                self.misses += 1
+                return MISSING
+            value, stamp = item
+            if self.ttl is not None and time.monotonic() - stamp > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions, "expirations": self.expirations}
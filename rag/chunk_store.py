@@ -0,0 +1,170 @@
+from array import array
+from pathlib import Path
+import json, mmap, os
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+# Almacén binario de chunks (un directorio *.store):
+#   texts.bin     → todos los textos UTF-8 concatenados (se abre con mmap)
+#   offsets.npy   → int64[N+1], el texto de la fila i es texts.bin[offsets[i]:offsets[i+1]]
+#   vids.npy      → int64[N] vector id de cada fila (ids del índice FAISS)
+#   vid_order.npy → int64[N] filas ordenadas por vid, para buscar por id con searchsorted
+#   title_ids.npy / doc_ids.npy → int32[N] índices a las tablas de strings.json
+#   vigencia.npy  → int16[N] año de vigencia (0 = desconocida)
+# Las columnas se abren con np.load(mmap_mode="r"): el arranque no depende de N y
+# varios procesos comparten las mismas páginas del page cache. Solo se decodifican
+# los textos que efectivamente se devuelven.
+
+STORE_SUFFIX = ".store"
+
+def title_from_path(path: str) -> str:
+    fname = os.path.basename(path)
+    return fname.replace(".pdf","").replace(".txt","").replace("_"," ").title()
+
+def store_path_for(meta_path: str) -> str:
+    # meta.jsonl → meta.store ; index/chunks.jsonl → index/chunks.store
+    return os.path.splitext(meta_path)[0] + STORE_SUFFIX
+
+def _vigencia(v) -> int:
+    try:
+        return int(str(v).strip()[:4])
+    except ValueError:
+        return 0
+
+def write_store(path, rows: Iterable[Dict], renames=None) -> int:
+    """Escribe en streaming filas {vid?, title, text, doc?, vigencia?}; devuelve N.
+
+    Con renames (lista) no renombra: agrega los pares (tmp, destino) para que quien llama los haga
+    junto con los de otros archivos (ver build_faiss.py).
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    # array en vez de listas de int: 8/4/2 bytes por fila en lugar de ~36
+    offsets, vids = array("q", [0]), array("q")
+    title_ids, doc_ids, vig = array("i"), array("i"), array("h")
+    titles: Dict[str, int] = {}
+    docs: Dict[str, int] = {}
+    # cada archivo se escribe aparte (*.tmp) y se renombra al final: los procesos que tienen el
+    # store anterior abierto con mmap siguen viendo los archivos viejos, no uno truncado (SIGBUS)
+    tmp = f".tmp{os.getpid()}"
+    written = []
+
+    def save(name, arr):
+        with open(path / (name + tmp), "wb") as f:
+            np.save(f, arr)
+        written.append(name)
+
+    with open(path / ("texts.bin" + tmp), "wb") as f:
+        for i, r in enumerate(rows):
+            b = r["text"].encode("utf-8")
+            f.write(b)
+            offsets.append(offsets[-1] + len(b))
+            vids.append(int(r.get("vid", i)))
+            title_ids.append(titles.setdefault(r["title"], len(titles)))
+            doc_ids.append(docs.setdefault(str(r.get("doc", "")), len(docs)))
+            vig.append(_vigencia(r.get("vigencia", 0)))
+    written.append("texts.bin")
+    vids = np.frombuffer(vids, dtype=np.int64)
+    save("offsets.npy", np.frombuffer(offsets, dtype=np.int64))
+    save("vids.npy", vids)
+    save("vid_order.npy", np.argsort(vids, kind="stable").astype(np.int64))
+    save("title_ids.npy", np.frombuffer(title_ids, dtype=np.int32))
+    save("doc_ids.npy", np.frombuffer(doc_ids, dtype=np.int32))
+    save("vigencia.npy", np.frombuffer(vig, dtype=np.int16))
+    with open(path / ("strings.json" + tmp), "w", encoding="utf-8") as f:
+        json.dump({"titles": list(titles), "docs": list(docs)}, f, ensure_ascii=False)
+    written.append("strings.json")
+    pairs = [(path / (name + tmp), path / name) for name in written]
+    if renames is None:
+        for src, dst in pairs:
+            os.replace(src, dst)
+    else:
+        renames.extend(pairs)
+    return len(vids)
+
+class ChunkStore:
+    def __init__(self, path):
+        path = Path(path)
+        assert (path / "texts.bin").exists(), f"No existe {path}/texts.bin"
+        self.path = path
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.vids = np.load(path / "vids.npy", mmap_mode="r")
+        self.vid_order = np.load(path / "vid_order.npy", mmap_mode="r")
+        self.title_ids = np.load(path / "title_ids.npy", mmap_mode="r")
+        self.doc_ids = np.load(path / "doc_ids.npy", mmap_mode="r")
+        self.vigencia = np.load(path / "vigencia.npy", mmap_mode="r")
+        with open(path / "strings.json", encoding="utf-8") as f:
+            strings = json.load(f)
+        self.titles: List[str] = strings["titles"]
+        self.docs: List[str] = strings["docs"]
+        self._f = open(path / "texts.bin", "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        self._blob = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.vids)
+
+    def row_of(self, vid: int) -> int:
+        # fila de un vector id (-1 si no existe), O(log N) sobre las columnas mmap
+        j = int(np.searchsorted(self.vids, vid, sorter=self.vid_order))
+        if j < len(self.vid_order):
+            row = int(self.vid_order[j])
+            if int(self.vids[row]) == vid:
+                return row
+        return -1
+
+    def text(self, row: int) -> str:
+        return self._blob[int(self.offsets[row]):int(self.offsets[row + 1])].decode("utf-8")
+
+    def title(self, row: int) -> str:
+        return self.titles[int(self.title_ids[row])]
+
+    def doc(self, row: int) -> str:
+        return self.docs[int(self.doc_ids[row])]
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._f.close()
+
+class MemoryChunkStore:
+    """Misma interfaz que ChunkStore sobre filas ya cargadas (meta.jsonl del formato anterior)."""
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = rows
+        self._row = {int(m["vid"]): i for i, m in enumerate(rows)} if rows and "vid" in rows[0] else None
+
+    @classmethod
+    def from_jsonl(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def row_of(self, vid: int) -> int:
+        if self._row is None:
+            return vid if 0 <= vid < len(self.rows) else -1
+        return self._row.get(vid, -1)
+
+    def text(self, row: int) -> str:
+        return self.rows[row]["text"]
+
+    def title(self, row: int) -> str:
+        m = self.rows[row]
+        return m["title"] if "title" in m else title_from_path(m["path"])
+
+    def doc(self, row: int) -> str:
+        m = self.rows[row]
+        return str(m.get("doc", m.get("path", "")))
+
+    def close(self):
+        pass
+
+def open_store(meta_path: str, store_path: Optional[str] = None):
+    # prefiere el .store binario junto a meta.jsonl; si no existe, carga el JSONL a memoria
+    store_path = store_path or store_path_for(meta_path)
+    if os.path.isdir(store_path):
+        return ChunkStore(store_path)
+    assert os.path.exists(meta_path), f"No existe {meta_path} ni {store_path}. Corre build_faiss.py"
+    return MemoryChunkStore.from_jsonl(meta_path)
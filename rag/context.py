@@ -0,0 +1,131 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+# Empaquetado del contexto para el prompt:
+#   1) fusiona chunks del mismo documento que se solapan (el final de uno es el inicio del otro:
+#      70 tokens en chunk_embed.py, 200 caracteres en rag/ingest.py) o que están contenidos en otro;
+#   2) descarta textos duplicados;
+#   3) llena un presupuesto de tokens (tiktoken) en orden de score, truncando el último bloque si conviene.
+# Devuelve también cuántos tokens se ahorraron respecto de unir los 8 textos tal cual.
+#   RAG_CONTEXT_TOKENS: presupuesto por defecto (default 2500; 0 = sin límite)
+
+SEP = "\n\n"
+ENCODING = "cl100k_base"
+DEFAULT_BUDGET = 2500
+MIN_OVERLAP = 20          # caracteres mínimos para considerar que dos chunks se solapan
+MIN_TAIL_TOKENS = 64      # no vale la pena truncar un bloque a menos que esto
+
+_enc = None
+
+def _encoding():
+    global _enc
+    if _enc is None:
+        import tiktoken
+        _enc = tiktoken.get_encoding(ENCODING)
+    return _enc
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode(text, disallowed_special=()))
+
+def default_budget() -> Optional[int]:
+    v = os.getenv("RAG_CONTEXT_TOKENS")
+    budget = int(v) if v else DEFAULT_BUDGET
+    return budget or None
+
+def _overlap(a: str, b: str, min_overlap: int = MIN_OVERLAP) -> int:
+    # largo del sufijo de `a` que es prefijo de `b` (0 si es menor que min_overlap)
+    if len(a) < min_overlap or len(b) < min_overlap:
+        return 0
+    head = b[:min_overlap]
+    i = a.find(head, max(0, len(a) - len(b)))
+    while i != -1:
+        if b.startswith(a[i:]):
+            return len(a) - i
+        i = a.find(head, i + 1)
+    return 0
+
+def _merge_doc(blocks: List[Dict]) -> List[Dict]:
+    # une bloques de un mismo documento hasta que no queden solapes ni contenidos
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(blocks)):
+            for j in range(len(blocks)):
+                if i == j:
+                    continue
+                a, b = blocks[i], blocks[j]
+                if b["text"] in a["text"]:
+                    text = a["text"]
+                else:
+                    ov = _overlap(a["text"], b["text"])
+                    if not ov:
+                        continue
+                    text = a["text"] + b["text"][ov:]
+                blocks[i] = {**a, "text": text, "score": max(a["score"], b["score"]),
+                             "members": a["members"] + b["members"]}
+                del blocks[j]
+                merged = True
+                break
+            if merged:
+                break
+    return blocks
+
+def _truncate(text: str, max_tokens: int) -> str:
+    enc = _encoding()
+    ids = enc.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    cut = enc.decode(ids[:max_tokens])
+    # no cortar a mitad de palabra
+    space = cut.rfind(" ")
+    return (cut[:space] if space > len(cut) // 2 else cut).rstrip() + " …"
+
+def pack_context(results: List[Dict], budget: Optional[int] = None, sep: str = SEP) -> Tuple[str, List[Dict], Dict]:
+    """results: [{title, text, score, doc?}, ...] → (contexto, bloques usados, estadísticas)."""
+    naive = sep.join(r["text"] for r in results)
+    stats = {"chunks_in": len(results), "blocks": 0, "tokens_naive": count_tokens(naive) if results else 0,
+             "tokens_packed": 0, "tokens_saved": 0, "truncated": False, "dropped": 0}
+    if not results:
+        return "", [], stats
+
+    # agrupar por documento conservando el orden de llegada
+    by_doc: Dict[str, List[Dict]] = {}
+    for rank, r in enumerate(results):
+        key = r.get("doc") or r.get("title", "")
+        by_doc.setdefault(key, []).append({"title": r.get("title", ""), "doc": key, "text": r["text"],
+                                           "score": float(r.get("score", -rank)), "members": [rank]})
+    blocks = [b for group in by_doc.values() for b in _merge_doc(group)]
+
+    # duplicados exactos entre documentos distintos (mismo texto indexado dos veces)
+    seen, unique = set(), []
+    for b in sorted(blocks, key=lambda b: (-b["score"], min(b["members"]))):
+        key = " ".join(b["text"].split())
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(b)
+
+    budget = default_budget() if budget is None else (budget or None)
+    sep_tokens = count_tokens(sep)
+    used, parts, total = [], [], 0
+    for b in unique:
+        cost = count_tokens(b["text"]) + (sep_tokens if parts else 0)
+        if budget is None or total + cost <= budget:
+            text = b["text"]
+        else:
+            room = budget - total - (sep_tokens if parts else 0)
+            if room < MIN_TAIL_TOKENS and parts:
+                stats["dropped"] += 1
+                continue
+            text = _truncate(b["text"], max(room, 1))
+            stats["truncated"] = True
+            cost = count_tokens(text) + (sep_tokens if parts else 0)
+        parts.append(text)
+        used.append({**b, "text": text})
+        total += cost
+
+    context = sep.join(parts)
+    stats["blocks"] = len(used)
+    stats["tokens_packed"] = count_tokens(context)
+    stats["tokens_saved"] = stats["tokens_naive"] - stats["tokens_packed"]
+    return context, used, stats
@@ -0,0 +1,157 @@
+import argparse, json, os, socket, socketserver, threading, time
+from typing import Dict, List, Optional, Tuple
+
+# Daemon de recuperación: mantiene modelo + índice cargados y atiende búsquedas por TCP
+# en localhost (funciona igual en Linux y Windows). Protocolo: una línea JSON por request
+# y una línea JSON por respuesta, sobre una conexión que puede reutilizarse.
+#   {"op": "ping"}                                       → {"ok": true, "pid": ..., "faiss": ..., "meta": ..., "signature": ...}
+#   {"op": "search", "query": "...", "k": 8, "mode": "dense|hybrid|lexical"}
+#                                                        → {"ok": true, "results": [...]}
+# Este módulo no importa torch: el cliente (app.py) lo usa sin pagar la carga del modelo.
+#   RAG_DAEMON_ADDR: host:puerto (default 127.0.0.1:8391)
+
+DEFAULT_ADDR = "127.0.0.1:8391"
+MODES = ("dense", "hybrid", "lexical")
+
+def daemon_addr() -> Tuple[str, int]:
+    host, _, port = (os.getenv("RAG_DAEMON_ADDR") or DEFAULT_ADDR).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def _index_paths(version=None) -> Dict[str, str]:
+    # el cliente solo usa un daemon que sirve los mismos archivos que cargaría él mismo
+    # (la versión activa de indexes/CURRENT, ver rag/bundles.py)
+    from rag.bundles import resolve
+    _, faiss_path, meta_path = resolve(version)
+    return {"faiss": os.path.abspath(faiss_path), "meta": os.path.abspath(meta_path)}
+
+class DaemonClient:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._file = sock.makefile("rwb")
+
+    @classmethod
+    def connect(cls, addr: Optional[Tuple[str, int]] = None, timeout: float = 0.3) -> Optional["DaemonClient"]:
+        # None si no hay daemon escuchando o si sirve otro índice (→ el llamador carga en proceso)
+        try:
+            sock = socket.create_connection(addr or daemon_addr(), timeout=timeout)
+        except OSError:
+            return None
+        client = cls(sock)
+        try:
+            info = client._call({"op": "ping"})
+        except (OSError, ValueError):
+            client.close()
+            return None
+        paths = _index_paths()
+        if {k: info.get(k) for k in ("faiss", "meta")} != paths:
+            client.close()
+            return None
+        from rag.bundles import signature
+        if info.get("signature") != signature(paths["faiss"], paths["meta"]):
+            # mismo índice pero reconstruido después de que el daemon lo cargó
+            print("[WARN] rag.daemon sirve una versión anterior del índice (reinícialo); se carga en proceso")
+            client.close()
+            return None
+        sock.settimeout(None)
+        return client
+
+    def _call(self, req: Dict) -> Dict:
+        self._file.write(json.dumps(req, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("el daemon cerró la conexión")
+        resp = json.loads(line)
+        if not resp.get("ok"):
+            raise RuntimeError(f"daemon: {resp.get('error')}")
+        return resp
+
+    def search(self, query: str, k: int = 8, mode: str = "dense", filter: Optional[str] = None) -> List[Dict]:
+        req = {"op": "search", "query": query, "k": k, "mode": mode}
+        if filter:
+            req["filter"] = filter
+        return self._call(req)["results"]
+
+    def close(self):
+        try:
+            self._file.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+                resp = self.server.dispatch(req)
+            except Exception as e:
+                resp = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(resp, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+class RetrievalDaemon(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, addr, nprobe=None, ef_search=None):
+        super().__init__(addr, _Handler)
+        self.nprobe, self.ef_search = nprobe, ef_search
+        self._retrievers = {}
+        self._lock = threading.Lock()
+        # versión que sirve este daemon (fija al arrancar); tras publicar otra los clientes dejan de usarlo
+        from rag.bundles import resolve, signature
+        self.version = resolve()[0]
+        self.paths = _index_paths(self.version)
+        # firma de los archivos al arrancar (antes de cargar): si cambian, los clientes dejan de usarlo
+        self.signature = signature(self.paths["faiss"], self.paths["meta"])
+
+    def retriever(self, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"modo desconocido: {mode}")
+        r = self._retrievers.get(mode)
+        if r is None:
+            with self._lock:
+                r = self._retrievers.get(mode)
+                if r is None:
+                    from rag.pipeline import make_retriever
+                    t0 = time.perf_counter()
+                    r = self._retrievers[mode] = make_retriever(mode, nprobe=self.nprobe, ef_search=self.ef_search,
+                                                                   version=self.version)
+                    print(f"[DAEMON] {mode} cargado en {time.perf_counter() - t0:.2f}s")
+        return r
+
+    def dispatch(self, req: Dict) -> Dict:
+        op = req.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "modes": sorted(self._retrievers), **self.paths,
+                    "signature": self.signature}
+        if op == "search":
+            retriever = self.retriever(req.get("mode", "dense"))
+            results = retriever.search(req["query"], k=int(req.get("k", 8)), filter=req.get("filter"))
+            return {"ok": True, "results": results}
+        raise ValueError(f"op desconocida: {op}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Daemon de recuperación (modelo + índice residentes)")
+    ap.add_argument("--addr", default=None, help=f"host:puerto (default RAG_DAEMON_ADDR o {DEFAULT_ADDR})")
+    ap.add_argument("--preload", nargs="*", choices=MODES, default=["dense"], help="modos a cargar al arrancar")
+    ap.add_argument("--nprobe", type=int, default=None)
+    ap.add_argument("--ef_search", type=int, default=None)
+    args = ap.parse_args()
+
+    if args.addr:
+        os.environ["RAG_DAEMON_ADDR"] = args.addr
+    host, port = daemon_addr()
+    if host not in ("127.0.0.1", "localhost", "::1"):
+        print(f"[WARN] El daemon no tiene autenticación: escuchando en {host}, no solo en localhost")
+    server = RetrievalDaemon((host, port), nprobe=args.nprobe, ef_search=args.ef_search)
+    for mode in args.preload:
+        server.retriever(mode)
+    print(f"[DAEMON] Escuchando en {host}:{port} (índice {_index_paths()['faiss']})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,61 @@
+from pathlib import Path
+import hashlib, sqlite3
+from typing import Callable, List
+import numpy as np
+
+# Caché persistente de embeddings en SQLite, clave = (modelo, sha1 del texto del chunk).
+# Un chunk que ya pasó por el modelo nunca se vuelve a codificar.
+
+SQL_VARS = 500   # SQLite limita la cantidad de parámetros por consulta
+
+class EmbeddingCache:
+    def __init__(self, path, model_name: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS emb ("
+            " model TEXT NOT NULL, h BLOB NOT NULL, dim INTEGER NOT NULL, v BLOB NOT NULL,"
+            " PRIMARY KEY (model, h))"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha1(text.encode("utf-8")).digest()
+
+    def _lookup(self, keys: List[bytes]) -> dict:
+        found = {}
+        for s in range(0, len(keys), SQL_VARS):
+            part = keys[s:s + SQL_VARS]
+            q = "SELECT h, dim, v FROM emb WHERE model = ? AND h IN (%s)" % ",".join("?" * len(part))
+            for h, dim, v in self.conn.execute(q, [self.model_name, *part]):
+                found[bytes(h)] = np.frombuffer(v, dtype=np.float32, count=dim)
+        return found
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Devuelve [len(texts), d] float32; solo los textos ausentes pasan por encode_fn."""
+        keys = [self._key(t) for t in texts]
+        found = self._lookup(list(set(keys)))
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        if missing:
+            E = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            rows = []
+            for k, v in zip(missing.keys(), E):
+                found[k] = v
+                rows.append((self.model_name, k, int(v.shape[0]), v.tobytes()))
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO emb VALUES (?, ?, ?, ?)", rows)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[k] for k in keys]).astype(np.float32, copy=False)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,227 @@
+from pathlib import Path
+import json, os, uuid
+from typing import List, Tuple
+import numpy as np
+
+# Matriz de embeddings sin comprimir, en shards abiertos con mmap (index/):
+#   embeddings.json                   → {"dtype", "n", "d", "shards": [{"file", "n", "scale"?}, ...]}
+#   embeddings-<run>-00000.npy        → [n_i, d] float32 | float16 | int8
+#   embeddings-<run>-00000.scale.npy  → float32[n_i] escala por fila (solo int8: v ≈ q * scale / 127)
+# MatrixWriter escribe en streaming (un shard cada shard_rows filas) y publica embeddings.json
+# al final con os.replace: quien abra el índice durante una ingesta ve la versión anterior completa.
+# np.load(mmap_mode="r") no lee nada al abrir: el arranque no depende de N y las páginas
+# quedan en el page cache compartido. La búsqueda recorre la matriz por bloques (memoria
+# acotada) y se queda con el top-k de cada bloque con argpartition (sin ordenar los N scores).
+# Formatos anteriores: embeddings.npy único (se abre igual, con mmap) y embeddings.npz (en memoria).
+
+DTYPES = ("float32", "float16", "int8")
+SHARD_ROWS = 16384        # filas por shard (el writer retiene a lo más un shard en float32)
+BLOCK_ROWS = 65536        # filas por bloque de scores (memoria acotada a BLOCK_ROWS × m floats)
+CAST_ROWS = 2048          # filas por conversión float16/int8 → float32
+
+META_FILE = "embeddings.json"
+
+def quantize_int8(E: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # simétrica por fila: cada fila usa todo el rango [-127, 127]
+    scale = np.abs(E).max(axis=1).astype(np.float32)
+    scale[scale == 0] = 1.0
+    q = np.rint(E / scale[:, None] * 127.0).astype(np.int8)
+    return q, scale
+
+def _read_meta(index_dir) -> dict:
+    path = Path(index_dir) / META_FILE
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def matrix_exists(index_dir) -> bool:
+    d = Path(index_dir)
+    return any((d / f).exists() for f in (META_FILE, "embeddings.npy", "embeddings.npz"))
+
+def _remove_stale(index_dir, keep: set):
+    # shards de corridas anteriores y formatos viejos; un proceso que aún los tenga
+    # abiertos con mmap sigue leyendo el inode hasta cerrarlo
+    for name in os.listdir(index_dir):
+        if name.startswith("embeddings") and name.endswith((".npy", ".npz", ".tmp")) and name not in keep:
+            os.remove(os.path.join(index_dir, name))
+
+class MatrixWriter:
+    """Escribe la matriz en streaming: append() por batches, un shard cada shard_rows filas."""
+
+    def __init__(self, index_dir, dtype: str = "float32", shard_rows: int = SHARD_ROWS):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype {dtype} no soportado (opciones: {', '.join(DTYPES)})")
+        self.dir = Path(index_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dtype, self.shard_rows = dtype, shard_rows
+        self.run = uuid.uuid4().hex[:8]
+        self.shards: List[dict] = []
+        self.n, self.d = 0, 0
+        self._buf, self._fill = None, 0
+
+    def append(self, E: np.ndarray):
+        E = np.asarray(E, dtype=np.float32)
+        if not len(E):
+            return
+        if self._buf is None:
+            self.d = int(E.shape[1])
+            self._buf = np.empty((self.shard_rows, self.d), dtype=np.float32)
+        pos = 0
+        while pos < len(E):
+            take = min(self.shard_rows - self._fill, len(E) - pos)
+            self._buf[self._fill:self._fill + take] = E[pos:pos + take]
+            self._fill += take
+            pos += take
+            if self._fill == self.shard_rows:
+                self._flush()
+
+    def _flush(self):
+        if not self._fill:
+            return
+        E = self._buf[:self._fill]
+        name = f"embeddings-{self.run}-{len(self.shards):05d}"
+        shard = {"file": name + ".npy", "n": self._fill}
+        if self.dtype == "int8":
+            q, scale = quantize_int8(E)
+            shard["scale"] = name + ".scale.npy"
+            np.save(self.dir / shard["scale"], scale)
+            np.save(self.dir / shard["file"], q)
+        else:
+            np.save(self.dir / shard["file"], E.astype(self.dtype))
+        self.shards.append(shard)
+        self.n += self._fill
+        self._fill = 0
+
+    def close(self) -> int:
+        self._flush()
+        self._buf = None
+        tmp = self.dir / (META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dtype": self.dtype, "n": self.n, "d": self.d, "shards": self.shards}, f)
+        os.replace(tmp, self.dir / META_FILE)
+        _remove_stale(self.dir, {s[key] for s in self.shards for key in ("file", "scale") if key in s})
+        return self.n
+
+def write_matrix(index_dir, E: np.ndarray, dtype: str = "float32", shard_rows: int = SHARD_ROWS) -> int:
+    """Escribe E [N, d] completa; devuelve N."""
+    w = MatrixWriter(index_dir, dtype, shard_rows)
+    w.append(E)
+    return w.close()
+
+def _topk(scores: np.ndarray, k: int) -> np.ndarray:
+    # índices de los k mayores, ordenados de mayor a menor
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+class EmbeddingMatrix:
+    def __init__(self, index_dir):
+        d = Path(index_dir)
+        meta = _read_meta(d)
+        if "shards" in meta:
+            arrays = [(np.load(d / s["file"], mmap_mode="r"),
+                       np.load(d / s["scale"], mmap_mode="r") if "scale" in s else None) for s in meta["shards"]]
+            self.dtype, self.d = meta["dtype"], int(meta["d"])
+        elif (d / "embeddings.npy").exists():
+            E = np.load(d / "embeddings.npy", mmap_mode="r")
+            scale = np.load(d / "embeddings.scale.npy", mmap_mode="r") if E.dtype == np.int8 else None
+            arrays = [(E, scale)]
+            self.dtype, self.d = str(E.dtype), int(E.shape[1]) if E.ndim == 2 else 0
+        else:
+            npz = d / "embeddings.npz"
+            assert npz.exists(), f"No existe {d / META_FILE} ni {npz}. Corre chunk_embed.py ingest"
+            E = np.load(npz)["E"].astype(np.float32)
+            arrays = [(E, None)]
+            self.dtype, self.d = "float32", int(E.shape[1]) if E.ndim == 2 else 0
+        self.parts = []           # [(E, scale | None, fila global inicial)]
+        self.n = 0
+        for E, scale in arrays:
+            self.parts.append((E, scale, self.n))
+            self.n += len(E)
+        self._fp16 = None
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def dim(self) -> int:
+        return self.d
+
+    def rows(self, start: int, stop: int) -> np.ndarray:
+        # copia en float32 de las filas [start, stop) (nunca una vista del mmap)
+        start, stop = max(start, 0), min(stop, self.n)
+        out = np.empty((max(stop - start, 0), self.d), dtype=np.float32)
+        for E, scale, p0 in self.parts:
+            s, e = max(start, p0) - p0, min(stop, p0 + len(E)) - p0
+            if s >= e:
+                continue
+            block = out[p0 + s - start:p0 + e - start]
+            np.copyto(block, E[s:e], casting="unsafe")
+            if scale is not None:
+                block *= (np.asarray(scale[s:e], dtype=np.float32) / 127.0)[:, None]
+        return out
+
+    def to_float32(self) -> np.ndarray:
+        return self.rows(0, len(self))
+
+    def _fp16_decoder(self):
+        # la conversión float16 → float32 de numpy es lenta (~3 ns/valor); el decodificador
+        # QT_fp16 de faiss (ya dependencia del proyecto) usa F16C y la hace ~2x más rápido
+        if self.dtype != "float16":
+            return None
+        if self._fp16 is None:
+            try:
+                import faiss
+                self._fp16 = faiss.IndexScalarQuantizer(self.dim, faiss.ScalarQuantizer.QT_fp16,
+                                                        faiss.METRIC_INNER_PRODUCT)
+            except ImportError:
+                self._fp16 = False
+        return self._fp16 or None
+
+    def _scores(self, E, scale, start: int, stop: int, Q: np.ndarray) -> np.ndarray:
+        # scores [b, m] de las filas [start, stop) de un shard
+        if E.dtype == np.float32:
+            return np.asarray(E[start:stop]) @ Q.T
+        # float16/int8: se convierte en sub-bloques chicos que caben en caché
+        S = np.empty((stop - start, Q.shape[0]), dtype=np.float32)
+        buf = np.empty((min(CAST_ROWS, stop - start), Q.shape[1]), dtype=np.float32)
+        fp16 = self._fp16_decoder()
+        for s in range(start, stop, CAST_ROWS):
+            e = min(s + CAST_ROWS, stop)
+            if fp16 is not None:
+                x = fp16.sa_decode(np.ascontiguousarray(E[s:e]).view(np.uint8))
+            else:
+                x = buf[:e - s]
+                np.copyto(x, E[s:e], casting="unsafe")
+            np.matmul(x, Q.T, out=S[s - start:e - start])
+        if scale is not None:
+            # int8: la escala de cada fila se aplica al score, no a la matriz
+            S *= (np.asarray(scale[start:stop], dtype=np.float32) / 127.0)[:, None]
+        return S
+
+    def search_batch(self, Q: np.ndarray, k: int, block_rows: int = BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+        """Q [m, d] → (idx [m, k'], scores [m, k']) por producto interno, k' = min(k, N)."""
+        Q = np.atleast_2d(np.asarray(Q, dtype=np.float32))
+        m = Q.shape[0]
+        k = min(k, len(self))
+        if k <= 0:
+            return np.zeros((m, 0), dtype=np.int64), np.zeros((m, 0), dtype=np.float32)
+        best_i = np.zeros((m, 0), dtype=np.int64)
+        best_s = np.zeros((m, 0), dtype=np.float32)
+        for E, scale, p0 in self.parts:
+            for start in range(0, len(E), block_rows):
+                stop = min(start + block_rows, len(E))
+                S = self._scores(E, scale, start, stop, Q).T                    # [m, b]
+                rows = np.arange(p0 + start, p0 + stop)
+                cand_i = np.concatenate([best_i, np.broadcast_to(rows, (m, len(rows)))], axis=1)
+                cand_s = np.concatenate([best_s, S], axis=1)
+                keep = np.stack([_topk(row, k) for row in cand_s])
+                best_i = np.take_along_axis(cand_i, keep, axis=1)
+                best_s = np.take_along_axis(cand_s, keep, axis=1)
+        return best_i, best_s
+
+    def search(self, qv: np.ndarray, k: int, block_rows: int = BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+        idx, scores = self.search_batch(qv[None, :], k, block_rows)
+        return idx[0], scores[0]
@@ -1,50 +1,132 @@
 from pathlib import Path
+import argparse
 import pandas as pd
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+
+from rag.manifest import Manifest, text_hash
+from rag.emb_cache import EmbeddingCache
+from rag.encoders import load_encoder, cache_key
+from rag.index_types import INDEX_TYPES, make_index, index_kind, supports_remove, evaluate, write_report, write_index
 
 EMB_MODEL   = "all-MiniLM-L6-v2"
 BATCH_SIZE  = 256
 
+def _load_previous(index_path, meta_path, index_type):
+    # índice y metadatos de la corrida anterior, solo si son del formato incremental
+    if not (Path(index_path).exists() and Path(meta_path).exists()):
+        return None, None
+    index = faiss.read_index(index_path)
+    meta = pd.read_parquet(meta_path)
+    if not isinstance(index, faiss.IndexIDMap2) or "vid" not in meta.columns or index.ntotal != len(meta):
+        return None, None
+    if index_kind(index) != index_type or not supports_remove(index):
+        return None, None
+    return index, meta
+
 def build_index(chunks_parquet="data/chunks.parquet",
                 index_path="data/index.faiss",
-                meta_path="data/meta.parquet"):
+                meta_path="data/meta.parquet",
+                manifest_path="data/manifest.json",
+                cache_path="data/emb_cache.sqlite",
+                full=False,
+                index_type="flat",
+                nlist=None,
+                hnsw_m=32,
+                pq_m=None):
     assert Path(chunks_parquet).exists(), "Falta data/chunks.parquet"
 
-    model = SentenceTransformer(EMB_MODEL)
+    # modelo perezoso: si todo sale de la caché, no se carga el encoder (RAG_ENCODER)
+    model = None
+    def _model():
+        nonlocal model
+        if model is None:
+            model = load_encoder(EMB_MODEL)
+        return model
+    def encode(texts):
+        return _model().encode(texts, convert_to_numpy=True, show_progress_bar=False, normalize_embeddings=True)
+    cache = EmbeddingCache(cache_path, cache_key(EMB_MODEL))
+
     print("[EMB] Cargando chunks (solo columnas necesarias)")
     df = pd.read_parquet(chunks_parquet, columns=["doc_id","title","url","vigencia","chunk_id","text"])
 
-    dim = model.get_sentence_embedding_dimension()
-    index = faiss.IndexFlatIP(dim)
+    # hash de contenido por documento → qué documentos cambiaron desde el último build
+    groups = {str(k): v for k, v in df.groupby("doc_id", sort=False).indices.items()}
+    current = {doc: text_hash("\x00".join(df["text"].iloc[rows])) for doc, rows in groups.items()}
+
+    manifest = Manifest(manifest_path, {"model": cache_key(EMB_MODEL)})   # cambiar de backend reprocesa todo
+    index, old_meta = (None, None) if full or not len(manifest) else _load_previous(index_path, meta_path, index_type)
+    if index is None:
+        manifest.reset()
 
-    metas = []
-    buf = []
+    added, changed, removed, unchanged = manifest.diff(current)
+    drop = [v for doc in changed + removed for v in manifest.entry(doc)["vector_ids"]]
+    for doc in removed:
+        manifest.remove(doc)
+    if drop:
+        index.remove_ids(np.array(drop, dtype="int64"))
+        old_meta = old_meta[~old_meta["vid"].isin(drop)]
+    print(f"[EMB] agregados={len(added)} cambiados={len(changed)} eliminados={len(removed)} sin_cambios={len(unchanged)}")
 
-    def _flush(embs):
-        nonlocal index, buf
-        embs = np.asarray(embs, dtype=np.float32)
+    # solo las filas de documentos nuevos o modificados pasan por el embedding
+    rows, vids = [], []
+    for doc in added + changed:
+        r = groups[doc]
+        rows.extend(r.tolist())
+        vids.extend(manifest.assign(doc, current[doc], df["chunk_id"].iloc[r].tolist()))
+
+    metas = [old_meta] if old_meta is not None else []
+    pending = []   # build nuevo de un tipo entrenable (IVF/HNSW): se entrena con todos los vectores al final
+    print(f"[EMB] Filas a embeber: {len(rows)} de {len(df)}")
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = df.iloc[rows[start:start+BATCH_SIZE]]
+        ids = np.array(vids[start:start+BATCH_SIZE], dtype="int64")
+        embs = np.asarray(cache.encode(batch["text"].tolist(), encode), dtype=np.float32)
         # normalizar para dot-product (IP)
         norms = np.linalg.norm(embs, axis=1, keepdims=True) + 1e-12
         embs = embs / norms
-        index.add(embs)
-        buf.clear()
-
-    print(f"[EMB] Total filas: {len(df)}")
-    for start in range(0, len(df), BATCH_SIZE):
-        batch = df.iloc[start:start+BATCH_SIZE]
-        texts = batch["text"].tolist()
-        embs = model.encode(texts, convert_to_numpy=True, show_progress_bar=False, normalize_embeddings=True)
-        _flush(embs)
-        metas.append(batch.drop(columns=["text"]))  # guardar metadatos sin el texto grande
-
-    # guardar índice y metadatos
+        if index is None and index_type == "flat":
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(embs.shape[1]))
+        if index is None:
+            pending.append((embs, ids))
+        else:
+            index.add_with_ids(embs, ids)
+        metas.append(batch.drop(columns=["text"]).assign(vid=ids))  # guardar metadatos sin el texto grande
+
+    if pending:
+        E = np.concatenate([e for e, _ in pending])
+        I = np.concatenate([i for _, i in pending])
+        base = make_index(index_type, E.shape[1], len(E), nlist=nlist, hnsw_m=hnsw_m, pq_m=pq_m)
+        if not base.is_trained:
+            base.train(E)
+        index = faiss.IndexIDMap2(base)
+        index.add_with_ids(E, I)
+        report = evaluate(index, E, I)
+        write_report(report, index_path + ".report.json")
+        print(f"[EMB] {report['type']}: recall@{report['k']}={report['recall@%d' % report['k']]} "
+              f"p50={report['p50_ms']}ms p99={report['p99_ms']}ms")
+
+    if index is None:  # corpus vacío
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(_model().get_sentence_embedding_dimension()))
+
+    # guardar índice, metadatos y manifiesto
     Path(index_path).parent.mkdir(parents=True, exist_ok=True)
-    faiss.write_index(index, index_path)
-    pd.concat(metas, ignore_index=True).to_parquet(meta_path, index=False)
+    write_index(index, index_path)
+    meta = pd.concat(metas, ignore_index=True) if metas else pd.DataFrame(columns=["doc_id","title","url","vigencia","chunk_id","vid"])
+    meta.to_parquet(meta_path, index=False)
+    manifest.save()
+    cache.close()
+    print(f"[CACHE] hits={cache.hits} misses={cache.misses}")
     print(f"[OK] Index FAISS: {index.ntotal} vectores → {index_path}")
     print(f"[OK] Metadatos → {meta_path}")
 
 if __name__ == "__main__":
-    build_index()
+    ap = argparse.ArgumentParser(description="Embeddings + índice FAISS desde data/chunks.parquet")
+    ap.add_argument("--full", action="store_true", help="ignora el manifiesto y reconstruye todo")
+    ap.add_argument("--index_type", choices=INDEX_TYPES, default="flat")
+    ap.add_argument("--nlist", type=int, default=None)
+    ap.add_argument("--hnsw_m", type=int, default=32)
+    ap.add_argument("--pq_m", type=int, default=None)
+    args = ap.parse_args()
+    build_index(full=args.full, index_type=args.index_type, nlist=args.nlist,
+                hnsw_m=args.hnsw_m, pq_m=args.pq_m)
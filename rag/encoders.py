@@ -0,0 +1,168 @@
+from pathlib import Path
+import argparse, json, os, time
+from typing import List, Optional
+import numpy as np
+
+# Backends de embeddings intercambiables, con el mismo contrato que SentenceTransformer.encode
+# (float32 [N, d], normalizados si normalize_embeddings=True):
+#   torch      → sentence-transformers / PyTorch (default)
+#   onnx       → ONNX Runtime sobre una exportación del mismo modelo (fp32)
+#   onnx-int8  → idem, con pesos cuantizados a int8 (cuantización dinámica)
+# El backend ONNX solo importa onnxruntime + tokenizers: ni torch ni transformers.
+#   RAG_ENCODER=torch|onnx|onnx-int8 ; RAG_ONNX_DIR=directorio de la exportación (default models/<modelo>-onnx)
+# Exportar: python -m rag.encoders export --model sentence-transformers/all-MiniLM-L6-v2 --int8
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_FP32 = "model.onnx"
+ONNX_INT8 = "model_int8.onnx"
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    return (backend or os.getenv("RAG_ENCODER") or "torch").lower()
+
+def cache_key(model: str, backend: Optional[str] = None) -> str:
+    # clave para EmbeddingCache / manifest: vectores de otro backend no se mezclan con los de torch
+    backend = resolve_backend(backend)
+    return model if backend == "torch" else f"{model}#{backend}"
+
+def _st_dim(st) -> int:
+    # sentence-transformers >= 6 renombró get_sentence_embedding_dimension
+    return (getattr(st, "get_embedding_dimension", None) or st.get_sentence_embedding_dimension)()
+
+def default_onnx_dir(model: str) -> str:
+    return os.getenv("RAG_ONNX_DIR") or os.path.join("models", model.rstrip("/").split("/")[-1] + "-onnx")
+
+class TorchEncoder:
+    backend = "torch"
+
+    def __init__(self, model: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return _st_dim(self.model)
+
+    def encode(self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        E = self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True,
+                              normalize_embeddings=normalize_embeddings, show_progress_bar=show_progress_bar)
+        return np.asarray(E, dtype=np.float32)
+
+class OnnxEncoder:
+    def __init__(self, onnx_dir: str, int8: bool = False, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        d = Path(onnx_dir)
+        path = d / (ONNX_INT8 if int8 else ONNX_FP32)
+        assert path.exists(), f"No existe {path}. Corre python -m rag.encoders export{' --int8' if int8 else ''}"
+        with open(d / "encoder.json", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.backend = "onnx-int8" if int8 else "onnx"
+
+        self.tokenizer = Tokenizer.from_file(str(d / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config.get("pad_token_id", 0))
+
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.config["dim"])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in enc], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in enc], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]                     # [B, T, d]
+        # mean pooling con máscara (igual que el módulo Pooling de sentence-transformers)
+        m = mask[:, :, None].astype(np.float32)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        # ordenar por largo reduce el padding dentro de cada batch; se devuelve en el orden original
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for s in range(0, len(texts), batch_size):
+            idx = order[s:s + batch_size]
+            out[idx] = self._encode_batch([texts[i] for i in idx])
+        if normalize_embeddings:
+            out /= np.linalg.norm(out, axis=1, keepdims=True) + 1e-12
+        return out
+
+def load_encoder(model: str, backend: Optional[str] = None, onnx_dir: Optional[str] = None):
+    backend = resolve_backend(backend)
+    if backend == "torch":
+        return TorchEncoder(model)
+    if backend in ("onnx", "onnx-int8"):
+        threads = os.getenv("RAG_ONNX_THREADS")
+        return OnnxEncoder(onnx_dir or default_onnx_dir(model), int8=backend == "onnx-int8",
+                           threads=int(threads) if threads else None)
+    raise ValueError(f"Backend de embeddings desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+
+def export_onnx(model: str, out_dir: str, int8: bool = False, opset: int = 17):
+    # exporta el transformer del mismo SentenceTransformer que usa el backend torch;
+    # el pooling (mean) y la normalización se hacen en numpy en OnnxEncoder
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model, device="cpu")
+    pooling = st[1] if len(st) > 1 else None
+    if pooling is not None and not getattr(pooling, "pooling_mode_mean_tokens", True):
+        raise ValueError("Solo se soporta mean pooling (el de all-MiniLM-L6-v2)")
+    auto_model = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(str(out))          # tokenizer.json (fast tokenizer)
+    assert (out / "tokenizer.json").exists(), "El modelo no tiene tokenizer rápido (tokenizer.json)"
+
+    sample = tokenizer(["exportación onnx", "calendario académico 2025"], padding=True, return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, m):
+            super().__init__()
+            self.m = m
+        def forward(self, *args):
+            return self.m(**dict(zip(names, args))).last_hidden_state
+
+    axes = {n: {0: "batch", 1: "seq"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+    t0 = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(_Wrapper(auto_model), tuple(sample[n] for n in names), str(out / ONNX_FP32),
+                          input_names=names, output_names=["last_hidden_state"], dynamic_axes=axes,
+                          opset_version=opset, dynamo=False)
+    print(f"[ONNX] {out / ONNX_FP32} ({time.perf_counter() - t0:.1f}s)")
+
+    with open(out / "encoder.json", "w", encoding="utf-8") as f:
+        json.dump({"model": model, "dim": _st_dim(st),
+                   "max_seq_length": st.max_seq_length, "pooling": "mean",
+                   "pad_token_id": tokenizer.pad_token_id or 0}, f, indent=2)
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(out / ONNX_FP32), str(out / ONNX_INT8), weight_type=QuantType.QInt8)
+        print(f"[ONNX] {out / ONNX_INT8} (int8 dinámico)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Backends de embeddings (torch / ONNX Runtime)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    pe = sub.add_parser("export", help="exporta el modelo a ONNX (y opcionalmente int8)")
+    pe.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    pe.add_argument("--out", default=None, help="default: models/<modelo>-onnx")
+    pe.add_argument("--int8", action="store_true", help="además genera model_int8.onnx")
+    pe.add_argument("--opset", type=int, default=17)
+    args = ap.parse_args()
+    export_onnx(args.model, args.out or default_onnx_dir(args.model), int8=args.int8, opset=args.opset)
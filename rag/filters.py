@@ -0,0 +1,266 @@
+import math, re, threading, unicodedata
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+import faiss
+
+from rag.cache import LRUCache, MISSING
+from rag.chunk_store import _vigencia
+from rag.index_types import unwrap
+
+# Búsqueda filtrada por metadatos dentro de FAISS (IDSelector + SearchParameters), sin
+# post-filtrar un k más grande. Sintaxis del filtro (condiciones con ";" = AND, valores con "|" = OR):
+#   "vigencia>=2023"                       → =, !=, >, >=, <, <= sobre el año (0 = desconocida, nunca pasa >=/>)
+#   "title=Calendario Académico 2025"      → título exacto, sin distinguir mayúsculas ni tildes
+#   "doc=calendario academico 2025.txt"    → archivo de origen (con o sin extensión); = y !=
+#   "vigencia>=2023; doc=a.pdf|b.pdf"
+# FacetIndex precalcula, una sola vez por store, las filas de cada título, documento y año; cada
+# filtro se resuelve con uniones/intersecciones de esos arreglos ordenados y su IDSelector queda
+# en una caché LRU (un bitmap si los ids son densos, IDSelectorBatch si no).
+
+FIELDS = {"vigencia": "vigencia", "title": "title", "titulo": "title", "doc": "doc"}
+TEXT_OPS = ("=", "!=")
+
+# más de 1 id permitido cada 256 del rango → bitmap (rango/8 bytes) en vez de tabla hash
+BITMAP_MIN_DENSITY = 1 / 256
+# tope de efSearch al ensanchar HNSW para filtros selectivos
+MAX_EF_SEARCH = 4096
+# HNSW: el recorrido del grafo se queda sin candidatos admitidos cuando el filtro deja pocas filas
+# (recall@8 ~0.5 con el 25% en benchmarks/filtered_search.py); por debajo de esta fracción se busca
+# exacto sobre el almacenamiento plano del HNSW, evaluando solo las filas admitidas
+HNSW_EXACT_FRACTION = 0.3
+
+_COND_RE = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$", re.S)
+
+Filter = Tuple[Tuple[str, str, Tuple], ...]
+
+def normalize_value(text: str) -> str:
+    # "Calendario_Académico  2025" → "calendario academico 2025"
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.replace("_", " ").split())
+
+def parse_filter(spec) -> Optional[Filter]:
+    """'vigencia>=2023; title=...' → tupla ordenada y hashable (clave de caché); None si no hay filtro."""
+    if spec is None:
+        return None
+    if not isinstance(spec, str):
+        raise ValueError(f"filtro inválido: {spec!r} (se espera texto, p.ej. 'vigencia>=2023')")
+    conds = set()
+    for part in spec.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        m = _COND_RE.match(part)
+        if m is None:
+            raise ValueError(f"condición inválida: {part!r} (campo, operador y valor, p.ej. 'vigencia>=2023')")
+        name, op, value = m.groups()
+        field = FIELDS.get(normalize_value(name))
+        if field is None:
+            raise ValueError(f"campo de filtro desconocido: {name.strip()!r} (vigencia | title | doc)")
+        values = [v.strip() for v in value.split("|") if v.strip()]
+        if not values:
+            raise ValueError(f"condición sin valor: {part!r}")
+        if field == "vigencia":
+            try:
+                values = tuple(sorted({int(v) for v in values}))
+            except ValueError:
+                raise ValueError(f"vigencia debe ser un año: {part!r}") from None
+            if len(values) > 1 and op not in TEXT_OPS:
+                raise ValueError(f"'|' solo con = o != : {part!r}")
+        else:
+            if op not in TEXT_OPS:
+                raise ValueError(f"{field} solo admite = o != : {part!r}")
+            values = tuple(sorted({normalize_value(v) for v in values}))
+        conds.add((field, op, values))
+    return tuple(sorted(conds)) or None
+
+def format_filter(key: Optional[Filter]) -> str:
+    return "; ".join(f"{f}{op}{'|'.join(map(str, vs))}" for f, op, vs in key or ())
+
+def _groups(codes: np.ndarray, labels: Sequence[str]) -> Dict[str, np.ndarray]:
+    # etiqueta normalizada → filas (ordenadas); varias etiquetas pueden colapsar en la misma
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+    out: Dict[str, list] = {}
+    for rows in np.split(order, bounds) if len(order) else []:
+        out.setdefault(labels[int(codes[rows[0]])], []).append(rows)
+    return {label: np.sort(np.concatenate(parts)) for label, parts in out.items()}
+
+def _union(parts) -> np.ndarray:
+    parts = list(parts)
+    if not parts:
+        return np.empty(0, dtype=np.int64)
+    return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+class FacetIndex:
+    """Filas por título, documento y año de vigencia de un store, y sus IDSelector por filtro."""
+
+    def __init__(self, ids, title_codes, titles, doc_codes, docs, vigencia, cache_size: int = 64):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.n = len(self.ids)
+        self.max_id = int(self.ids.max()) if self.n else -1
+        self.ids_sorted = bool(np.all(self.ids[1:] > self.ids[:-1]))
+        self._title = _groups(np.asarray(title_codes), [normalize_value(t) for t in titles])
+        doc_labels = [normalize_value(d) for d in docs]
+        self._doc = _groups(np.asarray(doc_codes), doc_labels)
+        # "archivo.pdf" también se encuentra como "archivo"
+        for label, rows in list(self._doc.items()):
+            stem = label.rsplit(".", 1)[0] if "." in label else label
+            if stem != label:
+                self._doc[stem] = _union([self._doc[stem], rows]) if stem in self._doc else rows
+        vig = np.asarray(vigencia, dtype=np.int64)
+        years, inv = np.unique(vig, return_inverse=True)
+        self._years = years
+        self._by_year = [np.flatnonzero(inv == i) for i in range(len(years))]
+        self._cache = LRUCache(cache_size)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, store):
+        # ChunkStore: columnas mmap ya codificadas; MemoryChunkStore (meta.jsonl antiguo): filas en memoria
+        if hasattr(store, "title_ids"):
+            return cls(store.vids, store.title_ids, store.titles, store.doc_ids, store.docs, store.vigencia)
+        ids = [int(store.rows[i].get("vid", i)) for i in range(len(store))]
+        vig = [store.rows[i].get("vigencia", 0) for i in range(len(store))]
+        return cls.from_columns(ids, [store.title(i) for i in range(len(store))],
+                                [store.doc(i) for i in range(len(store))], vig)
+
+    @classmethod
+    def from_columns(cls, ids, titles, docs, vigencia):
+        # columnas por fila (strings sin codificar), p.ej. meta.parquet de rag/embed.py
+        title_table, title_codes = np.unique(np.asarray(titles, dtype=object).astype(str), return_inverse=True)
+        doc_table, doc_codes = np.unique(np.asarray(docs, dtype=object).astype(str), return_inverse=True)
+        vig = [_vigencia(v) for v in vigencia]
+        return cls(ids, title_codes, list(title_table), doc_codes, list(doc_table), vig)
+
+    def _rows_for(self, field, op, values) -> np.ndarray:
+        if field == "vigencia":
+            if op in TEXT_OPS:
+                mask = np.isin(self._years, values)
+            else:
+                y = values[0]
+                mask = {">=": self._years >= y, ">": self._years > y,
+                        "<=": (self._years <= y) & (self._years > 0),
+                        "<": (self._years < y) & (self._years > 0)}[op]
+            if op == "!=":
+                mask = ~mask
+            return _union(rows for rows, m in zip(self._by_year, mask) if m)
+        groups = self._title if field == "title" else self._doc
+        rows = _union(groups[v] for v in values if v in groups)
+        if op == "!=":
+            rows = np.setdiff1d(np.arange(self.n, dtype=np.int64), rows, assume_unique=True)
+        return rows
+
+    def rows(self, key: Filter) -> np.ndarray:
+        """Filas (ordenadas) que cumplen todas las condiciones."""
+        out = None
+        for cond in key:
+            rows = self._rows_for(*cond)
+            out = rows if out is None else np.intersect1d(out, rows, assume_unique=True)
+            if not len(out):
+                break
+        return np.arange(self.n, dtype=np.int64) if out is None else out.astype(np.int64, copy=False)
+
+    def selection(self, key: Filter) -> "Selection":
+        sel = self._cache.get(key)
+        if sel is MISSING:
+            with self._lock:
+                sel = self._cache.get(key)
+                if sel is MISSING:
+                    sel = Selection(self, self.rows(key))
+                    self._cache.put(key, sel)
+        return sel
+
+def make_selector(ids: np.ndarray, span: int):
+    """IDSelector para ids ordenados en [0, span): bitmap si son densos, tabla hash si no.
+
+    Devuelve (selector, buffer); el buffer debe seguir vivo mientras se use el selector.
+    """
+    if len(ids) >= span * BITMAP_MIN_DENSITY:
+        mask = np.zeros(span, dtype=bool)
+        mask[ids] = True
+        # bit (id & 7) del byte id >> 3, como lo lee IDSelectorBitmap
+        bitmap = np.packbits(mask, bitorder="little")
+        return faiss.IDSelectorBitmap(bitmap), bitmap
+    return faiss.IDSelectorBatch(ids), None
+
+def _hnsw_of(index: faiss.Index):
+    # (HNSW, id_map o None) si el índice es HNSW directo o dentro de un solo IndexIDMap/IndexIDMap2
+    if isinstance(index, faiss.IndexHNSW):
+        return index, None
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            return inner, faiss.vector_to_array(index.id_map)
+    return None, None
+
+class Selection:
+    """Resultado de un filtro: filas, ids y el IDSelector de FAISS (None si no excluye nada)."""
+
+    def __init__(self, facets: FacetIndex, rows: np.ndarray):
+        self.rows = rows
+        self.ids = facets.ids[rows] if facets.ids_sorted else np.sort(facets.ids[rows])
+        self.count = len(rows)
+        self.fraction = self.count / facets.n if facets.n else 0.0
+        self.selector = self._buffer = None
+        if 0 < self.count < facets.n:
+            self.selector, self._buffer = make_selector(self.ids, facets.max_id + 1)
+        self._exact = None   # (índice, (storage, selector por posición, id_map) | None, buffer): HNSW exacto
+
+    @property
+    def empty(self) -> bool:
+        return self.count == 0
+
+    def allows_rows(self, rows: np.ndarray) -> np.ndarray:
+        # máscara booleana sobre filas (para BM25 u otros que trabajan por fila)
+        rows = np.asarray(rows, dtype=np.int64)
+        if not self.count:
+            return np.zeros(len(rows), dtype=bool)
+        pos = np.searchsorted(self.rows, rows)
+        pos[pos >= self.count] = 0
+        return self.rows[pos] == rows
+
+    def search_params(self, index: faiss.Index):
+        """SearchParameters con el selector y los parámetros actuales del índice.
+
+        Los SearchParameters reemplazan nprobe/efSearch del índice, así que se copian;
+        con filtros selectivos se ensanchan en proporción para no quedarse con menos de k.
+        """
+        if self.selector is None:
+            return None
+        base = unwrap(index)
+        widen = 1.0 / max(self.fraction, 1e-9)
+        if isinstance(base, faiss.IndexIVF):
+            nprobe = min(base.nlist, math.ceil(base.nprobe * widen))
+            return faiss.SearchParametersIVF(sel=self.selector, nprobe=max(nprobe, base.nprobe))
+        if isinstance(base, faiss.IndexHNSW):
+            ef = base.hnsw.efSearch
+            return faiss.SearchParametersHNSW(sel=self.selector, efSearch=max(ef, min(MAX_EF_SEARCH, math.ceil(ef * widen))))
+        return faiss.SearchParameters(sel=self.selector)
+
+    def search(self, index: faiss.Index, Q: np.ndarray, k: int):
+        """index.search(Q, k) restringido al filtro; devuelve (D, I) con los ids del índice."""
+        if self.selector is None:
+            return index.search(Q, k)
+        if self.fraction < HNSW_EXACT_FRACTION:
+            exact = self._exact_hnsw(index)
+            if exact is not None:
+                storage, sel, id_map = exact
+                D, I = storage.search(Q, k, params=faiss.SearchParameters(sel=sel))
+                if id_map is not None:
+                    I = np.where(I >= 0, id_map[np.maximum(I, 0)], -1)
+                return D, I
+        return index.search(Q, k, params=self.search_params(index))
+
+    def _exact_hnsw(self, index):
+        # selector sobre posiciones del almacenamiento plano del HNSW (se arma una vez por índice)
+        if self._exact is None or self._exact[0] is not index:
+            hnsw, id_map = _hnsw_of(index)
+            if hnsw is None or not isinstance(faiss.downcast_index(hnsw.storage), faiss.IndexFlat):
+                self._exact = (index, None, None)
+            else:
+                pos = np.flatnonzero(np.isin(id_map, self.ids)) if id_map is not None else self.ids
+                sel, buf = make_selector(pos, hnsw.ntotal)
+                self._exact = (index, (faiss.downcast_index(hnsw.storage), sel, id_map), buf)
+        return self._exact[1]
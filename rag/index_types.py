@@ -0,0 +1,186 @@
+import json, os, time
+from typing import Dict, Optional
+import numpy as np
+import faiss
+
+# Tipos de índice FAISS seleccionables (todos con producto interno sobre vectores normalizados):
+#   flat   → búsqueda exacta, O(N·d) por consulta
+#   hnsw   → grafo HNSW (sin entrenamiento; no admite borrado → sin build incremental)
+#   ivf    → IVF-Flat, nlist listas entrenadas con k-means; se ajusta con nprobe
+#   ivfpq  → IVF + product quantization (pq_m subvectores de 8 bits)
+#   ivfsq  → IVF + scalar quantizer de 8 bits
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq", "ivfsq")
+MIN_POINTS_PER_CENTROID = 39   # lo que k-means de FAISS pide para no advertir
+
+def default_nlist(n: int) -> int:
+    return max(1, min(int(4 * np.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+def default_pq_m(d: int) -> int:
+    # mayor divisor de d que deja subvectores de al menos 4 dimensiones (384 → 96)
+    for m in range(d // 4, 0, -1):
+        if d % m == 0:
+            return m
+    return 1
+
+def built_kind(kind: str, n: int, nlist: Optional[int] = None) -> str:
+    # tipo que make_index construye de verdad con n vectores: los ivf* sin datos suficientes para
+    # entrenar bajan a flat (o ivfpq a ivf). build_faiss lo usa para comparar con el índice guardado
+    nlist = nlist or default_nlist(n)
+    if kind.startswith("ivf") and n < nlist:
+        return "flat"
+    if kind == "ivfpq" and n < 256:
+        return "ivf"
+    return kind
+
+def make_index(kind: str, d: int, n: int, nlist: Optional[int] = None,
+               hnsw_m: int = 32, ef_construction: int = 200, pq_m: Optional[int] = None,
+               nprobe: Optional[int] = None, ef_search: int = 64) -> faiss.Index:
+    # nprobe/efSearch quedan guardados en el archivo como valor por defecto de búsqueda
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Tipo de índice no válido: {kind}. Usa {' | '.join(INDEX_TYPES)}")
+    nlist = nlist or default_nlist(n)
+    built = built_kind(kind, n, nlist)
+    if built == "flat" and kind != "flat":
+        print(f"[FAISS] {n} vectores no alcanzan para entrenar nlist={nlist}: se usa flat")
+    elif built != kind:
+        print(f"[FAISS] {n} vectores no alcanzan para entrenar PQ (mín. 256): se usa ivf")
+    kind = built
+
+    if kind == "flat":
+        return faiss.IndexFlatIP(d)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = ef_search
+        return index
+    quantizer = faiss.IndexFlatIP(d)
+    if kind == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+    elif kind == "ivfpq":
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m or default_pq_m(d), 8, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, faiss.ScalarQuantizer.QT_8bit,
+                                              faiss.METRIC_INNER_PRODUCT)
+    index.nprobe = nprobe or max(1, nlist // 8)
+    index.referenced_objects = [quantizer]   # evita que Python libere el cuantizador
+    return index
+
+def read_index(path: str, mmap: bool = False) -> faiss.Index:
+    # mmap=True: los códigos (flat, almacenamiento del HNSW, listas IVF) y el grafo quedan en páginas
+    # del archivo (page cache) en vez de memoria anónima; varios procesos sobre el mismo index.faiss
+    # comparten esas páginas. Solo lectura: el índice no admite add/remove.
+    if mmap and hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    if mmap:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)   # faiss antiguo: solo IVF
+    return faiss.read_index(path)
+
+def write_index(index: faiss.Index, path: str, renames=None):
+    # archivo nuevo + rename: un proceso que tenga el índice anterior con mmap sigue leyendo el
+    # archivo viejo (mismo inodo) en vez de ver uno truncado a medio escribir (SIGBUS).
+    # Con renames (lista), el rename queda pendiente para que quien llama los haga todos juntos
+    tmp = f"{path}.tmp{os.getpid()}"
+    faiss.write_index(index, tmp)
+    if renames is None:
+        os.replace(tmp, path)
+    else:
+        renames.append((tmp, path))
+
+def unwrap(index: faiss.Index) -> faiss.Index:
+    # quita los envoltorios de ids (IndexIDMap/IndexIDMap2) para llegar al índice real
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+def index_kind(index: faiss.Index) -> str:
+    base = unwrap(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(base, faiss.IndexIVFScalarQuantizer):
+        return "ivfsq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+def supports_remove(index: faiss.Index) -> bool:
+    return index_kind(index) != "hnsw"
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    # parámetros de búsqueda en tiempo de ejecución; se ignoran si no aplican al tipo de índice
+    base = unwrap(index)
+    if nprobe is not None and isinstance(base, faiss.IndexIVF):
+        base.nprobe = int(nprobe)
+    if ef_search is not None and isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = int(ef_search)
+
+def sample_queries(E: np.ndarray, nq: int = 500, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    # consultas sintéticas: vectores del corpus con ruido gaussiano (renormalizados),
+    # así el vecino exacto no es trivialmente el propio vector
+    rng = np.random.default_rng(seed)
+    Q = E[rng.choice(len(E), size=min(nq, len(E)), replace=False)].astype("float32")
+    Q = Q + rng.normal(scale=noise, size=Q.shape).astype("float32")
+    return Q / (np.linalg.norm(Q, axis=1, keepdims=True) + 1e-12)
+
+def latency_percentiles(index: faiss.Index, Q: np.ndarray, k: int) -> Dict[str, float]:
+    # una consulta por llamada, como en RetrieverFAISS.search
+    ts = []
+    for q in Q:
+        t0 = time.perf_counter()
+        index.search(q[None, :], k)
+        ts.append(time.perf_counter() - t0)
+    ts = np.array(ts) * 1000
+    return {"p50_ms": round(float(np.percentile(ts, 50)), 4), "p99_ms": round(float(np.percentile(ts, 99)), 4)}
+
+def _recall(index, Q, I_exact, k):
+    _, I = index.search(Q, k)
+    hits = sum(len(set(a.tolist()) & set(b.tolist())) for a, b in zip(I, I_exact))
+    return round(hits / (len(Q) * k), 4)
+
+def _search_param(index):
+    base = unwrap(index)
+    if isinstance(base, faiss.IndexIVF):
+        return "nprobe", base.nprobe, [p for p in (1, 2, 4, 8, 16, 32, 64, 128) if p <= base.nlist]
+    if isinstance(base, faiss.IndexHNSW):
+        return "efSearch", base.hnsw.efSearch, [16, 32, 64, 128, 256]
+    return None, None, []
+
+def evaluate(index: faiss.Index, E: np.ndarray, ids: Optional[np.ndarray] = None,
+             k: int = 8, nq: int = 500) -> Dict:
+    """recall@k del índice contra la búsqueda exacta (IndexFlatIP) + latencias p50/p99.
+
+    ids: vector id de cada fila de E cuando el índice está envuelto en IndexIDMap2.
+    Incluye un barrido de nprobe/efSearch; el índice queda con su valor original.
+    """
+    Q = sample_queries(E, nq)
+    k = min(k, len(E))
+    exact = faiss.IndexFlatIP(E.shape[1])
+    exact.add(E)
+    _, I_exact = exact.search(Q, k)
+    if ids is not None:
+        I_exact = ids[I_exact]
+
+    name, current, values = _search_param(index)
+    sweep = []
+    for v in values:
+        set_search_params(index, **{"nprobe" if name == "nprobe" else "ef_search": v})
+        sweep.append({name: v, f"recall@{k}": _recall(index, Q, I_exact, k), **latency_percentiles(index, Q, k)})
+    if name:
+        set_search_params(index, **{"nprobe" if name == "nprobe" else "ef_search": current})
+
+    return {
+        "type": index_kind(index),
+        "ntotal": int(index.ntotal),
+        "k": k,
+        "queries": len(Q),
+        "search_param": {name: current} if name else {},
+        f"recall@{k}": _recall(index, Q, I_exact, k),
+        **latency_percentiles(index, Q, k),
+        "flat": latency_percentiles(exact, Q, k),
+        "sweep": sweep,
+    }
+
+def write_report(report: Dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
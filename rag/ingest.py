@@ -1,17 +1,26 @@
 from pathlib import Path
-import json, gc
-from typing import Iterable, Dict, List
+import json, os, argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, Dict, List, Optional, Tuple
 from pypdf import PdfReader
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 CHUNK_CHARS = 1500   # tamaño aprox por caracteres
 OVERLAP     = 200
-BATCH_SIZE  = 500    # cuántos chunks escribir por vez
+ROW_GROUP_SIZE = 5000    # filas por row group de chunks.parquet (= chunks retenidos en memoria)
+PAGES_PER_TASK = 8   # páginas de PDF que procesa cada tarea en modo paralelo
 
-def _yield_pdf_text(path: Path) -> Iterable[str]:
+def _yield_pdf_text(path: Path, start: int = 0, stop: Optional[int] = None) -> Iterable[str]:
     reader = PdfReader(str(path))
-    for page in reader.pages:
-        t = page.extract_text() or ""
+    pages = reader.pages
+    stop = len(pages) if stop is None else min(stop, len(pages))
+    for i in range(start, stop):
+        t = pages[i].extract_text() or ""
         t = " ".join(t.split())
         if t:
             yield t
@@ -27,6 +36,49 @@ def _yield_txt_text(path: Path) -> Iterable[str]:
         if buf:
             yield " ".join(buf)
 
+def _yield_blocks(path: Path) -> Iterable[str]:
+    return _yield_pdf_text(path) if path.suffix.lower()==".pdf" else _yield_txt_text(path)
+
+# --- extracción paralela ---
+# Cada tarea es (path, página inicial, página final). Los PDF se parten en rangos
+# de PAGES_PER_TASK páginas; los .txt van en una sola tarea. El chunking se hace
+# en el proceso principal y por bloque, así la salida es idéntica al modo serial.
+
+def _extract_task(task: Tuple[str, int, Optional[int]]) -> List[str]:
+    path, start, stop = task
+    path = Path(path)
+    if path.suffix.lower() == ".pdf":
+        return list(_yield_pdf_text(path, start, stop))
+    return list(_yield_txt_text(path))
+
+def _page_tasks(paths: List[Path]) -> Iterator[Tuple[str, int, Optional[int]]]:
+    for path in paths:
+        if path.suffix.lower() == ".pdf":
+            n_pages = len(PdfReader(str(path)).pages)
+            for start in range(0, max(n_pages, 1), PAGES_PER_TASK):
+                yield (str(path), start, start + PAGES_PER_TASK)
+        else:
+            yield (str(path), 0, None)
+
+def _blocks_serial(paths: List[Path]) -> Iterator[Tuple[Path, Iterable[str]]]:
+    for path in paths:
+        yield path, _yield_blocks(path)
+
+def _blocks_parallel(paths: List[Path], workers: int) -> Iterator[Tuple[Path, Iterable[str]]]:
+    # ventana acotada de tareas en vuelo: los resultados se consumen en orden
+    # y nunca hay más de 2*workers rangos de páginas esperando en memoria
+    tasks = _page_tasks(paths)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = deque()
+        for task in tasks:
+            pending.append((task[0], ex.submit(_extract_task, task)))
+            if len(pending) >= 2 * workers:
+                p, fut = pending.popleft()
+                yield Path(p), fut.result()
+        while pending:
+            p, fut = pending.popleft()
+            yield Path(p), fut.result()
+
 def _chunk_stream(text: str, size=CHUNK_CHARS, overlap=OVERLAP) -> Iterable[str]:
     n = len(text)
     if n == 0:
@@ -37,8 +89,22 @@ def _chunk_stream(text: str, size=CHUNK_CHARS, overlap=OVERLAP) -> Iterable[str]
         c = text[start:end].strip()
         if c:
             yield c
+        if end == n:
+            break
         start = max(0, end - overlap)
 
+# Esquema fijo de chunks.parquet: no depende de lo que infiera pandas en cada lote.
+# title/url/vigencia se repiten en todos los chunks de un documento → diccionario en el archivo.
+SCHEMA = pa.schema([
+    ("doc_id", pa.string()),
+    ("title", pa.string()),
+    ("url", pa.string()),
+    ("vigencia", pa.string()),
+    ("chunk_id", pa.string()),
+    ("text", pa.string()),
+])
+DICT_COLUMNS = ["doc_id", "title", "url", "vigencia"]
+
 def _load_sources(path: Path) -> pd.DataFrame:
     if not path.exists() or path.stat().st_size == 0:
         return pd.DataFrame()
@@ -49,87 +115,109 @@ def _load_sources(path: Path) -> pd.DataFrame:
             continue
     return pd.DataFrame()
 
+def load_sources_by_filename(path) -> Dict[str, Dict]:
+    # filename → fila de sources.csv (title, url, vigencia, ...)
+    sources = _load_sources(Path(path))
+    if sources.empty or "filename" not in sources.columns:
+        return {}
+    sources = sources.fillna("").drop_duplicates("filename")
+    return {r["filename"]: r for r in sources.to_dict(orient="records")}
+
 def ingest_docs(
     docs_dir="data/docs",
     sources_csv="data/sources.csv",
-    out_jsonl="data/chunks.jsonl",
-    out_parquet="data/chunks.parquet"
+    out_jsonl: Optional[str] = None,
+    out_parquet="data/chunks.parquet",
+    workers: int = 1,
+    row_group_size: int = ROW_GROUP_SIZE,
 ):
+    # una sola pasada: los chunks van directo a un ParquetWriter por row groups;
+    # chunks.jsonl solo se escribe si se pide (out_jsonl)
     docs_dir = Path(docs_dir)
     assert docs_dir.exists(), f"No existe {docs_dir}"
 
-    sources = _load_sources(Path(sources_csv))
-
-    # limpiar archivos previos
-    Path(out_jsonl).parent.mkdir(parents=True, exist_ok=True)
-    if Path(out_jsonl).exists():
-        Path(out_jsonl).unlink()
-
-    total_chunks = 0
-    batch: List[Dict] = []
-
-    print(f"[INGEST] Leyendo {docs_dir.resolve()}")
-
-    for path in list(docs_dir.glob("*.pdf")) + list(docs_dir.glob("*.txt")):
-        # metadatos opcionales desde sources.csv
-        meta = {}
-        if not sources.empty and "filename" in sources.columns:
-            m = sources[sources["filename"] == path.name]
-            if len(m):
-                meta = m.iloc[0].to_dict()
-
-        base = {
-            "doc_id": path.stem,
-            "title": meta.get("title", path.stem),
-            "url": meta.get("url", ""),
-            "vigencia": meta.get("vigencia", ""),
-        }
-
-        # stream por bloques
-        blocks = _yield_pdf_text(path) if path.suffix.lower()==".pdf" else _yield_txt_text(path)
-
-        chunk_i = 0
-        for block in blocks:
-            for ch in _chunk_stream(block):
-                row = dict(base)
-                row["chunk_id"] = f"{path.stem}-{chunk_i}"
-                row["text"] = ch
-                batch.append(row)
-                chunk_i += 1
-                total_chunks += 1
-
-                if len(batch) >= BATCH_SIZE:
-                    with open(out_jsonl, "a", encoding="utf-8") as f:
-                        for r in batch:
-                            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-                    batch.clear()
-                    gc.collect()
-
-        print(f"[OK] {path.name}: {chunk_i} chunks")
-
-    # flush final
-    if batch:
-        with open(out_jsonl, "a", encoding="utf-8") as f:
-            for r in batch:
-                f.write(json.dumps(r, ensure_ascii=False) + "\n")
-        batch.clear()
-
-    # convertir jsonl → parquet (columnar y compacto)
-    # se hace en streaming de nuevo
-    records = []
-    with open(out_jsonl, "r", encoding="utf-8") as f:
-        for i, line in enumerate(f, 1):
-            records.append(json.loads(line))
-            if len(records) >= 5000:
-                df = pd.DataFrame(records)
-                mode = "w" if not Path(out_parquet).exists() else "a"
-                df.to_parquet(out_parquet, index=False, engine="pyarrow", compression="zstd", append=(mode=="a"))
-                records.clear()
-    if records:
-        df = pd.DataFrame(records)
-        df.to_parquet(out_parquet, index=False, engine="pyarrow", compression="zstd", append=Path(out_parquet).exists())
-
-    print(f"[OK] Total chunks: {total_chunks} → {out_parquet}")
+    sources = load_sources_by_filename(sources_csv)   # filename → fila, búsqueda O(1)
+
+    Path(out_parquet).parent.mkdir(parents=True, exist_ok=True)
+    tmp_parquet = str(out_parquet) + ".tmp"
+    writer = pq.ParquetWriter(tmp_parquet, SCHEMA, compression="zstd", use_dictionary=DICT_COLUMNS)
+    jsonl = None
+    try:
+        jsonl = open(out_jsonl, "w", encoding="utf-8") if out_jsonl else None
+
+        columns: Dict[str, List[str]] = {name: [] for name in SCHEMA.names}
+        total_chunks = 0
+
+        def flush():
+            if columns["chunk_id"]:
+                writer.write_table(pa.table(columns, schema=SCHEMA), row_group_size=row_group_size)
+                for col in columns.values():
+                    col.clear()
+
+        print(f"[INGEST] Leyendo {docs_dir.resolve()} (workers={workers})")
+
+        paths = sorted(docs_dir.glob("*.pdf")) + sorted(docs_dir.glob("*.txt"))
+        stream = _blocks_parallel(paths, workers) if workers > 1 else _blocks_serial(paths)
+
+        # un documento puede llegar partido en varias tareas consecutivas: se reagrupan por path
+        for path, parts in groupby(stream, key=itemgetter(0)):
+            # metadatos opcionales desde sources.csv
+            meta = sources.get(path.name, {})
+            base = {
+                "doc_id": path.stem,
+                "title": str(meta.get("title") or path.stem),
+                "url": str(meta.get("url", "")),
+                "vigencia": str(meta.get("vigencia", "")),
+            }
+
+            # stream por bloques (en orden de página)
+            blocks = chain.from_iterable(b for _, b in parts)
+
+            chunk_i = 0
+            for block in blocks:
+                for ch in _chunk_stream(block):
+                    chunk_id = f"{path.stem}-{chunk_i}"
+                    for key, value in base.items():
+                        columns[key].append(value)
+                    columns["chunk_id"].append(chunk_id)
+                    columns["text"].append(ch)
+                    if jsonl:
+                        jsonl.write(json.dumps({**base, "chunk_id": chunk_id, "text": ch}, ensure_ascii=False) + "\n")
+                    chunk_i += 1
+                    total_chunks += 1
+                    if len(columns["chunk_id"]) >= row_group_size:
+                        flush()
+
+            print(f"[OK] {path.name}: {chunk_i} chunks")
+
+        flush()
+        writer.close()
+        if jsonl:
+            jsonl.close()
+    except BaseException:
+        # un worker o el writer falló: no deja el .tmp a medias en disco (el error original es el que sube)
+        try:
+            writer.close()
+        except Exception:
+            pass
+        if jsonl:
+            jsonl.close()
+        if os.path.exists(tmp_parquet):
+            os.remove(tmp_parquet)
+        raise
+    os.replace(tmp_parquet, out_parquet)
+
+    print(f"[OK] Total chunks: {total_chunks} → {out_parquet}" + (f" (+ {out_jsonl})" if out_jsonl else ""))
 
 if __name__ == "__main__":
-    ingest_docs()
+    ap = argparse.ArgumentParser(description="Ingesta de documentos → chunks.parquet (y opcionalmente chunks.jsonl)")
+    ap.add_argument("--docs_dir", default="data/docs")
+    ap.add_argument("--sources_csv", default="data/sources.csv")
+    ap.add_argument("--out_jsonl", default=None, help="además escribe los chunks en JSONL (p.ej. data/chunks.jsonl)")
+    ap.add_argument("--out_parquet", default="data/chunks.parquet")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="procesos para extraer texto (1 = serial, 0 = todos los núcleos)")
+    ap.add_argument("--row_group_size", type=int, default=ROW_GROUP_SIZE)
+    args = ap.parse_args()
+    ingest_docs(args.docs_dir, args.sources_csv, args.out_jsonl, args.out_parquet,
+                workers=args.workers or os.cpu_count() or 1, row_group_size=args.row_group_size)
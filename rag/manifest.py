@@ -0,0 +1,89 @@
+from pathlib import Path
+import json, hashlib, os
+from typing import Dict, List, Tuple
+
+# Manifiesto de indexación incremental:
+#   archivo → hash de contenido → chunk ids → vector ids (ids estables del índice FAISS)
+# Si cambian los parámetros que afectan a los vectores (modelo, tamaño de chunk...)
+# el manifiesto se descarta y todo se considera "agregado".
+
+MANIFEST_VERSION = 1
+
+def file_hash(path, block_size=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(block_size), b""):
+            h.update(b)
+    return h.hexdigest()
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class Manifest:
+    def __init__(self, path, params: Dict = None):
+        self.path = Path(path)
+        self.params = dict(params or {})
+        self.files: Dict[str, Dict] = {}
+        self.next_vid = 0
+        self.next_doc_id = 0
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION and data.get("params") == self.params:
+                self.files = data.get("files", {})
+                self.next_vid = data.get("next_vid", 0)
+                self.next_doc_id = data.get("next_doc_id", 0)
+            else:
+                print(f"[MANIFEST] Parámetros distintos en {self.path}: reconstrucción completa")
+
+    def reset(self):
+        # fuerza reconstrucción completa (los vector ids siguen creciendo, nunca se reutilizan)
+        self.files = {}
+
+    def __contains__(self, key):
+        return key in self.files
+
+    def __len__(self):
+        return len(self.files)
+
+    def entry(self, key) -> Dict:
+        return self.files[key]
+
+    def diff(self, current: Dict[str, str]) -> Tuple[List[str], List[str], List[str], List[str]]:
+        """Compara {clave: hash} actual contra el manifiesto → (agregados, cambiados, eliminados, sin cambios)."""
+        added, changed, unchanged = [], [], []
+        for key, sha in current.items():
+            if key not in self.files:
+                added.append(key)
+            elif self.files[key]["sha256"] != sha:
+                changed.append(key)
+            else:
+                unchanged.append(key)
+        removed = [k for k in self.files if k not in current]
+        return added, changed, removed, unchanged
+
+    def assign(self, key: str, sha: str, chunk_ids: List) -> List[int]:
+        """Registra (o reemplaza) un archivo y le asigna vector ids nuevos, uno por chunk."""
+        old = self.files.get(key)
+        doc_id = old["doc_id"] if old else self.next_doc_id
+        if not old:
+            self.next_doc_id += 1
+        vids = list(range(self.next_vid, self.next_vid + len(chunk_ids)))
+        self.next_vid += len(chunk_ids)
+        self.files[key] = {"sha256": sha, "doc_id": doc_id, "chunk_ids": list(chunk_ids), "vector_ids": vids}
+        return vids
+
+    def remove(self, key: str) -> List[int]:
+        return self.files.pop(key)["vector_ids"]
+
+    def vector_ids(self) -> List[int]:
+        return [v for e in self.files.values() for v in e["vector_ids"]]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "params": self.params,
+                       "next_vid": self.next_vid, "next_doc_id": self.next_doc_id,
+                       "files": self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
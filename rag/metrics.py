@@ -0,0 +1,137 @@
+import bisect, os, threading, time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# Latencia por etapa en el camino caliente (carga del retriever, encode, búsqueda FAISS, prompt,
+# proveedor...). span("etapa") mide con perf_counter y acumula en un histograma de buckets fijos;
+# GET /metrics lo expone en el formato de texto de Prometheus. trace() junta además las duraciones
+# de las etapas de una sola petición (columnas por etapa de evaluate_benchmark.py).
+# Costo por span: dos perf_counter, un bisect y un lock sin contención (~2 µs; una búsqueda con
+# encode cuesta milisegundos, ver benchmarks/metrics_overhead.py). RAG_METRICS=0 desactiva los histogramas.
+# Los histogramas son por proceso: con varios workers, cada uno expone los suyos.
+
+STAGE_METRIC = "rag_stage_seconds"
+# segundos; cubren desde un lookup en caché (<1 ms) hasta una llamada lenta al LLM
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Registry:
+    def __init__(self):
+        self._hists: Dict[Tuple[str, Labels], Histogram] = {}
+        self._help: Dict[str, str] = {STAGE_METRIC: "Latencia por etapa del pipeline RAG (segundos)"}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, labels: Labels) -> Histogram:
+        key = (name, labels)
+        h = self._hists.get(key)
+        if h is None:
+            with self._lock:
+                h = self._hists.setdefault(key, Histogram())
+        return h
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+
+    def summary(self) -> Dict[str, Dict]:
+        # {etapa[,label=valor]: {count, mean_ms}} para /stats y logs
+        out = {}
+        for (name, labels), h in sorted(self._hists.items()):
+            _, total, count = h.snapshot()
+            key = ",".join(v if k == "stage" else f"{k}={v}" for k, v in labels) or name
+            out[key] = {"count": count, "mean_ms": round(1000 * total / count, 3) if count else 0.0}
+        return out
+
+    def render(self) -> str:
+        # formato de texto de Prometheus (buckets acumulados, _sum y _count)
+        lines = []
+        by_name: Dict[str, list] = {}
+        for (name, labels), h in sorted(self._hists.items()):
+            by_name.setdefault(name, []).append((labels, h))
+        for name, series in by_name.items():
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in series:
+                counts, total, count = h.snapshot()
+                base = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                sep = "," if base else ""
+                acc = 0
+                for le, c in zip(h.buckets + (float("inf"),), counts):
+                    acc += c
+                    le_s = "+Inf" if le == float("inf") else repr(le)
+                    lines.append(f'{name}_bucket{{{base}{sep}le="{le_s}"}} {acc}')
+                lines.append(f"{name}_sum{{{base}}} {total:.6f}")
+                lines.append(f"{name}_count{{{base}}} {count}")
+        return "\n".join(lines) + "\n"
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REGISTRY = Registry()
+ENABLED = os.getenv("RAG_METRICS", "1") != "0"
+_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar("rag_trace", default=None)
+
+def _labels(stage: str, labels: Dict) -> Labels:
+    return (("stage", stage),) + tuple(sorted(labels.items())) if labels else (("stage", stage),)
+
+def _observe(stage: str, labels: Labels, seconds: float):
+    if ENABLED:
+        REGISTRY.histogram(STAGE_METRIC, labels).observe(seconds)
+    tr = _trace.get()
+    if tr is not None:
+        tr[stage] = tr.get(stage, 0.0) + seconds
+
+def record(stage: str, seconds: float, **labels):
+    # para duraciones medidas a mano (p.ej. el tiempo al primer token de un stream)
+    _observe(stage, _labels(stage, labels), seconds)
+
+class span:
+    """with span("encode"): ...  → observa la duración en rag_stage_seconds{stage="encode"}."""
+    __slots__ = ("stage", "labels", "t0")
+
+    def __init__(self, stage: str, **labels):
+        self.stage = stage
+        self.labels = _labels(stage, labels)
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _observe(self.stage, self.labels, time.perf_counter() - self.t0)
+        return False
+
+class trace:
+    """with trace() as t: ...  → t = {etapa: segundos} de los spans del contexto actual (hilo/tarea)."""
+
+    def __enter__(self) -> Dict[str, float]:
+        self.stages: Dict[str, float] = {}
+        self._token = _trace.set(self.stages)
+        return self.stages
+
+    def __exit__(self, *exc):
+        _trace.reset(self._token)
+        return False
+
+def render() -> str:
+    return REGISTRY.render()
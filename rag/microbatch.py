@@ -0,0 +1,90 @@
+import threading, queue, time
+from concurrent.futures import Future
+from typing import Callable, List
+
+# Micro-batching de recuperación: las consultas concurrentes (p.ej. varios /ask a la vez)
+# se acumulan hasta max_wait_ms o hasta max_batch y se resuelven con una sola llamada a
+# search_batch (un forward del modelo + un index.search). Cada llamador espera su Future.
+
+class MicroBatcher:
+    def __init__(self, search_batch: Callable[[List[str], int], List[list]],
+                 max_batch: int = 16, max_wait_ms: float = 5.0):
+        self.search_batch = search_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._q: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()   # ningún request entra a la cola después del cierre
+        self.batches = 0
+        self.queries = 0
+        self._thread = threading.Thread(target=self._loop, name="retrieval-microbatch", daemon=True)
+        self._thread.start()
+
+    def search(self, query: str, k: int = 8):
+        fut = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher cerrado")
+            self._q.put((query, k, fut))
+        return fut.result()
+
+    def stats(self):
+        return {"batches": self.batches, "queries": self.queries,
+                "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0}
+
+    def close(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._q.put(None)
+        self._thread.join(timeout=1.0)
+
+    def _collect(self):
+        first = self._q.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._q.put(None)   # re-encola el cierre para salir tras este lote
+                break
+            batch.append(item)
+        return batch
+
+    def _drain(self):
+        # al cerrar: lo que haya quedado en la cola falla en vez de esperar para siempre
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[2].set_exception(RuntimeError("MicroBatcher cerrado"))
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                self._drain()
+                return
+            # un solo k por lote (el mayor); cada llamador recibe su prefijo top-k
+            k = max(item[1] for item in batch)
+            try:
+                results = self.search_batch([item[0] for item in batch], k)
+            except Exception as e:
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, k_i, fut), res in zip(batch, results):
+                fut.set_result(res[:k_i])
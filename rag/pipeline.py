@@ -0,0 +1,342 @@
+import hashlib, hmac, json, logging, os, threading, time, weakref
+from collections import OrderedDict
+
+from rag.prompts import SYSTEM_PROMPT
+from rag.context import pack_context
+from rag import bundles, metrics
+from rag.metrics import span
+
+# Piezas comunes de Flask, ASGI, app.py y rag/daemon.py: construcción y carga perezosa del retriever,
+# búsqueda (directa o micro-batch) y armado del prompt.
+
+NOT_FOUND = "No encontrado en normativa UFRO. Para esta consulta, te sugiero contactar con la unidad correspondiente."
+
+def env_int(name):
+    v = os.getenv(name)
+    return int(v) if v else None
+
+def make_retriever(mode, nprobe=None, ef_search=None, cache_size=1024, version=None):
+    # lexical: solo BM25 (meta.bm25), sin importar torch ni cargar el modelo de embeddings;
+    # dense / hybrid: RetrieverFAISS (hybrid además fusiona con BM25 vía RRF)
+    # (version, o la activa de indexes/CURRENT si existe, ver rag/bundles.py)
+    _, faiss_path, meta_path = bundles.resolve(version)
+    if mode == "lexical":
+        from rag.bm25 import LexicalRetriever
+        return LexicalRetriever(meta_path=meta_path)
+    from retriever_faiss import RetrieverFAISS
+    dense = RetrieverFAISS(faiss_path=faiss_path, meta_path=meta_path,
+                           nprobe=nprobe, ef_search=ef_search, cache_size=cache_size)
+    if mode == "hybrid":
+        from rag.bm25 import HybridRetriever, LexicalRetriever
+        return HybridRetriever(dense, LexicalRetriever(meta_path=meta_path))
+    return dense
+
+log = logging.getLogger(__name__)
+
+# --- carga perezosa del retriever (evita que el server se caiga al importar) ---
+# _active = (versión, retriever, huella): se reemplaza entero en un hot-reload. Cada request toma la referencia
+# una vez (prepare) y termina sobre esa versión; la anterior se libera al soltarla el último request.
+_active = None
+_batcher = None
+_load_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_reload = {"reloads": 0, "failures": 0, "last_error": None, "last_load_sec": None, "loaded_at": None}
+_retired = {}   # versiones reemplazadas que algún request todavía usa: id → versión
+_watcher_pid = None
+# tokens de contexto enviados / ahorrados por el empaquetado (GET /stats)
+_ctx = {"prompts": 0, "tokens_packed": 0, "tokens_saved": 0}
+_ctx_lock = threading.Lock()
+
+def _local_fingerprint(faiss_path=bundles.FAISS_NAME, meta_path=bundles.META_NAME):
+    sig = json.dumps(bundles.signature(faiss_path, meta_path), sort_keys=True)
+    return f"{bundles.LOCAL}-{hashlib.sha1(sig.encode()).hexdigest()[:12]}"
+
+def _load_version(version=None, lazy_model=False):
+    from retriever_faiss import RetrieverFAISS
+    version, faiss_path, meta_path = bundles.resolve(version)
+    # huella del corpus (caché de respuestas y watcher): el nombre de la versión publicada es inmutable;
+    # los archivos locales cambian con cada build_faiss.py. Se toma antes de cargar: si cambian durante
+    # la carga, el watcher ve otra huella y vuelve a cargar
+    fingerprint = _local_fingerprint(faiss_path, meta_path) if version == bundles.LOCAL else version
+    # FAISS_NPROBE / FAISS_EF_SEARCH: parámetros de búsqueda para índices IVF / HNSW
+    # RAG_CACHE_SIZE / RAG_CACHE_TTL: caché LRU de consultas (0 = desactivada; TTL en segundos)
+    # RAG_INDEX_MMAP=1: index.faiss con mmap (páginas compartidas entre workers)
+    retriever = RetrieverFAISS(faiss_path=faiss_path, meta_path=meta_path,
+                               nprobe=env_int("FAISS_NPROBE"), ef_search=env_int("FAISS_EF_SEARCH"),
+                               cache_size=int(os.getenv("RAG_CACHE_SIZE") or 1024),
+                               cache_ttl=env_int("RAG_CACHE_TTL"),
+                               mmap=os.getenv("RAG_INDEX_MMAP", "0") == "1",
+                               lazy_model=lazy_model)
+    return version, retriever, fingerprint
+
+def get_retriever(lazy_model=False):
+    global _active
+    if _active is None:
+        with _load_lock:
+            if _active is None:
+                with span("retriever_load"):
+                    # versión activa de indexes/CURRENT, o index.faiss + meta.jsonl (rag/bundles.py)
+                    _active = _load_version(lazy_model=lazy_model)
+                _reload["loaded_at"] = time.time()
+    return _active[1]
+
+def active_version():
+    return _active[0] if _active is not None else None
+
+def index_fingerprint():
+    get_retriever()
+    return _active[2]
+
+def reload(version=None, make_active=False):
+    """Carga `version` (default: la de indexes/CURRENT) junto a la activa y la intercambia.
+
+    La versión nueva reutiliza el modelo y se precalienta antes del cambio, así los requests no
+    pagan la carga; los que ya están en curso terminan con la versión anterior. make_active=True
+    además la escribe en indexes/CURRENT, para que los demás workers la sigan (watcher).
+    """
+    global _active
+    with _reload_lock:
+        old = _active
+        t0 = time.perf_counter()
+        try:
+            if make_active and version and version != bundles.LOCAL:
+                bundles.activate(version)
+            with span("index_reload"):
+                new = _load_version(version, lazy_model=old is not None)
+                if old is not None:
+                    new[1].share_model(old[1])
+                new[1].warmup(facets=old is not None and old[1].facets_loaded)
+        except Exception as e:
+            _reload["failures"] += 1
+            _reload["last_error"] = str(e)
+            log.exception("reload de la versión %s falló; sigue activa %s", version, active_version())
+            raise
+        _active = new
+        _reload["reloads"] += 1
+        _reload["last_error"] = None
+        _reload["last_load_sec"] = round(time.perf_counter() - t0, 3)
+        _reload["loaded_at"] = time.time()
+    if old is not None:
+        # se libera cuando el último request que la usa suelta la referencia
+        _retired[id(old[1])] = old[0]
+        weakref.finalize(old[1], _retired.pop, id(old[1]), None)
+        del old
+    log.info("índice: versión %s activa (%.2fs)", new[0], _reload["last_load_sec"])
+    return version_info()
+
+def version_info():
+    return {"version": active_version(), "current": bundles.current_version(),
+            "versions": bundles.list_versions(), "retired_in_use": sorted(_retired.values()),
+            **_reload}
+
+def _watch(interval):
+    # cada `interval` segundos compara indexes/CURRENT con la versión activa (sin CURRENT, la huella de
+    # los archivos locales que reescribe build_faiss.py); una versión que no carga no se reintenta
+    # hasta que cambie de nuevo. Una huella local nueva se carga cuando se repite en dos revisiones
+    # seguidas: build_faiss.py renombra índice, store y BM25 uno tras otro y una revisión justo entre
+    # medio vería la mezcla
+    failed = seen = None
+    while True:
+        time.sleep(interval)
+        active = _active
+        if active is None:
+            continue
+        target = bundles.current_version()
+        if target is None:
+            if active[0] != bundles.LOCAL:
+                continue
+            target, loaded = _local_fingerprint(), active[2]
+            if target != loaded and target != seen:
+                seen = target   # todavía puede estar cambiando: se espera a la próxima revisión
+                continue
+        else:
+            loaded = active[0]
+        if target == failed or target == loaded:
+            continue
+        try:
+            reload(None if target.startswith(bundles.LOCAL + "-") else target)
+        except Exception:
+            failed = target   # ya registrado en reload(); sigue la versión activa
+
+def ensure_watcher():
+    # un hilo por proceso (también en cada worker tras el fork: los hilos no se heredan).
+    # RAG_RELOAD_INTERVAL segundos entre revisiones (default 5, 0 = sin watcher; queda /admin/reload)
+    global _watcher_pid
+    if _watcher_pid == os.getpid():
+        return
+    with _load_lock:
+        if _watcher_pid == os.getpid():
+            return
+        _watcher_pid = os.getpid()
+        interval = float(os.getenv("RAG_RELOAD_INTERVAL") or 5)
+        if interval > 0:
+            threading.Thread(target=_watch, args=(interval,), name="index-watcher", daemon=True).start()
+
+def fork_safe_model() -> bool:
+    # torch: cargar los pesos no arranca hilos, se pueden cargar antes del fork (copy-on-write).
+    # ONNX Runtime crea sus pools de hilos al construir la sesión: cada worker carga la suya.
+    from rag.encoders import resolve_backend
+    return resolve_backend() == "torch"
+
+def preload():
+    # modo preload/fork (gunicorn.conf.py): en el proceso maestro, antes del fork, se abre
+    # index.faiss (mmap si RAG_INDEX_MMAP=1) y meta.store (mmap) y, si es seguro, el modelo;
+    # los workers heredan esas páginas en vez de cargar cada uno su copia.
+    # Sin encode ni index.search aquí: los pools de OpenMP (torch/FAISS) no sobreviven al fork.
+    retriever = get_retriever(lazy_model=True)
+    if fork_safe_model():
+        retriever.load_model()
+    log.info("preload: índice %s (versión %s), modelo %s", retriever.index_type, active_version(),
+             "cargado" if retriever.model_loaded else "se carga en cada worker")
+    return retriever
+
+def after_fork():
+    # en cada worker (post_fork): el modelo que no se cargó en el maestro se carga ahora,
+    # al arrancar el worker y no en su primer request
+    if _active is not None and not _active[1].model_loaded:
+        _active[1].load_model()
+    ensure_watcher()
+
+def get_search():
+    # RAG_MICROBATCH=1 agrupa las recuperaciones concurrentes de /ask en un solo lote
+    # (hasta RAG_BATCH_MAX consultas o RAG_BATCH_WAIT_MS milisegundos de espera)
+    global _batcher
+    retriever = get_retriever()
+    if os.getenv("RAG_MICROBATCH", "0") != "1":
+        return retriever.search
+    if _batcher is None:
+        with _load_lock:
+            if _batcher is None:
+                from rag.microbatch import MicroBatcher
+                # siempre sobre la versión activa: el lote no queda atado al índice de su creación
+                _batcher = MicroBatcher(lambda queries, k: get_retriever().search_batch(queries, k=k),
+                                        max_batch=env_int("RAG_BATCH_MAX") or 16,
+                                        max_wait_ms=float(os.getenv("RAG_BATCH_WAIT_MS") or 5))
+    return _batcher.search
+
+def stats():
+    # contadores de la caché de consultas y del micro-batcher (sin forzar la carga del retriever)
+    out = {"pid": os.getpid(), "retriever_loaded": _active is not None, "index_version": active_version()}
+    if _active is not None:
+        out["cache"] = _active[1].cache_stats()
+    if _batcher is not None:
+        out["microbatch"] = _batcher.stats()
+    if _answers is not None:
+        out["answer_cache"] = _answers.stats()
+    with _ctx_lock:
+        out["context"] = dict(_ctx)
+    out["stages"] = metrics.REGISTRY.summary()
+    return out
+
+# --- caché semántica de respuestas (rag/answer_cache.py) ---
+# RAG_ANSWER_CACHE=1 la activa; RAG_ANSWER_CACHE_PATH (default answer_cache.sqlite),
+# RAG_ANSWER_CACHE_THRESHOLD (coseno mínimo, default 0.92), RAG_ANSWER_CACHE_TTL (segundos, default 7 días),
+# RAG_ANSWER_CACHE_STALE (s sin respuestas nuevas para podar una versión anterior del índice, default 3600)
+_answers = None
+
+def get_answer_cache():
+    global _answers
+    if _answers is None and os.getenv("RAG_ANSWER_CACHE", "0") == "1":
+        with _load_lock:
+            if _answers is None:
+                from rag.answer_cache import AnswerCache
+                _answers = AnswerCache(os.getenv("RAG_ANSWER_CACHE_PATH") or "answer_cache.sqlite",
+                                       threshold=float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD") or 0.92),
+                                       ttl=float(os.getenv("RAG_ANSWER_CACHE_TTL") or 7 * 86400),
+                                       stale_after=float(os.getenv("RAG_ANSWER_CACHE_STALE") or 3600))
+    return _answers
+
+def cached_answer(question, provider_name, filter=None):
+    """(respuesta guardada o None, probe para store_answer). Con la caché desactivada: (None, None)."""
+    cache = get_answer_cache()
+    if cache is None:
+        return None, None
+    from rag.filters import format_filter, parse_filter
+    t0 = time.perf_counter()
+    probe = (get_retriever().embed(question), index_fingerprint(), format_filter(parse_filter(filter)))
+    hit = cache.lookup(provider_name, probe[1], probe[0], filter=probe[2])
+    # rag_stage_seconds{stage="answer_cache",result="hit|miss"}: su _count da hits y misses en /metrics
+    metrics.record("answer_cache", time.perf_counter() - t0, result="hit" if hit else "miss")
+    return hit, probe
+
+def store_answer(probe, provider_name, question, answer, references):
+    if probe is not None and answer:
+        vec, version, fkey = probe
+        get_answer_cache().put(provider_name, version, vec, question, answer, references, filter=fkey)
+
+def unique_titles(items):
+    seen = OrderedDict()
+    for r in items:
+        t = r["title"]
+        if t not in seen:
+            seen[t] = True
+    return list(seen.keys())
+
+def build_messages(question, top, budget=None, with_ctx=False):
+    # chunks solapados fusionados y recortados al presupuesto de tokens (RAG_CONTEXT_TOKENS);
+    # with_ctx agrega las cifras de pack_context (app.py las imprime, evaluate_benchmark las guarda)
+    context, used, ctx = pack_context(top, budget=budget)
+    with _ctx_lock:
+        _ctx["prompts"] += 1
+        _ctx["tokens_packed"] += ctx["tokens_packed"]
+        _ctx["tokens_saved"] += ctx["tokens_saved"]
+    log.info("contexto: %d chunks → %d bloques, %d tokens (ahorro %d)",
+             ctx["chunks_in"], ctx["blocks"], ctx["tokens_packed"], ctx["tokens_saved"])
+    ref_titles = unique_titles(used)
+    refs_block = "\n".join([f"- {t}" for t in ref_titles])
+
+    user_prompt = (
+        f"Pregunta: {question}\n\n"
+        "Contexto de normativa (fragmentos relevantes):\n"
+        f"{context}\n\n"
+        "Instrucciones de respuesta:\n"
+        "- Responde SOLO en base al contexto anterior.\n"
+        "- Si hay varias fechas/valores, selecciona la que responda EXACTAMENTE a la pregunta.\n"
+        "- Sé explícito con la fecha/valor (ej.: 'Lunes 4 de agosto de 2025').\n"
+        "- Si la información no está en el contexto, responde: 'No encontrado en normativa UFRO'.\n"
+        "- Al final agrega:\n"
+        f"Referencias:\n{refs_block}"
+    )
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+    if with_ctx:
+        return ref_titles, messages, ctx
+    return ref_titles, messages
+
+def request_error(question, filter=None):
+    # validación común de /ask y /ask_stream: mensaje para un 400, o None
+    if not question:
+        return "Falta 'question'"
+    if filter is not None:
+        from rag.filters import parse_filter
+        try:
+            parse_filter(filter)
+        except ValueError as e:
+            return str(e)
+    return None
+
+def admin_error(token, remote_addr):
+    # /admin/*: con RAG_ADMIN_TOKEN exige el header X-Admin-Token; sin él, solo desde localhost
+    expected = os.getenv("RAG_ADMIN_TOKEN")
+    if expected:
+        return None if token and hmac.compare_digest(token, expected) else "Token de administración inválido"
+    if remote_addr not in ("127.0.0.1", "::1", "localhost"):
+        return "Endpoint de administración solo desde localhost (o define RAG_ADMIN_TOKEN)"
+    return None
+
+def prepare(question, k=8, filter=None):
+    # recuperación + prompt; devuelve (top, ref_titles, messages) o (top vacío, [], None)
+    # filter (p.ej. "vigencia>=2023") va directo al retriever: el micro-batcher agrupa sin filtro
+    # la carga perezosa del retriever queda en su propio span ("retriever_load"), no en "retrieve"
+    ensure_watcher()
+    search = get_retriever().search if filter else get_search()
+    with span("retrieve"):
+        top = search(question, k=k, filter=filter) if filter else search(question, k=k)
+    if not top:
+        return top, [], None
+    with span("prompt"):
+        ref_titles, messages = build_messages(question, top)
+    return top, ref_titles, messages
@@ -1,3 +1,78 @@
-def retrieve_topk(query: str, k: int = 4):
-    # luego: usar FAISS para devolver [(texto, meta), ...]
-    return []
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import faiss
+
+from rag.embed import EMB_MODEL
+from rag.encoders import load_encoder
+from rag.filters import FacetIndex, parse_filter
+from rag.index_types import set_search_params
+
+# Recuperación sobre el índice del pipeline parquet (rag/ingest.py → rag/embed.py):
+# data/index.faiss + data/meta.parquet (metadatos por vector) + data/chunks.parquet (textos).
+
+class ParquetRetriever:
+    def __init__(self,
+                 index_path="data/index.faiss",
+                 meta_path="data/meta.parquet",
+                 chunks_path="data/chunks.parquet",
+                 model=EMB_MODEL,
+                 nprobe=None,
+                 ef_search=None):
+        assert Path(index_path).exists(), f"No existe {index_path}. Corre python -m rag.embed"
+        self.index = faiss.read_index(index_path)
+        set_search_params(self.index, nprobe=nprobe, ef_search=ef_search)
+        self.model = load_encoder(model)
+
+        meta = pd.read_parquet(meta_path)
+        texts = pd.read_parquet(chunks_path, columns=["chunk_id", "text"]).drop_duplicates("chunk_id")
+        meta = meta.merge(texts, on="chunk_id", how="left")
+        meta["text"] = meta["text"].fillna("")
+        self.meta = meta.to_dict(orient="records")
+
+        # índices con ids estables devuelven vids; los antiguos, posiciones de meta.parquet
+        if "vid" in meta.columns:
+            vids = meta["vid"].to_numpy(dtype=np.int64)
+            self._order = np.argsort(vids, kind="stable")
+            self._vids = vids[self._order]
+        else:
+            self._order = self._vids = None
+        # filtros por vigencia / título (de data/sources.csv) / documento, dentro de FAISS
+        ids = meta["vid"].to_numpy(dtype=np.int64) if "vid" in meta.columns else np.arange(len(meta))
+        self.facets = FacetIndex.from_columns(ids, meta["title"].fillna(""), meta["doc_id"].fillna(""),
+                                              meta["vigencia"].fillna(0))
+
+    def _row(self, i: int) -> int:
+        if self._vids is None:
+            return i if 0 <= i < len(self.meta) else -1
+        pos = int(np.searchsorted(self._vids, i))
+        if pos < len(self._vids) and self._vids[pos] == i:
+            return int(self._order[pos])
+        return -1
+
+    def search(self, query: str, k: int = 8, filter=None) -> List[Dict]:
+        fkey = parse_filter(filter)
+        sel = self.facets.selection(fkey) if fkey else None
+        if sel is not None and sel.empty:
+            return []
+        qv = self.model.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+        sims, idxs = sel.search(self.index, qv, k) if sel is not None else self.index.search(qv, k)
+        out = []
+        for i, s in zip(idxs[0], sims[0]):
+            row = self._row(int(i)) if i >= 0 else -1
+            if row < 0:
+                continue
+            m = self.meta[row]
+            out.append({"title": m["title"], "text": m["text"], "doc": m["doc_id"], "score": float(s)})
+        return out
+
+_default: Optional[ParquetRetriever] = None
+
+def retrieve_topk(query: str, k: int = 4, filter=None) -> List[Tuple[str, Dict]]:
+    # [(texto, meta), ...] con el índice por defecto de data/
+    global _default
+    if _default is None:
+        _default = ParquetRetriever()
+    return [(r["text"], {key: v for key, v in r.items() if key != "text"})
+            for r in _default.search(query, k=k, filter=filter)]
@@ -1,38 +1,153 @@
-import os, json
+import os, threading
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
+
+from rag.index_types import read_index, set_search_params, index_kind
+from rag.chunk_store import open_store
+from rag.cache import LRUCache, MISSING, normalize_query
+from rag.encoders import load_encoder
+from rag.filters import FacetIndex, parse_filter
+from rag.metrics import span
 
 class RetrieverFAISS:
     def __init__(self,
                  faiss_path="index.faiss",
                  meta_path="meta.jsonl",
-                 model="sentence-transformers/all-MiniLM-L6-v2"):
+                 model="sentence-transformers/all-MiniLM-L6-v2",
+                 nprobe=None,
+                 ef_search=None,
+                 cache_size=1024,
+                 cache_ttl=None,
+                 mmap=False,
+                 lazy_model=False):
         assert os.path.exists(faiss_path), f"No existe {faiss_path}. Corre build_faiss.py"
-        assert os.path.exists(meta_path), f"No existe {meta_path}. Corre build_faiss.py"
-
-        self.index = faiss.read_index(faiss_path)
-        self.model = SentenceTransformer(model)
-
-        # carga metadatos a memoria (ligero)
-        self.metas = []
-        with open(meta_path, encoding="utf-8") as f:
-            for line in f:
-                self.metas.append(json.loads(line))
-
-    def search(self, query: str, k: int = 8):
-        qv = self.model.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype("float32")
-        D, I = self.index.search(qv, k)  # similitudes IP
-        idxs = I[0]
-        sims = D[0]
+
+        # read_index reconoce el tipo guardado (flat, HNSW, IVF...) por sí solo;
+        # mmap=True deja los vectores en páginas del archivo, compartidas entre procesos
+        self.index = read_index(faiss_path, mmap=mmap)
+        self.index_type = index_kind(self.index)
+        self.set_search_params(nprobe=nprobe, ef_search=ef_search)
+        # RAG_ENCODER=torch|onnx|onnx-int8 (ver rag/encoders.py); lazy_model=True lo carga
+        # en el primer encode (p.ej. en cada worker, después del fork)
+        self._model_name = model
+        self._model = None
+        self._model_lock = threading.Lock()
+        if not lazy_model:
+            self.load_model()
+
+        # metadatos: meta.store (mmap, se decodifica solo lo que se devuelve) si existe,
+        # si no meta.jsonl completo en memoria
+        self.store = open_store(meta_path)
+        # facetas para filtros por metadatos (rag/filters.py): se construyen con el primer filtro
+        self._facets = None
+        self._facets_lock = threading.Lock()
+
+        # caché de embeddings de consulta (depende solo del modelo) y de resultados top-k (depende del
+        # índice cargado; si los archivos cambian en disco, rag/pipeline.py carga un retriever nuevo)
+        self._emb_cache = LRUCache(cache_size, cache_ttl)
+        self._res_cache = LRUCache(cache_size, cache_ttl)
+
+    @property
+    def model(self):
+        return self._model if self._model is not None else self.load_model()
+
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+
+    def load_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = load_encoder(self._model_name)
+        return self._model
+
+    def share_model(self, other: "RetrieverFAISS"):
+        # hot-reload (rag/pipeline.py): la versión nueva del índice reutiliza el modelo y la caché de
+        # embeddings de consulta de la anterior, que dependen solo del modelo
+        if other._model_name == self._model_name:
+            self._model = other._model
+            self._emb_cache = other._emb_cache
+
+    @property
+    def facets_loaded(self) -> bool:
+        return self._facets is not None
+
+    def warmup(self, facets=False):
+        # una búsqueda sin modelo para traer las páginas del índice (mmap) antes de recibir tráfico
+        self.index.search(np.zeros((1, self.index.d), dtype="float32"), 1)
+        if facets:
+            self.facets()
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        # nprobe (IVF) / efSearch (HNSW): más alto = mejor recall, más latencia
+        set_search_params(self.index, nprobe=nprobe, ef_search=ef_search)
+
+    def search(self, query: str, k: int = 8, filter=None):
+        return self.search_batch([query], k=k, filter=filter)[0]
+
+    def search_batch(self, queries, k: int = 8, filter=None):
+        # un solo forward del modelo y un solo index.search para todas las consultas no cacheadas;
+        # filter ("vigencia>=2023", "title=...") se aplica dentro de FAISS con un IDSelector
+        if not queries:
+            return []
+        fkey = parse_filter(filter)
+        sel = self.facets().selection(fkey) if fkey else None
+        if sel is not None and sel.empty:
+            return [[] for _ in queries]
+        keys = [normalize_query(q) for q in queries]
+        out = [self._res_cache.get((key, k, fkey)) for key in keys]
+        miss = [i for i, r in enumerate(out) if r is MISSING]
+        if miss:
+            Q = self._encode([queries[i] for i in miss], [keys[i] for i in miss])
+            with span("faiss_search"):
+                D, I = sel.search(self.index, Q, k) if sel is not None else self.index.search(Q, k)  # similitudes IP
+            with span("results"):
+                for i, idxs, sims in zip(miss, I, D):
+                    out[i] = self._results(idxs, sims)
+                    self._res_cache.put((keys[i], k, fkey), out[i])
+        # copias: quien llama puede modificar sus dicts sin tocar la caché
+        return [[dict(r) for r in res] for res in out]
+
+    def embed(self, query: str) -> np.ndarray:
+        # embedding normalizado de una consulta, por la misma caché que search (rag/answer_cache.py)
+        return self._encode([query], [normalize_query(query)])[0]
+
+    def facets(self) -> FacetIndex:
+        if self._facets is None:
+            with self._facets_lock:
+                if self._facets is None:
+                    self._facets = FacetIndex.from_store(self.store)
+        return self._facets
+
+    def _encode(self, queries, keys):
+        vecs = [self._emb_cache.get(key) for key in keys]
+        todo = [i for i, v in enumerate(vecs) if v is MISSING]
+        if todo:
+            with span("encode"):
+                E = self.model.encode([queries[i] for i in todo], convert_to_numpy=True,
+                                      normalize_embeddings=True).astype("float32")
+            for i, v in zip(todo, E):
+                vecs[i] = v
+                self._emb_cache.put(keys[i], v)
+        return np.stack(vecs).astype("float32", copy=False)
+
+    def cache_stats(self):
+        return {"embeddings": self._emb_cache.stats(), "results": self._res_cache.stats()}
+
+    def _results(self, idxs, sims):
         out = []
         for i, s in zip(idxs, sims):
             if i < 0:
                 continue
-            m = self.metas[int(i)]
+            # índices con ids estables (IndexIDMap2) devuelven vector ids, no posiciones
+            row = self.store.row_of(int(i))
+            if row < 0:
+                continue
             out.append({
-                "title": m["title"],
-                "text": m["text"],
-                "score": float(s)
+                "title": self.store.title(row),
+                "text": self.store.text(row),
+                "doc": self.store.doc(row),
+                "score": float(s),
+                "row": row
             })
         return out
@@ -1,26 +1,28 @@
-import os, json, numpy as np
-from sentence_transformers import SentenceTransformer
+import os
+from rag.encoders import load_encoder
+from rag.chunk_store import open_store
+from rag.emb_matrix import EmbeddingMatrix
 
 class Retriever:
     def __init__(self, index_dir="index", model="sentence-transformers/all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model)
-        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npz"))["E"]
-        with open(os.path.join(index_dir, "chunks.jsonl"), encoding="utf-8") as f:
-            self.metas = [json.loads(l) for l in f]
+        self.model = load_encoder(model)
+        # shards de index/ (embeddings.json) con mmap, float32/float16/int8; embeddings.npz antiguo → en memoria
+        self.embeddings = EmbeddingMatrix(index_dir)
+        # index/chunks.store (mmap) si existe; si no, chunks.jsonl en memoria
+        self.store = open_store(os.path.join(index_dir, "chunks.jsonl"))
 
     def search(self, query, k=5):
         qv = self.model.encode([query], convert_to_numpy=True, normalize_embeddings=True)[0]
-        sims = self.embeddings @ qv
-        idx = np.argsort(-sims)[:k]
+        # producto por bloques + argpartition: no se ordenan los N scores
+        idx, sims = self.embeddings.search(qv, k)
         results = []
-        for i in idx:
-            m = self.metas[int(i)]
-            # usar título en limpio (nombre del archivo sin extensión ni guiones bajos)
-            fname = os.path.basename(m["path"])
-            title = fname.replace(".pdf","").replace(".txt","").replace("_"," ").title()
+        for i, s in zip(idx, sims):
+            # las filas del store siguen el orden de la matriz de embeddings
+            # (título en limpio: nombre del archivo sin extensión ni guiones bajos)
             results.append({
-                "score": float(sims[i]),
-                "title": title,
-                "text": m["text"]
+                "score": float(s),
+                "title": self.store.title(int(i)),
+                "text": self.store.text(int(i)),
+                "doc": self.store.doc(int(i))
             })
         return results